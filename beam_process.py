@@ -0,0 +1,183 @@
+# Beam acquisition in a process of its own. The sampler polls the beam pins
+# and publishes per-pin falling-edge counts and timestamps, plus the debounced
+# hit count, in a multiprocessing.shared_memory block. The counter reads that
+# block whenever it likes: a slow render, a font load or a GC pause in the
+# display process delays when hits show up, but the sampler never stops.
+#
+# The block is an array of int64 words guarded by a seqlock: the sampler makes
+# the sequence odd, updates the counts and makes it even again; readers retry
+# until they see the same even sequence before and after copying.
+#
+#   beams = BeamProcess([26, 16, 5, 6], DigitalioSource([26, 16, 5, 6]))
+#   beams.start()
+#   snapshot = beams.counts.snapshot()
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+DEFAULT_POLL_INTERVAL = 0.005
+
+# Header words
+SEQ = 0
+SAMPLES = 1       # sample rounds so far, a heartbeat for the reader
+LAST_SAMPLE_NS = 2
+DEBOUNCE_NS = 3   # written by the counter, read by the sampler
+HITS = 4          # debounced hits over all beams
+LAST_HIT_NS = 5
+HEADER_WORDS = 6
+
+# Words per pin: falling edges, monotonic_ns of the last one, current level
+PIN_WORDS = 3
+
+
+class BeamCounts(object):
+    def __init__(self, pin_count, name=None, create=False):
+        size = 8 * (HEADER_WORDS + PIN_WORDS * pin_count)
+        self.pin_count = pin_count
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self.words = np.ndarray((size // 8,), dtype=np.int64, buffer=self.shm.buf)
+        if create:
+            self.words[:] = 0
+            self.words[HEADER_WORDS + 2::PIN_WORDS] = 1  # pins idle high
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    # Sampler side
+
+    def begin_write(self):
+        self.words[SEQ] += 1
+
+    def end_write(self):
+        self.words[SEQ] += 1
+
+    def add_edge(self, pin_index, now_ns):
+        base = HEADER_WORDS + PIN_WORDS * pin_index
+        self.words[base] += 1
+        self.words[base + 1] = now_ns
+
+    def set_level(self, pin_index, level):
+        self.words[HEADER_WORDS + PIN_WORDS * pin_index + 2] = 1 if level else 0
+
+    def add_hit(self, now_ns):
+        self.words[HITS] += 1
+        self.words[LAST_HIT_NS] = now_ns
+
+    def sampled(self, now_ns):
+        # Single word stores, outside the seqlock
+        self.words[SAMPLES] += 1
+        self.words[LAST_SAMPLE_NS] = now_ns
+
+    # Reader side
+
+    def set_debounce(self, seconds):
+        self.words[DEBOUNCE_NS] = int(seconds * 1e9)
+
+    def snapshot(self):
+        # (hits, last_hit_ns, [(edges, last_edge_ns, level), ...])
+        words = self.words
+        while True:
+            seq = int(words[SEQ])
+            if seq & 1:
+                continue
+            copy = words[HITS:].copy()
+            if int(words[SEQ]) == seq:
+                break
+        pins = copy[HEADER_WORDS - HITS:].reshape(self.pin_count, PIN_WORDS)
+        return int(copy[0]), int(copy[1]), [(int(e), int(t), bool(l)) for e, t, l in pins]
+
+    def heartbeat(self):
+        return int(self.words[SAMPLES]), int(self.words[LAST_SAMPLE_NS])
+
+    def close(self):
+        self.words = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class DigitalioSource(object):
+    # The beam pins through Blinka, opened inside the sampler process
+    def __init__(self, pins):
+        self.pins = pins
+
+    def open(self):
+        import board
+        import digitalio
+        sensors = []
+        for pin in self.pins:
+            sensor = digitalio.DigitalInOut(getattr(board, f"D{pin}"))
+            sensor.direction = digitalio.Direction.INPUT
+            sensor.pull = digitalio.Pull.UP
+            sensors.append(sensor)
+        return lambda: [sensor.value for sensor in sensors]
+
+
+def sample_beams(counts_name, pin_count, source, poll_interval, stop):
+    counts = BeamCounts(pin_count, name=counts_name)
+    read = source.open()
+    previous = [True] * pin_count
+    last_hit_ns = None
+    try:
+        while not stop.is_set():
+            levels = read()
+            now_ns = time.monotonic_ns()
+            if levels != previous:
+                counts.begin_write()
+                for i, level in enumerate(levels):
+                    if level == previous[i]:
+                        continue
+                    counts.set_level(i, level)
+                    if not level:
+                        # A beam was just broken
+                        counts.add_edge(i, now_ns)
+                        if last_hit_ns is None or now_ns - last_hit_ns >= counts.words[DEBOUNCE_NS]:
+                            counts.add_hit(now_ns)
+                            last_hit_ns = now_ns
+                counts.end_write()
+                previous = levels
+            counts.sampled(now_ns)
+            stop.wait(poll_interval)
+    finally:
+        counts.close()
+
+
+class BeamProcess(object):
+    def __init__(self, pins, source, poll_interval=DEFAULT_POLL_INTERVAL, debounce_time=0):
+        # source.open() runs in the sampler and returns a read() -> [levels]
+        self.pins = pins
+        self.source = source
+        self.poll_interval = poll_interval
+        self.debounce_time = debounce_time
+        self.counts = None
+        self._stop = None
+        self._process = None
+
+    def start(self):
+        self.counts = BeamCounts(len(self.pins), create=True)
+        self.counts.set_debounce(self.debounce_time)
+        self._stop = multiprocessing.Event()
+        self._process = multiprocessing.Process(
+            target=sample_beams,
+            args=(self.counts.name, len(self.pins), self.source, self.poll_interval, self._stop),
+            name="beam-sampler")
+        self._process.daemon = True
+        self._process.start()
+
+    def alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def stop(self):
+        if self._process is None:
+            return
+        self._stop.set()
+        self._process.join(timeout=2.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+        self.counts.close()
+        self.counts.unlink()
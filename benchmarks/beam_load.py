@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# Synthetic beam-hit load: drives fake_gpio with per-pin pulse trains while a
+# counter runs against the headless matrix, then reports injected vs detected
+# hits, hit-to-display latency and CPU. Sweeping --widths below the counters'
+# 10 ms polling interval shows the pulses that are never sampled.
+#
+# --stall-ms makes every display_number take that much longer, like a slow
+# render or a GC pause. hit_counter samples the beams in the thread that
+# draws and misses pulses during the stall; hit_counter_process samples them
+# in a separate process (beam_process.py) and should lose none.
+#
+#   python3 benchmarks/beam_load.py --counter hit_counter_v2 --rate 4 --widths 2,5,10,20 --debounce 0
+#   python3 benchmarks/beam_load.py --counter hit_counter_process --stall-ms 200 --debounce 0
+import argparse
+import bisect
+import contextlib
+import io
+import random
+import threading
+import time
+
+import harness
+import fake_gpio
+
+pins = fake_gpio.install()
+harness.stub_modules("evdev")
+
+import hit_counter
+import hit_counter_v1
+import hit_counter_v2
+
+BEAM_PINS = [26, 16, 5, 6]
+
+# name -> (class, method called for detected hits)
+COUNTERS = {
+    "hit_counter": (hit_counter.BreakBeamCounter, "hit_detected"),
+    "hit_counter_process": (hit_counter.BreakBeamCounter, "count_hits"),
+    "hit_counter_v1": (hit_counter_v1.DirectTestCounter, "increment_counter"),
+    "hit_counter_v2": (hit_counter_v2.DirectTestCounter, "increment_counter"),
+}
+
+
+def pulse_trains(beam_pins, rate, width, jitter, duration, simultaneous, rng):
+    # Regular pulses at `rate` per pin, each start moved by up to +-jitter.
+    # Pins get random phases unless all beams are to break together.
+    period = 1.0 / rate
+    width = min(width, period * 0.9)
+    jitter = min(jitter, (period - width) / 2.0)
+    trains = {}
+    shared = None
+    for pin in beam_pins:
+        if simultaneous and shared is not None:
+            trains[pin] = list(shared)
+            continue
+        pulses = []
+        t = period * (0.5 if simultaneous else rng.random())
+        while t + width < duration:
+            start = max(0.0, t + rng.uniform(-jitter, jitter))
+            pulses.append((start, start + width))
+            t += period
+        trains[pin] = pulses
+        shared = pulses
+    return trains
+
+
+class LoadGenerator(threading.Thread):
+    def __init__(self, trains):
+        super(LoadGenerator, self).__init__()
+        self.daemon = True
+        self.events = sorted((t, pin, level)
+                             for pin, pulses in trains.items()
+                             for start, end in pulses
+                             for t, level in ((start, False), (end, True)))
+        # pin -> [[break_time, restore_time], ...] as actually injected
+        self.injected = {pin: [] for pin in trains}
+
+    def run(self):
+        t0 = time.perf_counter()
+        for offset, pin, level in self.events:
+            delay = t0 + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            now = time.perf_counter()
+            pins.set_level(pin, level)
+            if level:
+                self.injected[pin][-1][1] = now
+            else:
+                self.injected[pin].append([now, None])
+
+
+def instrument(counter, method_name, detections):
+    original = getattr(counter, method_name)
+
+    def wrapper(*args, **kwargs):
+        detected_at = time.perf_counter()
+        before = counter.count
+        result = original(*args, **kwargs)
+        # display_number has swapped the new value in by the time we return;
+        # count_hits can add several hits at once
+        displayed_at = time.perf_counter()
+        for _ in range(counter.count - before):
+            detections.append((detected_at, displayed_at))
+        return result
+
+    setattr(counter, method_name, wrapper)
+
+
+def stall_rendering(counter, stall):
+    display_number = counter.display_number
+
+    def slow_display_number(number):
+        display_number(number)
+        time.sleep(stall)
+
+    counter.display_number = slow_display_number
+
+
+def attribute_detections(injected, detections, slack=0.01):
+    # Each detection is credited to the earliest not yet credited pulse that
+    # was still broken (give or take one polling interval) when the counter
+    # reacted. Detections with no such pulse left count a pulse twice.
+    pulses = sorted((broken, restored if restored is not None else float("inf"))
+                    for per_pin in injected.values() for broken, restored in per_pin)
+    breaks = [broken for broken, _ in pulses]
+    credited = [False] * len(pulses)
+    latencies = []
+    double_counts = 0
+    for detected_at, displayed_at in detections:
+        match = None
+        for i in range(bisect.bisect_right(breaks, detected_at) - 1, -1, -1):
+            broken, restored = pulses[i]
+            if restored + slack < detected_at:
+                if detected_at - broken > 1.0:
+                    break
+                continue
+            if not credited[i]:
+                match = i
+        if match is None:
+            double_counts += 1
+            continue
+        credited[match] = True
+        latencies.append(displayed_at - pulses[match][0])
+    return latencies, double_counts
+
+
+def run_trial(name, args, width, rng):
+    cls, method_name = COUNTERS[name]
+    kwargs = {"logo_path": ""}
+    if args.debounce is not None:
+        kwargs["debounce_time"] = args.debounce
+
+    pins.reset()
+    pins.read_log = {}
+    trains = pulse_trains(BEAM_PINS[:args.pins], args.rate, width, args.jitter / 1000.0,
+                          args.duration, args.simultaneous, rng)
+    generator = LoadGenerator(trains)
+    detections = []
+    in_process = name == "hit_counter_process"
+    if in_process:
+        # The sampler can't see fake pins set from here, so it plays the
+        # same pulse trains itself from a start time agreed in advance
+        lead = 0.5
+        kwargs["sensor_process"] = True
+        kwargs["beam_source"] = fake_gpio.PulseSource(BEAM_PINS, trains, time.monotonic() + lead)
+        pulses_start = time.perf_counter() + lead
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        counter = cls(**kwargs)
+        if args.stall_ms:
+            stall_rendering(counter, args.stall_ms / 1000.0)
+        instrument(counter, method_name, detections)
+        counter_thread = threading.Thread(target=counter.run)
+        counter_thread.daemon = True
+        counter_thread.start()
+        time.sleep(0.2)
+
+        cpu_before = time.process_time()
+        start = time.perf_counter()
+        if in_process:
+            generator.injected = {pin: [[pulses_start + b, pulses_start + r] for b, r in pulses]
+                                  for pin, pulses in trains.items()}
+            time.sleep(pulses_start + args.duration - time.perf_counter())
+        else:
+            generator.start()
+            generator.join()
+        time.sleep(0.1 + width + args.stall_ms / 1000.0)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_before
+
+        counter.running = False
+        counter_thread.join(timeout=2.0)
+        if in_process:
+            counter.cleanup()
+
+    if in_process:
+        # Hits are counted from the sampler's edges, so they can show up long
+        # after their pulse ended; credit them to the pulses in order instead
+        breaks = sorted(broken for per_pin in generator.injected.values() for broken, _ in per_pin)
+        latencies = [displayed_at - broken for broken, (_, displayed_at) in zip(breaks, detections)]
+        double_counts = max(0, len(detections) - len(breaks))
+    else:
+        latencies, double_counts = attribute_detections(generator.injected, detections)
+
+    # A pulse is sampled if the counter read its pin while the beam was broken
+    unsampled = None if in_process else 0
+    for pin, pulses in ([] if in_process else generator.injected.items()):
+        reads = pins.read_log.get(pin, [])
+        for broken, restored in pulses:
+            if bisect.bisect_left(reads, broken) == bisect.bisect_left(reads, restored):
+                unsampled += 1
+
+    injected = sum(len(pulses) for pulses in generator.injected.values())
+    return {
+        "counter": name,
+        "pulse_width_ms": width * 1000.0,
+        "rate_hz": args.rate,
+        "jitter_ms": args.jitter,
+        "pins": args.pins,
+        "simultaneous": args.simultaneous,
+        "debounce_s": counter.debounce_time,
+        "injected": injected,
+        "detected": len(detections),
+        "counted_pulses": len(latencies),
+        "missed": injected - len(latencies),
+        "double_counts": double_counts,
+        "unsampled": unsampled,
+        "pin_reads": None if in_process else pins.reads,
+        "stall_ms": args.stall_ms,
+        "latency": harness.summarize(latencies),
+        "cpu_percent": 100.0 * cpu / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive a hit counter with synthetic beam breaks")
+    parser.add_argument("--counter", default="hit_counter_v2", choices=sorted(COUNTERS))
+    parser.add_argument("--rate", default=2.0, type=float, help="Breaks per second per pin")
+    parser.add_argument("--widths", default="2,5,10,20,50", help="Comma separated pulse widths in ms to sweep")
+    parser.add_argument("--jitter", default=0.0, type=float, help="Random +- shift of each pulse in ms")
+    parser.add_argument("--pins", default=len(BEAM_PINS), type=int, choices=range(1, len(BEAM_PINS) + 1), help="Number of beams to drive")
+    parser.add_argument("--simultaneous", action="store_true", help="Break all driven beams at the same instant")
+    parser.add_argument("--duration", default=5.0, type=float, help="Seconds of load per pulse width")
+    parser.add_argument("--debounce", default=None, type=float, help="Override the counter's debounce_time (seconds)")
+    parser.add_argument("--stall-ms", default=0.0, type=float, help="Extra time every display_number takes (render stall)")
+    parser.add_argument("--seed", default=1, type=int)
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = [run_trial(args.counter, args, float(w) / 1000.0, rng) for w in args.widths.split(",")]
+    harness.report("beam_load", results, args.output, duration=args.duration)
+
+
+if __name__ == "__main__":
+    main()
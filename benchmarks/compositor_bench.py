@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# Recomposite cost of compositor.Compositor when one layer changes, against
+# rebuilding the whole screen with Pillow the way the counters do today.
+# The screen is a gradient background, the logo (alpha), the value text
+# (colorkey) and a translucent "input" overlay, put on a headless canvas.
+#
+#   python3 benchmarks/compositor_bench.py --sizes 64x64,256x128 -o compositor.json
+import argparse
+import itertools
+import os
+
+import harness
+
+from PIL import Image, ImageDraw, ImageFont
+
+from compositor import Compositor, OPAQUE, COLORKEY, ALPHA
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "logo.png")
+FONT_PATHS = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/freefont/FreeSans.ttf',
+]
+TEXT_COLOR = (214, 160, 255)
+
+
+class Screen(object):
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        path = next((p for p in FONT_PATHS if os.path.exists(p)), None)
+        self.font = ImageFont.truetype(path, height // 2) if path else ImageFont.load_default()
+        self.logo = Image.open(LOGO_PATH).convert("RGBA")
+
+    def background(self, shade):
+        gradient = Image.linear_gradient('L').resize((self.width, self.height)).point(lambda v: v * shade // 255)
+        return Image.merge('RGB', (gradient, gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+
+    def logo_layer(self):
+        logo = self.logo.copy()
+        logo.thumbnail((self.width // 4, self.height // 4), Image.LANCZOS)
+        return logo
+
+    def value(self, text):
+        img = Image.new('RGB', (self.width, self.height), (0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        bbox = draw.textbbox((0, 0), text, font=self.font)
+        draw.text(((self.width - bbox[2] + bbox[0]) // 2, (self.height - bbox[3] + bbox[1]) // 2),
+                  text, font=self.font, fill=TEXT_COLOR)
+        return img
+
+    def overlay(self):
+        img = Image.new('RGBA', (self.width, self.height // 4), (255, 255, 255, 96))
+        return img
+
+    def pil_frame(self, shade, text, overlay):
+        # Everything from scratch, like display_number today
+        frame = self.background(shade).convert("RGBA")
+        frame.alpha_composite(self.logo_layer())
+        value = self.value(text)
+        frame.paste(value, (0, 0), value.convert("L").point(lambda v: 255 if v else 0))
+        if overlay:
+            frame.alpha_composite(self.overlay(), (0, self.height - self.height // 4))
+        return frame.convert("RGB")
+
+    def compositor(self):
+        screen = Compositor(self.width, self.height)
+        screen.add_layer("background", self.background, blend=OPAQUE)
+        screen.add_layer("logo", self.logo_layer, blend=ALPHA)
+        screen.add_layer("value", self.value, blend=COLORKEY)
+        screen.add_layer("overlay", self.overlay, blend=ALPHA, position=(0, self.height - self.height // 4))
+        screen.update("background", shade=255)
+        screen.update("value", text="0")
+        return screen
+
+
+def bench_size(width, height, repeat):
+    matrix = harness.make_matrix(width, height)
+    canvas = matrix.CreateFrameCanvas()
+    screen = Screen(width, height)
+    values = itertools.count()
+    shades = itertools.cycle(range(128, 256))
+    toggle = itertools.cycle([False, True])
+
+    comp = screen.compositor()
+    comp.draw(canvas)
+    results = [dict(name="pil_rebuild", **harness.time_call(
+        lambda: canvas.SetImage(screen.pil_frame(255, str(next(values)), True)), repeat))]
+
+    def rebuild():
+        comp.invalidate()
+        comp.draw(canvas)
+
+    def value_changed():
+        comp.update("value", text=str(next(values)))
+        comp.draw(canvas)
+
+    def overlay_toggled():
+        comp.update("overlay", visible=next(toggle))
+        comp.draw(canvas)
+
+    def background_changed():
+        comp.update("background", shade=next(shades))
+        comp.draw(canvas)
+
+    for name, fn in (("rebuild", rebuild), ("value_changed", value_changed),
+                     ("overlay_toggled", overlay_toggled), ("background_changed", background_changed),
+                     ("unchanged", lambda: comp.draw(canvas))):
+        results.append(dict(name=name, **harness.time_call(fn, repeat)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Layered compositor recomposite cost")
+    parser.add_argument("--sizes", default=",".join(harness.PANEL_SIZES), help="Comma separated WxH panel sizes")
+    parser.add_argument("--repeat", default=50, type=int, help="Samples per measurement")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes.split(","):
+        width, height = harness.parse_panel_size(size)
+        for entry in bench_size(width, height, args.repeat):
+            results.append(dict(panel=size, **entry))
+    harness.report("compositor", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# Control server throughput: a client process opens --clients concurrent
+# connections to a running MatrixDisplay (scrolling on a headless panel) and
+# each sends --requests batched settings changes (text and color together),
+# waiting for every reply. Reported per transport and client count are
+# requests per second, reply latency, how many renders the changes cost, and
+# the display's frame rate and longest gap between swaps under that load.
+#
+#   python3 benchmarks/control_bench.py --clients 1,10,100 --requests 200
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import harness
+
+harness.stub_modules("board", "digitalio", "RPi.GPIO", "evdev", "keyboard")
+
+import display_bench
+from control_server import parse_address
+
+
+def run_clients(address, clients, requests, results):
+    async def client(index):
+        transport, target = parse_address(address)
+        if transport == "tcp":
+            reader, writer = await asyncio.open_connection(*target)
+        else:
+            reader, writer = await asyncio.open_unix_connection(target)
+        samples = []
+        errors = 0
+        for n in range(requests):
+            message = {"id": n, "set": {"text": f"Station {index} #{n}", "color": [(index * 37) % 256, n % 256, 255]}}
+            start = time.perf_counter()
+            writer.write(json.dumps(message).encode() + b"\n")
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            samples.append(time.perf_counter() - start)
+            if not reply.get("ok"):
+                errors += 1
+        writer.close()
+        return samples, errors
+
+    async def main():
+        return await asyncio.gather(*(client(i) for i in range(clients)))
+
+    start = time.perf_counter()
+    done = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    results.put(dict(elapsed=elapsed, samples=[s for samples, _ in done for s in samples],
+                     errors=sum(errors for _, errors in done)))
+
+
+def bench(transport, clients, args, directory):
+    matrix = harness.make_matrix(*harness.parse_panel_size(args.size), args.refresh_hz)
+    display = display_bench.make_display(matrix, speed=args.speed)
+    display.args = display.parser.parse_args([])
+    display._display_mode = "scroll-h"
+    address = os.path.join(directory, "control.sock") if transport == "unix" else "tcp://127.0.0.1:0"
+
+    renders = [0]
+    get_display_image = display.get_display_image
+
+    def counting_render():
+        renders[0] += 1
+        return get_display_image()
+
+    display.get_display_image = counting_render
+    swaps = []
+    swap = matrix.SwapOnVSync
+
+    def timed_swap(*a, **kw):
+        result = swap(*a, **kw)
+        swaps.append(time.perf_counter())
+        return result
+
+    matrix.SwapOnVSync = timed_swap
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        display.start_control(address)
+        server = display._control
+        if transport == "tcp":
+            address = "tcp://%s:%d" % tuple(server.address)
+        display.start()
+        time.sleep(0.3)
+
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=run_clients, args=(address, clients, args.requests, results))
+        renders_before = renders[0]
+        cpu = time.process_time()
+        start = time.perf_counter()
+        process.start()
+        report = results.get(timeout=300)
+        process.join()
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+        renders_during = renders[0] - renders_before
+
+        display.stop()
+        server.stop()
+
+    window = [t for t in swaps if start <= t <= start + elapsed]
+    gaps = [b - a for a, b in zip(window, window[1:])]
+    total = clients * args.requests
+    return dict(
+        transport=transport,
+        clients=clients,
+        requests=total,
+        errors=report["errors"],
+        requests_per_second=total / report["elapsed"],
+        latency=harness.summarize(report["samples"]),
+        renders=renders_during,
+        display_fps=len(window) / elapsed,
+        max_swap_gap_ms=max(gaps) * 1000.0 if gaps else None,
+        server_cpu_percent=100.0 * cpu / elapsed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the MatrixDisplay control server under many clients")
+    parser.add_argument("--clients", default="1,10,100", help="Comma separated concurrent client counts")
+    parser.add_argument("--requests", default=200, type=int, help="Requests per client")
+    parser.add_argument("--transports", default="unix,tcp", help="Comma separated: unix, tcp")
+    parser.add_argument("--size", default="64x64", help="WxH panel size")
+    parser.add_argument("--speed", default=0.01, type=float, help="Scroll speed of the display")
+    parser.add_argument("--refresh-hz", default=120, type=int, help="Simulated panel refresh rate")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for transport in args.transports.split(","):
+            for clients in args.clients.split(","):
+                results.append(bench(transport, int(clients), args, directory))
+    harness.report("control", results, args.output, size=args.size, requests=args.requests,
+                   speed=args.speed, refresh_hz=args.refresh_hz)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# Display benchmark: MatrixDisplay modes, its render paths and the counters'
+# display_number, on headless panels of several sizes.
+#
+#   python3 benchmarks/display_bench.py --sizes 64x64,256x128 -o display.json
+import argparse
+import contextlib
+import io
+import os
+import threading
+import time
+
+import harness
+
+from PIL import Image, ImageFont
+
+harness.stub_modules("board", "digitalio", "RPi.GPIO", "evdev", "keyboard")
+
+import hit_counter
+import hit_counter_test
+import hit_counter_v1
+import hit_counter_v2
+from frame_gate import FrameGate
+from flash_animation import FlashAnimation
+from transition import Transition
+from matrix_display import MatrixDisplay
+
+SHORT_TEXT = "Hello world!"
+LONG_TEXT = ("Welcome to the gym! Warm up properly, clean the equipment after use "
+             "and ask a coach if you are unsure about any exercise. ") * 3
+IMAGE_SIZES = [(640, 480), (1920, 1080), (4000, 3000)]
+
+MODES = {
+    "scroll-h": lambda d, image, speed: d._scroll_horizontal(image, speed),
+    "scroll-up": lambda d, image, speed: d._scroll_vertical(image, "up", speed),
+    "scroll-down": lambda d, image, speed: d._scroll_vertical(image, "down", speed),
+    "random": lambda d, image, speed: d._scroll_random(image, speed, d._random_interval),
+    "static": lambda d, image, speed: d._static_image(image),
+}
+
+# module, class, font size used by that variant's __init__
+COUNTERS = [
+    ("hit_counter", hit_counter.BreakBeamCounter, 32),
+    ("hit_counter_test", hit_counter_test.DirectTestCounter, 32),
+    ("hit_counter_v1", hit_counter_v1.DirectTestCounter, 56),
+    ("hit_counter_v2", hit_counter_v2.DirectTestCounter, 56),
+]
+COUNTER_VALUES = [7, 1234, "250kg"]
+
+FONT_PATHS = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/freefont/FreeSans.ttf',
+]
+
+
+def make_display(matrix, text=SHORT_TEXT, speed=0.03):
+    display = MatrixDisplay()
+    display.matrix = matrix
+    display._display_text = text
+    display._scroll_speed = speed
+    return display
+
+
+class CountingLock(object):
+    # Every MatrixDisplay loop iteration takes _update_lock once, so counting
+    # acquisitions counts the display thread's wakeups
+    def __init__(self, lock):
+        self._lock = lock
+        self.acquisitions = 0
+
+    def __enter__(self):
+        self.acquisitions += 1
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc):
+        return self._lock.__exit__(*exc)
+
+
+def bench_mode(matrix, mode, duration, speed):
+    display = make_display(matrix, speed=speed)
+    display._display_mode = mode
+    image = display.get_display_image()
+    lock = display._update_lock = CountingLock(display._update_lock)
+
+    # Static mode draws straight onto the matrix instead of swapping buffers
+    direct_updates = [0]
+    set_image = matrix.SetImage
+
+    def counting_set_image(*args, **kwargs):
+        direct_updates[0] += 1
+        return set_image(*args, **kwargs)
+
+    matrix.SetImage = counting_set_image
+    thread = threading.Thread(target=MODES[mode], args=(display, image, speed))
+    thread.daemon = True
+    swaps_before = matrix.swap_count
+    cpu_before = time.process_time()
+    start = time.perf_counter()
+    try:
+        thread.start()
+        time.sleep(duration)
+        display._stop_event.set()
+        thread.join()
+    finally:
+        del matrix.SetImage
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_before
+    swaps = matrix.swap_count - swaps_before
+    frames = swaps + direct_updates[0]
+
+    return {
+        "frames": frames,
+        "swaps": swaps,
+        "direct_updates": direct_updates[0],
+        "fps": frames / elapsed,
+        "wakeups": lock.acquisitions,
+        "wakeups_per_second": lock.acquisitions / elapsed,
+        "cpu_percent": 100.0 * cpu / elapsed,
+        "cpu_ms_per_frame": 1000.0 * cpu / frames if frames else None,
+        "cpu_ms_per_wakeup": 1000.0 * cpu / lock.acquisitions if lock.acquisitions else None,
+    }
+
+
+def make_image(size):
+    gradient = Image.linear_gradient('L').resize(size)
+    return Image.merge('RGB', (gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT), gradient.transpose(Image.FLIP_TOP_BOTTOM)))
+
+
+def bench_render_paths(matrix, repeat):
+    results = []
+    for label, text in (("short", SHORT_TEXT), ("long", LONG_TEXT)):
+        display = make_display(matrix, text=text)
+        results.append(dict(name="create_text_image", text=label, **harness.time_call(display.create_text_image, repeat)))
+        results.append(dict(name="get_display_image", source="text", text=label, **harness.time_call(display.get_display_image, repeat)))
+
+    for size in IMAGE_SIZES:
+        display = make_display(matrix)
+        display._current_image = make_image(size)
+        display._display_type = "image"
+        results.append(dict(name="get_display_image", source="image", image="%dx%d" % size,
+                            **harness.time_call(display.get_display_image, max(3, repeat // 4), warmup=1)))
+    return results
+
+
+def make_counter(cls, matrix, font_size, text_renderer=None):
+    # The counters' __init__ also claims GPIO and keyboards, so only the state
+    # their display_number reads is set up here.
+    counter = cls.__new__(cls)
+    counter.matrix = matrix
+    counter.canvas = matrix.CreateFrameCanvas()
+    counter.text_color = (214, 160, 255)
+    counter.font_path = next(p for p in FONT_PATHS if os.path.exists(p))
+    counter.font_size = font_size
+    counter.font = ImageFont.truetype(counter.font_path, font_size)
+    counter.text_renderer = text_renderer
+    counter.frames = FrameGate(matrix)
+    counter.transition = Transition(counter.frames)
+    counter.flash = FlashAnimation(matrix, getattr(counter, "render_number", None))
+    if hasattr(counter, "setup_screen"):
+        counter.setup_screen()
+    return counter
+
+
+def bench_counters(matrix, repeat):
+    results = []
+    for name, cls, font_size in COUNTERS:
+        counter = make_counter(cls, matrix, font_size)
+        for value in COUNTER_VALUES:
+            with contextlib.redirect_stdout(io.StringIO()):
+                stats = harness.time_call(lambda: redraw(counter, value), repeat)
+            results.append(dict(name="display_number", counter=name, value=str(value), **stats))
+    return results
+
+
+def redraw(counter, value):
+    # Render cost: make the frame gate forget the value is already up
+    counter.frames.forget()
+    counter.display_number(value)
+
+
+def bench_redundant(matrix, repeat):
+    # Frames pushed again unchanged, which FrameGate drops
+    results = []
+    display = make_display(matrix)
+    display._stop_event.set()
+    image = display.get_display_image()
+    gate = display._frame_gate()
+    stats = harness.time_call(lambda: display._static_image(image), repeat)
+    results.append(dict(name="static_reentry", swaps=gate.swaps, skipped=gate.skipped, **stats))
+
+    counter = make_counter(hit_counter_test.DirectTestCounter, matrix, 32)
+    counter.count = 42
+    counter.mode = "manual"
+    counter.flashing = False
+    counter.input_buffer = ""
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = harness.time_call(counter.cancel_input, repeat)
+    results.append(dict(name="cancel_input_unchanged", swaps=counter.frames.swaps,
+                        skipped=counter.frames.skipped, **stats))
+    return results
+
+
+def bench_flash(matrix, duration):
+    # Manual input flashing on a paced matrix: typing a digit now and then
+    # while the two canvases alternate
+    counter = make_counter(hit_counter_test.DirectTestCounter, matrix, 32)
+    counter.flash.interval = counter.flash_interval = 0.5
+    counter.mode = "manual"
+    counter.flashing = False
+    counter.count = 0
+    counter.input_buffer = ""
+    with contextlib.redirect_stdout(io.StringIO()):
+        counter.start_input()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        digits = 0
+        while time.perf_counter() - wall_start < duration:
+            counter.input_buffer += str(digits % 10)
+            counter.update_display()
+            digits += 1
+            time.sleep(duration / 4)
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+        counter.cancel_input()
+    return dict(name="flash", wall_s=wall, cpu_s=cpu, cpu_percent=100.0 * cpu / wall,
+                toggles=counter.flash.toggles, renders=counter.flash.renders, inputs=digits,
+                framerate_fraction=counter.flash.framerate_fraction())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MatrixDisplay modes and counter rendering on a headless matrix")
+    parser.add_argument("--sizes", default=",".join(harness.PANEL_SIZES), help="Comma separated WxH panel sizes")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma separated MatrixDisplay modes")
+    parser.add_argument("--duration", default=2.0, type=float, help="Seconds to run each mode")
+    parser.add_argument("--speed", default=0.03, type=float, help="Scroll speed passed to the modes (0 for as fast as possible)")
+    parser.add_argument("--refresh-hz", default=120, type=int, help="Simulated panel refresh rate, 0 to disable vsync waits")
+    parser.add_argument("--repeat", default=20, type=int, help="Samples per latency measurement")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes.split(","):
+        width, height = harness.parse_panel_size(size)
+        matrix = harness.make_matrix(width, height, args.refresh_hz)
+        for mode in args.modes.split(","):
+            results.append(dict(panel=size, benchmark="mode", name=mode, **bench_mode(matrix, mode, args.duration, args.speed)))
+        results.append(dict(panel=size, benchmark="flash", **bench_flash(matrix, args.duration)))
+        # Latencies are measured without vsync waits so they show render cost
+        # rather than the simulated refresh clock
+        unpaced = harness.make_matrix(width, height, 0)
+        for entry in bench_render_paths(unpaced, args.repeat):
+            results.append(dict(panel=size, benchmark="render", **entry))
+        for entry in bench_counters(unpaced, args.repeat):
+            results.append(dict(panel=size, benchmark="counter", **entry))
+        for entry in bench_redundant(unpaced, args.repeat):
+            results.append(dict(panel=size, benchmark="redundant", **entry))
+
+    harness.report("display", results, args.output, duration=args.duration, speed=args.speed, refresh_hz=args.refresh_hz)
+
+
+if __name__ == "__main__":
+    main()
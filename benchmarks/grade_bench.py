@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Color grading per frame size: the LUT pass on a frame array, grading a PIL
+# frame (what the shm, stream and sync modes pay per frame), and building the
+# tables. Then, for a change of brightness at runtime, what MatrixDisplay
+# pays now (grading the frame it already has) against rendering the text or
+# fitting the image again.
+#
+#   python3 benchmarks/grade_bench.py --sizes 64x64,128x64,256x128
+import argparse
+import contextlib
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+import harness
+
+harness.stub_modules("board", "digitalio", "RPi.GPIO", "evdev", "keyboard")
+
+import display_bench
+from color_grade import ColorGrade
+
+
+def bench(width, height, args):
+    frame = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    image = Image.fromarray(frame)
+    out = np.empty_like(frame)
+    grade = ColorGrade(brightness=0.6, gamma=2.2, tint=(255, 230, 200))
+
+    matrix = harness.make_matrix(width, height)
+    display = display_bench.make_display(matrix, display_bench.LONG_TEXT)
+    with contextlib.redirect_stdout(io.StringIO()):
+        display.load_image(args.image)
+    photo = display._current_image
+    fitted = display.get_display_image()
+    text = display.create_text_image()
+
+    def regrade(source):
+        # A new grade misses the display's cache, as a real change does
+        def run():
+            display._grade = ColorGrade(brightness=0.5)
+            display._graded(source)
+        return run
+
+    return dict(
+        panel=f"{width}x{height}",
+        lut_pass=harness.time_call(lambda: grade.apply(frame, out), repeat=args.repeat),
+        grade_image=harness.time_call(lambda: grade.image(image), repeat=args.repeat),
+        build_tables=harness.time_call(lambda: ColorGrade(brightness=0.5, gamma=2.2, night=True), repeat=args.repeat),
+        brightness_change_text=harness.time_call(regrade(text), repeat=args.repeat),
+        rerender_text=harness.time_call(display.create_text_image, repeat=args.repeat),
+        brightness_change_image=harness.time_call(regrade(fitted), repeat=args.repeat),
+        refit_image=harness.time_call(lambda: display.fit_image(photo, (0, 0, 0)), repeat=args.repeat),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the color grading LUT stage per frame size")
+    parser.add_argument("--sizes", default=",".join(harness.PANEL_SIZES), help="Comma separated WxH panel sizes")
+    parser.add_argument("--image", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "logo.png"), help="Image for the image re-render comparison")
+    parser.add_argument("--repeat", default=50, type=int, help="Repetitions per timing")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = [bench(*harness.parse_panel_size(size), args) for size in args.sizes.split(",")]
+    harness.report("grade", results, args.output, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
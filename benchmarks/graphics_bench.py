@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# Microbenchmarks for graphics.MeasureText / DrawTextRuns against measuring
+# with one CharacterWidth call per character (and with the per-character cache
+# text_renderer's layout uses) and one DrawText call per label.
+#
+#   python3 benchmarks/graphics_bench.py --font 6x10.bdf -o graphics.json
+#   sudo RGBMATRIX_HEADLESS=0 python3 benchmarks/graphics_bench.py   # on a Pi
+import argparse
+
+import harness
+import matrix_backend
+import text_renderer
+
+TEXTS = {
+    "number": "1234",
+    "short": "Hello world!",
+    "long": ("Welcome to the gym! Warm up properly, clean the equipment after use "
+             "and ask a coach if you are unsure about any exercise. ") * 3,
+}
+LABELS = [1, 4, 16]
+
+
+def make_canvas(backend, width, height):
+    if backend.__name__ == "rgbmatrix_headless":
+        return harness.make_matrix(width, height).CreateFrameCanvas()
+    options = backend.RGBMatrixOptions()
+    options.rows = height
+    options.cols = width
+    return backend.RGBMatrix(options=options).CreateFrameCanvas()
+
+
+def per_char_width(font, text):
+    width = 0
+    for ch in text:
+        w = font.CharacterWidth(ord(ch))
+        if w > 0:
+            width += w
+    return width
+
+
+def bench_measure(graphics, font, bdf_font, repeat):
+    results = []
+    for label, text in TEXTS.items():
+        assert per_char_width(font, text) == graphics.MeasureText(font, text)[0] == bdf_font.text_width(text)
+        results.append(dict(name="measure", method="CharacterWidth", text=label,
+                            **harness.time_call(lambda: per_char_width(font, text), repeat)))
+        results.append(dict(name="measure", method="MeasureText", text=label,
+                            **harness.time_call(lambda: graphics.MeasureText(font, text), repeat)))
+        results.append(dict(name="measure", method="text_width", text=label,
+                            **harness.time_call(lambda: bdf_font.text_width(text), repeat)))
+    return results
+
+
+def bench_draw(graphics, font, canvas, repeat):
+    results = []
+    color = graphics.Color(255, 255, 0)
+    for count in LABELS:
+        runs = [(2, font.baseline + (i * font.height) % canvas.height, color, "Label %d" % i)
+                for i in range(count)]
+
+        def per_label():
+            for x, y, c, text in runs:
+                graphics.DrawText(canvas, font, x, y, c, text)
+
+        results.append(dict(name="draw", method="DrawText", labels=count,
+                            **harness.time_call(per_label, repeat)))
+        results.append(dict(name="draw", method="DrawTextRuns", labels=count,
+                            **harness.time_call(lambda: graphics.DrawTextRuns(canvas, font, runs), repeat)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MeasureText / DrawTextRuns microbenchmarks")
+    parser.add_argument("--font", default=text_renderer.DEFAULT_BDF_FONT, help="BDF font from fonts/")
+    parser.add_argument("--size", default="64x64", help="WxH of the canvas drawn to")
+    parser.add_argument("--repeat", default=200, type=int, help="Samples per measurement")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    backend = matrix_backend.load()
+    graphics = backend.graphics
+    font = graphics.Font()
+    font.LoadFont(text_renderer.font_file(args.font))
+    bdf_font = text_renderer.load_bdf_font(args.font)
+    canvas = make_canvas(backend, *harness.parse_panel_size(args.size))
+
+    results = bench_measure(graphics, font, bdf_font, args.repeat) + bench_draw(graphics, font, canvas, args.repeat)
+    harness.report("graphics", results, args.output, backend=backend.__name__, font=args.font, size=args.size)
+
+
+if __name__ == "__main__":
+    main()
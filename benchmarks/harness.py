@@ -0,0 +1,114 @@
+# Shared helpers for the benchmark scripts in this directory. Everything runs
+# against the headless matrix backend so the numbers can be produced on any
+# Linux box, and results are printed (or written) as JSON for tracking.
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import types
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/..'))
+os.environ.setdefault("RGBMATRIX_HEADLESS", "1")
+
+import rgbmatrix_headless
+
+PANEL_SIZES = ["64x64", "128x64", "128x128", "256x128"]
+
+
+def parse_panel_size(size):
+    width, height = (int(v) for v in size.lower().split("x"))
+    return width, height
+
+
+def make_matrix(width=64, height=64, refresh_hz=0):
+    # Chains 64x64 panels horizontally and in parallel rows, like the gym setup
+    options = rgbmatrix_headless.RGBMatrixOptions()
+    options.rows = 64 if height % 64 == 0 else height
+    options.cols = 64 if width % 64 == 0 else width
+    options.chain_length = width // options.cols
+    options.parallel = height // options.rows
+    matrix = rgbmatrix_headless.RGBMatrix(options=options)
+    matrix.refresh_rate_hz = refresh_hz
+    return matrix
+
+
+class _PlaceholderModule(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return None
+
+
+def stub_modules(*names):
+    # Placeholder modules for hardware-only imports (RPi.GPIO, evdev, ...)
+    # that the code under measurement never touches. Real modules win.
+    for name in names:
+        try:
+            __import__(name)
+            continue
+        except ImportError:
+            pass
+        parent = None
+        for part in name.split("."):
+            full = part if parent is None else parent.__name__ + "." + part
+            module = sys.modules.get(full)
+            if module is None:
+                module = _PlaceholderModule(full)
+                sys.modules[full] = module
+            if parent is not None:
+                setattr(parent, part, module)
+            parent = module
+
+
+def summarize(samples):
+    # Latency samples in seconds -> stats in milliseconds
+    ordered = sorted(samples)
+    if not ordered:
+        return {"n": 0}
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))] * 1000.0
+
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000.0,
+        "min_ms": ordered[0] * 1000.0,
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": ordered[-1] * 1000.0,
+    }
+
+
+def time_call(fn, repeat=20, warmup=2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def report(name, results, output=None, **meta):
+    document = {
+        "benchmark": name,
+        "meta": dict(
+            python=platform.python_version(),
+            machine=platform.machine(),
+            cpus=os.cpu_count(),
+            timestamp=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            **meta
+        ),
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return document
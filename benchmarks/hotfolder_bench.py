@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# Hot folder ingestion: --files photos in a temporary directory are picked up
+# by a MatrixDisplay watching it, with inotify and with polling. Reported per
+# watcher: how long the first pass over the folder takes, then for each of
+# --changes edits (a new file, a rewritten file, a deletion) the time from the
+# write to the rotation changing and how many files were decoded for it --
+# one at most, however many files the folder holds -- plus what one rescan
+# of the folder costs.
+#
+#   python3 benchmarks/hotfolder_bench.py --files 100,500 --changes 10
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+
+from PIL import Image
+
+import harness
+
+harness.stub_modules("board", "digitalio", "RPi.GPIO", "evdev", "keyboard")
+
+import display_bench
+from hot_folder import HotFolder
+
+
+def write_photo(path, size, shade):
+    Image.new("RGB", size, (shade % 256, 80, 255 - shade % 256)).save(path)
+
+
+def bench(watching, files, args):
+    matrix = harness.make_matrix(*harness.parse_panel_size(args.size))
+    display = display_bench.make_display(matrix)
+    photo_size = harness.parse_panel_size(args.photo_size)
+    changed = threading.Event()
+
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        for i in range(files):
+            write_photo(os.path.join(directory, f"photo{i:04d}.png"), photo_size, i)
+
+        def on_change():
+            display._folder_changed()
+            changed.set()
+
+        folder = HotFolder(directory, display._folder_item, on_change, args.interval,
+                           use_inotify=watching == "inotify")
+        display._hot_folder = folder
+        start = time.perf_counter()
+        folder.start()
+        while len(folder.items()) < files:
+            changed.wait(1.0)
+            changed.clear()
+        first_pass = time.perf_counter() - start
+
+        latencies = []
+        decoded = []
+        for n in range(args.changes):
+            action = ("add", "rewrite", "delete")[n % 3]
+            path = os.path.join(directory, f"photo{n % files:04d}.png")
+            if action == "add":
+                path = os.path.join(directory, f"new{n:04d}.png")
+            processed = folder.processed
+            changed.clear()
+            start = time.perf_counter()
+            if action == "delete":
+                os.unlink(path)
+            else:
+                write_photo(path, photo_size, n * 7 + 1)
+            if not changed.wait(args.interval * 3 + 5):
+                raise RuntimeError(f"{watching}: no change seen for {action}")
+            latencies.append(time.perf_counter() - start)
+            decoded.append(folder.processed - processed)
+
+        scan = harness.time_call(folder._scan, repeat=10, warmup=1)
+        folder.stop()
+
+    return dict(
+        watching=folder.watching,
+        files=files,
+        first_pass_s=first_pass,
+        files_per_second=files / first_pass,
+        change_latency=harness.summarize(latencies),
+        decoded_per_change=max(decoded),
+        unchanged_skipped=folder.unchanged,
+        rotation=len(display._playlist.items),
+        rescan_p50_ms=scan["p50_ms"],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure hot folder ingestion with inotify and polling")
+    parser.add_argument("--files", default="100,500", help="Comma separated folder sizes")
+    parser.add_argument("--changes", default=9, type=int, help="Edits per run: adds, rewrites and deletes in turn")
+    parser.add_argument("--watchers", default="inotify,poll", help="Comma separated: inotify, poll")
+    parser.add_argument("--interval", default=0.5, type=float, help="Rescan interval of the polling watcher")
+    parser.add_argument("--size", default="64x64", help="WxH panel size")
+    parser.add_argument("--photo-size", default="640x480", help="WxH of the photos")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = [bench(watching, int(files), args)
+               for watching in args.watchers.split(",") for files in args.files.split(",")]
+    harness.report("hotfolder", results, args.output, size=args.size, photo_size=args.photo_size,
+                   interval=args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# CPU and wakeups of an unchanging frame, before and after the idle mode kicks
+# in: the break beam counter (GPIO polling + main loop on fake_gpio) and
+# MatrixDisplay in static mode, both on the headless matrix. For each target
+# the process CPU (% of one core), loop wakeups per second and GPIO reads per
+# second are reported for the active and idle state, plus how long the next
+# change takes to bring it back to full rate.
+#
+#   python3 benchmarks/idle_bench.py --idle-after 2 --duration 5
+import argparse
+import contextlib
+import io
+import threading
+import time
+
+import harness
+import fake_gpio
+
+pins = fake_gpio.install()
+harness.stub_modules("evdev")
+
+import hit_counter
+from matrix_display import MatrixDisplay
+
+BEAM_PIN = 26
+
+
+def measure(idle, seconds):
+    # Wakeups counted by the idle monitor plus GPIO reads over one window
+    wakeups = sum(idle.wakeups.values())
+    reads = pins.reads
+    cpu = time.process_time()
+    start = time.perf_counter()
+    time.sleep(seconds)
+    elapsed = time.perf_counter() - start
+    return dict(
+        state=idle.state,
+        seconds=elapsed,
+        cpu_percent=100.0 * (time.process_time() - cpu) / elapsed,
+        wakeups_per_s=(sum(idle.wakeups.values()) - wakeups) / elapsed,
+        gpio_reads_per_s=(pins.reads - reads) / elapsed,
+        refresh_hz=getattr(idle.matrix, "refresh_rate_hz", None),
+    )
+
+
+def wait_until(condition, timeout):
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            return None
+        time.sleep(0.001)
+    return time.perf_counter() - start
+
+
+def bench_counter(args):
+    pins.reset()
+    with contextlib.redirect_stdout(io.StringIO()):
+        counter = hit_counter.BreakBeamCounter(logo_path="", debounce_time=0, idle_after=args.idle_after)
+        counter.matrix.refresh_rate_hz = args.refresh_hz
+        thread = threading.Thread(target=counter.run)
+        thread.daemon = True
+        thread.start()
+        time.sleep(0.1)
+
+        results = [measure(counter.idle, args.idle_after * 0.8)]
+        wait_until(lambda: counter.idle.idle, args.idle_after * 2)
+        results.append(measure(counter.idle, args.duration))
+
+        # A hit is the next change: time from the beam break to full rate
+        pins.set_level(BEAM_PIN, False)
+        snap_back = wait_until(lambda: not counter.idle.idle, 1.0)
+        pins.set_level(BEAM_PIN, True)
+        results.append(dict(state="snap_back", latency_ms=None if snap_back is None else snap_back * 1000.0,
+                            refresh_hz=counter.matrix.refresh_rate_hz, count=counter.count))
+
+        counter.running = False
+        thread.join(timeout=2.0)
+    return [dict(target="hit_counter", **entry) for entry in results]
+
+
+def bench_display(args):
+    pins.reset()
+    matrix = harness.make_matrix(64, 64, args.refresh_hz)
+    display = MatrixDisplay()
+    display.matrix = matrix
+    display.args = display.parser.parse_args([])
+    display._idle_after = args.idle_after
+    display._display_text = "Hello world!"
+    with contextlib.redirect_stdout(io.StringIO()):
+        display.start()
+        time.sleep(0.1)
+        idle = display._idle_power()
+
+        results = [measure(idle, args.idle_after * 0.8)]
+        wait_until(lambda: idle.idle, args.idle_after * 2)
+        results.append(measure(idle, args.duration))
+
+        # Switching to a scroll is the next change
+        swaps = matrix.swap_count
+        display.set_mode("scroll-h")
+        snap_back = wait_until(lambda: matrix.swap_count > swaps, 2.0)
+        results.append(dict(state="snap_back", latency_ms=None if snap_back is None else snap_back * 1000.0,
+                            refresh_hz=matrix.refresh_rate_hz))
+        display.stop()
+    return [dict(target="matrix_display_static", **entry) for entry in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CPU and wakeups of static content with and without idle mode")
+    parser.add_argument("--idle-after", default=2.0, type=float, help="Seconds without a frame change before going idle")
+    parser.add_argument("--duration", default=5.0, type=float, help="Seconds to measure the idle state")
+    parser.add_argument("--refresh-hz", default=120, type=int, help="Simulated panel refresh rate while active")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = bench_counter(args) + bench_display(args)
+    harness.report("idle", results, args.output, idle_after=args.idle_after, duration=args.duration,
+                   refresh_hz=args.refresh_hz)
+
+
+if __name__ == "__main__":
+    main()
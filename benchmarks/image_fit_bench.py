@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Fitting large images to the panel: what MatrixDisplay did before (decode
+# at full size, keep that, copy and LANCZOS it on every render) against
+# image_fit (draft() decode for JPEG, reduce() then LANCZOS, keep a preview).
+# Reported per source size, format and pipeline: the latency of loading and
+# fitting, the latency of a re-render from what was kept, how many bytes are
+# kept, and the peak memory of one load. tracemalloc doesn't see Pillow's
+# pixel buffers, so peak memory is the growth of the peak RSS (VmHWM) of a
+# freshly spawned process.
+#
+#   python3 benchmarks/image_fit_bench.py --sources 1000x750,4000x3000 --panel 64x64
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+from PIL import Image
+
+import harness
+from image_fit import fit, load_fitted
+
+
+def full_load(path, box):
+    image = Image.open(path).convert("RGB")
+    return full_fit(image, box), image
+
+
+def full_fit(image, box):
+    img = image.copy()
+    img.thumbnail(box, Image.LANCZOS)
+    frame = Image.new("RGB", box, (0, 0, 0))
+    frame.paste(img, ((box[0] - img.width) // 2, (box[1] - img.height) // 2))
+    return frame
+
+
+PIPELINES = {
+    "full": (full_load, full_fit),
+    "reduced": (lambda path, box: load_fitted(path, box, (0, 0, 0)), lambda image, box: fit(image, box, (0, 0, 0))),
+}
+
+
+def make_source(directory, size, format):
+    # A photo-like gradient with some noise, so JPEG and PNG sizes are
+    # realistic
+    path = os.path.join(directory, f"source-{size[0]}x{size[1]}.{format}")
+    noise = Image.effect_noise(size, 40).convert("RGB")
+    gradient = Image.radial_gradient("L").resize(size).convert("RGB")
+    options = {"quality": 90} if format == "jpg" else {}
+    Image.blend(gradient, noise, 0.3).save(path, **options)
+    return path
+
+
+def peak_rss_kb():
+    # VmHWM starts over with exec(), unlike ru_maxrss
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+
+
+def peak_memory(pipeline, path, box, results):
+    # Runs in a freshly spawned process
+    before = peak_rss_kb()
+    PIPELINES[pipeline][0](path, box)
+    results.put((peak_rss_kb() - before) / 1024.0)
+
+
+def bench(pipeline, path, source, format, box, args):
+    load, refit = PIPELINES[pipeline]
+    fitted, kept = load(path, box)
+    spawn = multiprocessing.get_context("spawn")
+    results = spawn.Queue()
+    process = spawn.Process(target=peak_memory, args=(pipeline, path, box, results))
+    process.start()
+    peak_mb = results.get(timeout=120)
+    process.join()
+    return dict(
+        pipeline=pipeline,
+        source=f"{source[0]}x{source[1]}",
+        format=format,
+        panel=f"{box[0]}x{box[1]}",
+        load=harness.time_call(lambda: load(path, box), repeat=args.repeat, warmup=1),
+        render=harness.time_call(lambda: refit(kept, box), repeat=args.repeat, warmup=1),
+        kept_bytes=kept.width * kept.height * 3 + fitted.width * fitted.height * 3,
+        peak_mb=peak_mb,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure fitting large images to the panel")
+    parser.add_argument("--sources", default="1000x750,4000x3000", help="Comma separated WxH source sizes")
+    parser.add_argument("--formats", default="jpg,png", help="Comma separated: jpg, png")
+    parser.add_argument("--panel", default="64x64", help="WxH panel size")
+    parser.add_argument("--repeat", default=5, type=int, help="Repetitions per timing")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    box = harness.parse_panel_size(args.panel)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for source in args.sources.split(","):
+            source = harness.parse_panel_size(source)
+            for format in args.formats.split(","):
+                path = make_source(directory, source, format)
+                for pipeline in PIPELINES:
+                    results.append(bench(pipeline, path, source, format, box, args))
+    harness.report("image_fit", results, args.output, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# CPU cost of waiting for the keypad in hit_counter_test: the old loop spinning
+# on keyboard.is_pressed() against the KeyboardEvents queue. A fake keyboard
+# module presses keys at --rate while the counter draws to the headless
+# matrix; reported are process CPU (as % of one core), the keys seen and the
+# key-down to frame latency.
+#
+#   python3 benchmarks/keyboard_bench.py --duration 5 --rate 4
+import argparse
+import bisect
+import contextlib
+import io
+import sys
+import threading
+import time
+import types
+
+import harness
+
+
+class FakeKeyboard(types.ModuleType):
+    # Just enough of the keyboard library: is_pressed() and hook()
+    def __init__(self):
+        super(FakeKeyboard, self).__init__("keyboard")
+        self.pressed = set()
+        self.hooks = []
+        self.lock = threading.Lock()
+
+    def is_pressed(self, name):
+        return name in self.pressed
+
+    def hook(self, callback):
+        with self.lock:
+            self.hooks.append(callback)
+        return callback
+
+    def unhook(self, callback):
+        with self.lock:
+            self.hooks.remove(callback)
+
+    def _send(self, event_type, name):
+        with self.lock:
+            hooks = list(self.hooks)
+        event = types.SimpleNamespace(event_type=event_type, name=name)
+        for callback in hooks:
+            callback(event)
+
+    def press(self, name):
+        self.pressed.add(name)
+        self._send("down", name)
+
+    def release(self, name):
+        self.pressed.discard(name)
+        self._send("up", name)
+
+
+kb = FakeKeyboard()
+sys.modules["keyboard"] = kb
+
+import hit_counter_test
+
+
+def spin_loop(counter, running):
+    # The loop hit_counter_test used before KeyboardEvents
+    plus = "-"
+    minus = "+"
+    while running[0]:
+        if kb.is_pressed(minus):
+            counter.decrement_counter()
+            while kb.is_pressed(minus):
+                pass
+        elif kb.is_pressed(plus):
+            counter.increment_counter()
+            while kb.is_pressed(plus):
+                pass
+
+
+def make_counter():
+    counter = hit_counter_test.DirectTestCounter(debounce_time=0)
+    counter.matrix.refresh_rate_hz = 0
+    swaps = []
+    swap = counter.matrix.SwapOnVSync
+
+    def timed_swap(canvas, *args):
+        result = swap(canvas, *args)
+        swaps.append(time.perf_counter())
+        return result
+
+    counter.matrix.SwapOnVSync = timed_swap
+    return counter, swaps
+
+
+def run_trial(mode, duration, rate, hold):
+    counter, swaps = make_counter()
+    running = [True]
+    if mode == "spin":
+        thread = threading.Thread(target=spin_loop, args=(counter, running))
+    else:
+        thread = threading.Thread(target=counter.check_for_keyboard_input)
+    thread.daemon = True
+    thread.start()
+    time.sleep(0.1)
+
+    presses = []
+    period = 1.0 / rate
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    next_press = start + period / 2
+    while next_press + hold < start + duration:
+        time.sleep(max(0.0, next_press - time.perf_counter()))
+        presses.append(time.perf_counter())
+        kb.press("-")
+        time.sleep(hold)
+        kb.release("-")
+        next_press += period
+    time.sleep(max(0.0, start + duration - time.perf_counter()))
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    running[0] = False
+    if counter.keyboard_events is not None:
+        counter.keyboard_events.stop()
+    thread.join(1.0)
+
+    latencies = []
+    for pressed in presses:
+        i = bisect.bisect_left(swaps, pressed)
+        if i < len(swaps):
+            latencies.append(swaps[i] - pressed)
+    return {
+        "mode": mode,
+        "presses": len(presses),
+        "counted": counter.count,
+        "cpu_percent": 100.0 * cpu / wall,
+        "latency": harness.summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", default="spin,events")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--rate", type=float, default=4.0, help="key presses per second")
+    parser.add_argument("--hold", type=float, default=0.08, help="seconds each key is held")
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = [run_trial(mode, args.duration, args.rate, args.hold)
+                   for mode in args.modes.split(",")]
+    harness.report("keyboard_bench", results, args.output,
+                   duration=args.duration, rate=args.rate, hold=args.hold)
+
+
+if __name__ == "__main__":
+    main()
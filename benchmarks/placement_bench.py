@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# Effect of thread placement on input latency jitter and scroll frame times.
+# A MatrixDisplay horizontal scroll runs in a "render" thread, an "input"
+# thread waits for events (like the keyboard queue and the GPIO edge
+# callbacks do) and --load busy processes compete for every core. Each
+# profile is a placement spec (see cpu_placement.py); reported per profile are
+# the event-to-wakeup latency and the interval between swaps, with their
+# standard deviations, plus the placement the threads ended up with.
+#
+# Meant for a 4-core Pi: the defaults keep core 3 for the library's refresh
+# thread and run SCHED_FIFO profiles, so run it as root.
+#
+#   sudo python3 benchmarks/placement_bench.py --duration 10 --load 4
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import statistics
+import threading
+import time
+
+import harness
+
+harness.stub_modules("board", "digitalio", "RPi.GPIO", "evdev", "keyboard")
+
+import display_bench
+from cpu_placement import Placement, describe_threads
+
+PROFILES = {
+    "none": "",
+    "pinned": "render={render};input={input}",
+    "nice": "render={render}:nice=-5;input={input}:nice=-10",
+    "fifo": "render={render}:fifo=10;input={input}:fifo=20",
+}
+
+
+def busy(stop):
+    while not stop.is_set():
+        pass
+
+
+def stats(samples):
+    result = harness.summarize(samples)
+    if len(samples) > 1:
+        result["stdev_ms"] = statistics.stdev(samples) * 1000.0
+    return result
+
+
+def run_trial(name, spec, args):
+    placement = Placement.parse(spec)
+    matrix = harness.make_matrix(args.width, args.height, 0)
+    display = display_bench.make_display(matrix, speed=args.speed)
+    display._display_mode = "scroll-h"
+    image = display.get_display_image()
+
+    swap_times = []
+    swap = matrix.SwapOnVSync
+
+    def timed_swap(canvas, framerate_fraction=1):
+        swap_times.append(time.perf_counter())
+        return swap(canvas, framerate_fraction)
+
+    matrix.SwapOnVSync = timed_swap
+
+    def render():
+        placement.apply("render")
+        display._scroll_horizontal(image, args.speed)
+
+    event = threading.Event()
+    fired = [None]
+    latencies = []
+    done = threading.Event()
+
+    def wait_for_input():
+        placement.apply("input")
+        while True:
+            event.wait()
+            woke = time.perf_counter()
+            if done.is_set():
+                return
+            event.clear()
+            latencies.append(woke - fired[0])
+
+    stop_load = multiprocessing.Event()
+    load = [multiprocessing.Process(target=busy, args=(stop_load,)) for _ in range(args.load)]
+    threads = [threading.Thread(target=render, name="render"), threading.Thread(target=wait_for_input, name="input")]
+    rng = random.Random(args.seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for process in load:
+            process.start()
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        time.sleep(0.2)
+        placement_threads = describe_threads()
+
+        start = time.perf_counter()
+        while time.perf_counter() - start < args.duration:
+            time.sleep(rng.uniform(0.5, 1.5) / args.rate)
+            fired[0] = time.perf_counter()
+            event.set()
+
+        done.set()
+        event.set()
+        display._stop_event.set()
+        for thread in threads:
+            thread.join(timeout=2.0)
+        stop_load.set()
+        for process in load:
+            process.join()
+
+    intervals = [b - a for a, b in zip(swap_times, swap_times[1:])]
+    return dict(
+        profile=name,
+        spec=spec,
+        input_latency=stats(latencies),
+        frame_time=stats(intervals),
+        applied=placement.applied,
+        threads=placement_threads,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure input jitter and scroll frame times under different thread placements")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma separated profiles: " + ", ".join(PROFILES))
+    parser.add_argument("--spec", action="append", default=[], help="Extra NAME=SPEC profile, e.g. 'mine=render=0;input=1:nice=-5'")
+    parser.add_argument("--render-cpus", default="1", help="Cores for the render thread in the built-in profiles")
+    parser.add_argument("--input-cpus", default="2", help="Cores for the input thread in the built-in profiles")
+    parser.add_argument("--load", default=os.cpu_count(), type=int, help="Busy processes competing for the cores")
+    parser.add_argument("--duration", default=5.0, type=float, help="Seconds per profile")
+    parser.add_argument("--rate", default=50.0, type=float, help="Input events per second")
+    parser.add_argument("--speed", default=0.01, type=float, help="Scroll speed (sleep between frames)")
+    parser.add_argument("--size", default="64x64", help="Panel size WxH")
+    parser.add_argument("--seed", default=1, type=int)
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+    args.width, args.height = harness.parse_panel_size(args.size)
+
+    profiles = [(name, PROFILES[name].format(render=args.render_cpus, input=args.input_cpus))
+                for name in args.profiles.split(",") if name]
+    for extra in args.spec:
+        name, _, spec = extra.partition("=")
+        profiles.append((name, spec))
+
+    results = [run_trial(name, spec, args) for name, spec in profiles]
+    harness.report("placement", results, args.output, duration=args.duration, load=args.load,
+                   rate=args.rate, speed=args.speed, size=args.size,
+                   available_cpus=sorted(os.sched_getaffinity(0)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# Playlist slot boundaries: a MatrixDisplay in playlist mode on a headless
+# panel rotates through static and scrolling text, a large photo, an animated
+# GIF and a clock, each for --slot seconds. Reported per panel size: how far
+# from its boundary each slot's first frame went up (lateness), slots later
+# than one refresh, slots whose prefetch wasn't done in time, and how long
+# preparing each kind of item takes -- the gap a slot would open without the
+# prefetch.
+#
+#   python3 benchmarks/playlist_bench.py --sizes 64x64,128x64 --duration 10
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from PIL import Image
+
+import harness
+
+harness.stub_modules("board", "digitalio", "RPi.GPIO", "evdev", "keyboard")
+
+import display_bench
+from playlist import PlaylistItem, prepare
+
+
+def make_media(directory, photo_size):
+    # A photo far larger than the panel, and a 12-frame GIF
+    photo = os.path.join(directory, "photo.png")
+    Image.radial_gradient("L").resize(photo_size).convert("RGB").save(photo)
+    animation = os.path.join(directory, "animation.gif")
+    frames = [Image.new("RGB", (96, 96), (i * 20, 255 - i * 20, 128)) for i in range(12)]
+    frames[0].save(animation, save_all=True, append_images=frames[1:], duration=80, loop=0)
+    return photo, animation
+
+
+def make_items(photo, animation, slot, speed):
+    return [
+        PlaylistItem("text", "Welcome to the gym!", slot),
+        PlaylistItem("text", display_bench.LONG_TEXT, slot, mode="scroll-h", speed=speed),
+        PlaylistItem("image", photo, slot),
+        PlaylistItem("animation", animation, slot),
+        PlaylistItem("clock", "%H:%M:%S", slot),
+        PlaylistItem("text", "Closing at 22:00", slot, mode="scroll-up", speed=speed),
+    ]
+
+
+def bench(width, height, items, args):
+    matrix = harness.make_matrix(width, height, args.refresh_hz)
+    display = display_bench.make_display(matrix)
+    display.args = display.parser.parse_args([])
+    display._display_mode = "playlist"
+    display.set_playlist(items)
+    playlist = display._playlist
+
+    prepare_ms = {}
+    for item in items:
+        key = item.kind if item.kind != "text" else f"text {item.mode}"
+        prepare_ms[key] = harness.time_call(lambda: prepare(display, item), repeat=args.repeat, warmup=1)["p50_ms"]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        cpu = time.process_time()
+        display.start()
+        time.sleep(args.duration)
+        display.stop()
+        cpu = time.process_time() - cpu
+
+    return dict(
+        panel=f"{width}x{height}",
+        boundaries=playlist.boundaries,
+        lateness=harness.summarize([abs(late) for late in playlist.lateness]),
+        late=playlist.late,
+        unready=playlist.unready,
+        errors=playlist.errors,
+        prepare_p50_ms=prepare_ms,
+        cpu_percent=100.0 * cpu / args.duration,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure playlist slot-boundary lateness per panel size")
+    parser.add_argument("--sizes", default=",".join(harness.PANEL_SIZES), help="Comma separated WxH panel sizes")
+    parser.add_argument("--duration", default=6.0, type=float, help="Seconds of playlist per panel size")
+    parser.add_argument("--slot", default=0.5, type=float, help="Seconds per playlist item")
+    parser.add_argument("--speed", default=0.02, type=float, help="Scroll speed of the scrolling items")
+    parser.add_argument("--photo-size", default="3000x2000", help="WxH of the photo item")
+    parser.add_argument("--repeat", default=5, type=int, help="Repetitions when timing prepare()")
+    parser.add_argument("--refresh-hz", default=120, type=int, help="Simulated panel refresh rate")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        photo, animation = make_media(directory, harness.parse_panel_size(args.photo_size))
+        items = make_items(photo, animation, args.slot, args.speed)
+        for size in args.sizes.split(","):
+            results.append(bench(*harness.parse_panel_size(size), items, args))
+    harness.report("playlist", results, args.output, duration=args.duration, slot=args.slot,
+                   photo_size=args.photo_size, refresh_hz=args.refresh_hz)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# Frame recording: file size and what it costs the display path, per panel
+# size. Three runs per size, all on headless panels:
+#   counter  hit_counter_v2 counting up, each value swapped --swaps-per-hit
+#            times like a display that re-swaps an unchanged frame; the
+#            per-change cost gives an estimated size for an hour of counting
+#            at --hits-per-hour
+#   scroll   MatrixDisplay scrolling text for --duration seconds, every
+#            frame different, as a worst case
+#   swap     SwapOnVSync latency with and without a recorder attached
+#
+#   python3 benchmarks/record_bench.py --sizes 64x64,128x64 --hits-per-hour 600
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+import harness
+
+harness.stub_modules("board", "digitalio", "RPi.GPIO", "evdev", "keyboard")
+
+import display_bench
+import hit_counter_v2
+from frame_recorder import FrameRecorder, FrameRecording, HEADER, RECORD, KIND_DELTA
+
+
+def bench_counter(width, height, args, path):
+    matrix = harness.make_matrix(width, height, 0)
+    recorder = FrameRecorder(path, width, height, keyframe_interval=args.keyframe_interval)
+    recorder.attach(matrix)
+    counter = display_bench.make_counter(hit_counter_v2.DirectTestCounter, matrix, 56)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for value in range(args.hits):
+            for _ in range(args.swaps_per_hit):
+                # Forgetting makes the gate swap the same frame again
+                counter.frames.forget()
+                counter.display_number(value)
+    recorder.close()
+
+    recording = FrameRecording(path)
+    stats = recording.stats()
+    delta_bytes = [RECORD.size + len(p) for kind, t, r, p in recording.records() if kind == KIND_DELTA]
+    delta = sum(delta_bytes) / max(1, len(delta_bytes))
+    # The only keyframe is the blank panel, so size one of the last value
+    last_frame = None
+    for t, last_frame in recording.frames():
+        pass
+    keyframe = RECORD.size + len(zlib.compress(last_frame, recorder.level))
+    # A keyframe at most every keyframe_interval seconds, and only when the
+    # value changes
+    keyframes_per_hour = min(args.hits_per_hour, 3600.0 / args.keyframe_interval)
+    per_hour = (HEADER.size + RECORD.size + keyframes_per_hour * keyframe
+                + (args.hits_per_hour - keyframes_per_hour) * delta)
+    return dict(
+        run="counter",
+        panel=f"{width}x{height}",
+        swaps=stats["swaps"],
+        changes=stats["keyframes"] + stats["deltas"],
+        dropped=recorder.dropped,
+        file_bytes=stats["bytes"],
+        raw_bytes=stats["swaps"] * width * height * 3,
+        keyframe_bytes=keyframe,
+        delta_bytes=delta,
+        hits_per_hour=args.hits_per_hour,
+        estimated_bytes_per_hour=per_hour,
+    )
+
+
+def bench_scroll(width, height, args, path):
+    matrix = harness.make_matrix(width, height, args.refresh_hz)
+    recorder = FrameRecorder(path, width, height, keyframe_interval=args.keyframe_interval)
+    recorder.attach(matrix)
+    display = display_bench.make_display(matrix, display_bench.LONG_TEXT, args.speed)
+    display._display_mode = "scroll-h"
+    image = display.get_display_image()
+    thread = threading.Thread(target=display._scroll_horizontal, args=(image, args.speed))
+    thread.daemon = True
+    with contextlib.redirect_stdout(io.StringIO()):
+        cpu = time.process_time()
+        start = time.perf_counter()
+        thread.start()
+        time.sleep(args.duration)
+        display._stop_event.set()
+        thread.join()
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+    recorder.close()
+    stats = FrameRecording(path).stats()
+    return dict(
+        run="scroll",
+        panel=f"{width}x{height}",
+        swaps=stats["swaps"],
+        changes=stats["keyframes"] + stats["deltas"],
+        dropped=recorder.dropped,
+        file_bytes=stats["bytes"],
+        raw_bytes=stats["swaps"] * width * height * 3,
+        bytes_per_hour=stats["bytes"] * 3600.0 / elapsed,
+        cpu_percent=100.0 * cpu / elapsed,
+    )
+
+
+def bench_swap(width, height, args, path):
+    results = []
+    for recording in (False, True):
+        matrix = harness.make_matrix(width, height, 0)
+        recorder = None
+        if recording:
+            recorder = FrameRecorder(path, width, height, keyframe_interval=args.keyframe_interval)
+            recorder.attach(matrix)
+        canvases = [matrix.CreateFrameCanvas(), matrix.CreateFrameCanvas()]
+        canvases[1].Fill(255, 0, 0)
+        # Alternates two different frames so every swap is a change, paced
+        # at --swap-rate so the writer sees a realistic load
+        samples = []
+        for n in range(args.swaps):
+            start = time.perf_counter()
+            matrix.SwapOnVSync(canvases[n % 2])
+            samples.append(time.perf_counter() - start)
+            time.sleep(1.0 / args.swap_rate)
+        stats = harness.summarize(samples)
+        if recorder is not None:
+            recorder.close()
+        results.append(dict(run="swap", panel=f"{width}x{height}", recording=recording,
+                            dropped=recorder.dropped if recorder else 0, **stats))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure frame recording size and overhead")
+    parser.add_argument("--sizes", default=",".join(harness.PANEL_SIZES), help="Comma separated WxH panel sizes")
+    parser.add_argument("--hits", default=200, type=int, help="Counter values recorded in the counter run")
+    parser.add_argument("--swaps-per-hit", default=20, type=int, help="Swaps of each unchanged counter frame")
+    parser.add_argument("--hits-per-hour", default=600, type=int, help="Counter changes per hour for the estimate")
+    parser.add_argument("--keyframe-interval", default=60.0, type=float, help="Seconds between keyframes")
+    parser.add_argument("--duration", default=3.0, type=float, help="Seconds of scrolling")
+    parser.add_argument("--speed", default=0.03, type=float, help="Scroll speed")
+    parser.add_argument("--swaps", default=1000, type=int, help="Swaps timed per swap run")
+    parser.add_argument("--swap-rate", default=240.0, type=float, help="Swaps per second in the swap run")
+    parser.add_argument("--refresh-hz", default=120, type=int, help="Simulated panel refresh rate for the scroll run")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes.split(","):
+            width, height = harness.parse_panel_size(size)
+            path = os.path.join(directory, f"{width}x{height}.frames")
+            results.append(bench_counter(width, height, args, path))
+            results.append(bench_scroll(width, height, args, path))
+            results.extend(bench_swap(width, height, args, path))
+    harness.report("record", results, args.output, keyframe_interval=args.keyframe_interval,
+                   hits_per_hour=args.hits_per_hour, refresh_hz=args.refresh_hz)
+
+
+if __name__ == "__main__":
+    main()
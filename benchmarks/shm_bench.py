@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# Sustained frame rate through the shared framebuffer: a producer process
+# publishes RGB24 frames (as fast as it can, or at --fps) while MatrixDisplay
+# runs in shm mode on a headless panel. Reported per panel size are the
+# producer's and the display's frame rates, frames skipped because a newer
+# one was already there, frames dropped because the producer lapped the
+# display mid-copy, and the display process's CPU.
+#
+#   python3 benchmarks/shm_bench.py --sizes 64x64,128x128 --duration 5
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+
+import harness
+
+harness.stub_modules("board", "digitalio", "RPi.GPIO", "evdev", "keyboard")
+
+import display_bench
+from shm_framebuffer import SharedFramebuffer
+
+
+def produce(name, duration, fps, ready, published):
+    framebuffer = SharedFramebuffer.attach(name)
+    height, width = framebuffer.height, framebuffer.width
+    # A moving gradient, precomputed so the producer cost is just the copy
+    frames = []
+    for shift in range(0, 256, 8):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = (np.arange(width)[None, :] + shift) % 256
+        frame[..., 1] = np.arange(height)[:, None] % 256
+        frame[..., 2] = shift
+        frames.append(frame)
+    ready.set()
+    start = time.perf_counter()
+    n = 0
+    while time.perf_counter() - start < duration:
+        framebuffer.write(frames[n % len(frames)])
+        n += 1
+        if fps:
+            delay = start + n / fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    published.value = n
+    framebuffer.close()
+
+
+def bench_size(width, height, args):
+    name = f"rgbmatrix-bench-{os.getpid()}-{width}x{height}"
+    matrix = harness.make_matrix(width, height, args.refresh_hz)
+    display = display_bench.make_display(matrix)
+    display._display_mode = "shm"
+    display._shm_name = name
+    framebuffer = display._shared_framebuffer()
+
+    ready = multiprocessing.Event()
+    published = multiprocessing.Value("q", 0)
+    producer = multiprocessing.Process(target=produce, args=(name, args.duration, args.fps, ready, published))
+    thread = threading.Thread(target=display._shared_frames)
+    thread.daemon = True
+    with contextlib.redirect_stdout(io.StringIO()):
+        thread.start()
+        producer.start()
+        if not ready.wait(timeout=30.0):
+            raise RuntimeError("Producer didn't start")
+        swaps = matrix.swap_count
+        cpu = time.process_time()
+        start = time.perf_counter()
+        producer.join()
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+        time.sleep(0.05)
+        display._stop_event.set()
+        thread.join()
+
+    shown = matrix.swap_count - swaps
+    result = dict(
+        panel=f"{width}x{height}",
+        target_fps=args.fps,
+        producer_fps=published.value / elapsed,
+        display_fps=shown / elapsed,
+        published=published.value,
+        shown=shown,
+        skipped=max(0, published.value - shown - framebuffer.dropped),
+        dropped=framebuffer.dropped,
+        display_cpu_percent=100.0 * cpu / elapsed,
+    )
+    framebuffer.close()
+    framebuffer.unlink()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure frames per second from a separate producer through the shared framebuffer")
+    parser.add_argument("--sizes", default=",".join(harness.PANEL_SIZES), help="Comma separated WxH panel sizes")
+    parser.add_argument("--duration", default=3.0, type=float, help="Seconds of production per size")
+    parser.add_argument("--fps", default=0.0, type=float, help="Producer frame rate, 0 for as fast as possible")
+    parser.add_argument("--refresh-hz", default=120, type=int, help="Simulated panel refresh rate, 0 to disable vsync waits")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = [bench_size(*harness.parse_panel_size(size), args) for size in args.sizes.split(",")]
+    harness.report("shm", results, args.output, duration=args.duration, fps=args.fps, refresh_hz=args.refresh_hz)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# Frames through MatrixDisplay's stream mode: a producer process writes RGB24
+# frames into a FIFO (as fast as it can, or at --producer-fps) while the
+# display reads them on a headless panel, showing them as they arrive or at
+# --fps. Reported per panel size and framing are frames written, received,
+# skipped as stale, shown, the display's frame rate and its CPU, and whether
+# the panel ended up showing the last frame written (every frame is one
+# flat gray, so its top-left pixel tells which one it was).
+#
+#   python3 benchmarks/stream_bench.py --sizes 64x64,128x64 --duration 3
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import struct
+import tempfile
+import threading
+import time
+
+import harness
+
+harness.stub_modules("board", "digitalio", "RPi.GPIO", "evdev", "keyboard")
+
+import display_bench
+
+
+SHADES = list(range(0, 256, 16))
+
+
+def produce(path, frame_bytes, framing, duration, fps, written):
+    frames = [bytes([shade]) * frame_bytes for shade in SHADES]
+    if framing == "length":
+        frames = [struct.pack("<I", frame_bytes) + frame for frame in frames]
+    with open(path, "wb", buffering=0) as pipe:
+        start = time.perf_counter()
+        n = 0
+        while time.perf_counter() - start < duration:
+            pipe.write(frames[n % len(frames)])
+            n += 1
+            if fps:
+                delay = start + n / fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+    written.value = n
+
+
+def bench(width, height, framing, args, directory):
+    path = os.path.join(directory, f"frames-{width}x{height}-{framing}")
+    os.mkfifo(path)
+    matrix = harness.make_matrix(width, height, args.refresh_hz)
+    display = display_bench.make_display(matrix)
+    display._display_mode = "stream"
+    display._stream_source = path
+    display._stream_fps = args.fps
+    display._stream_framing = framing
+    stream = display._frame_stream()
+
+    written = multiprocessing.Value("q", 0)
+    producer = multiprocessing.Process(target=produce, args=(path, stream.frame_bytes, framing, args.duration,
+                                                             args.producer_fps, written))
+    thread = threading.Thread(target=display._stream_frames)
+    thread.daemon = True
+    with contextlib.redirect_stdout(io.StringIO()):
+        thread.start()
+        swaps = matrix.swap_count
+        cpu = time.process_time()
+        start = time.perf_counter()
+        producer.start()
+        producer.join()
+        # Let the display catch up with what is still in the pipe
+        while stream.available() >= stream.record_bytes and time.perf_counter() - start < args.duration + 2:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+        display._stop_event.set()
+        thread.join()
+
+    shown = matrix.swap_count - swaps
+    last_shade = SHADES[(written.value - 1) % len(SHADES)]
+    stream.close()
+    os.unlink(path)
+    return dict(
+        panel=f"{width}x{height}",
+        framing=framing,
+        fps=args.fps,
+        producer_fps=args.producer_fps,
+        written=written.value,
+        received=stream.received,
+        dropped=stream.dropped,
+        shown=shown,
+        display_fps=shown / elapsed,
+        display_cpu_percent=100.0 * cpu / elapsed,
+        last_frame_shown=matrix.GetPixel(0, 0) == (last_shade,) * 3,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure MatrixDisplay's stream mode fed through a FIFO")
+    parser.add_argument("--sizes", default=",".join(harness.PANEL_SIZES), help="Comma separated WxH panel sizes")
+    parser.add_argument("--framings", default="raw,length", help="Comma separated framings")
+    parser.add_argument("--duration", default=3.0, type=float, help="Seconds of production per run")
+    parser.add_argument("--fps", default=0.0, type=float, help="Display pacing, 0 to show frames as they arrive")
+    parser.add_argument("--producer-fps", default=0.0, type=float, help="Producer frame rate, 0 for as fast as possible")
+    parser.add_argument("--refresh-hz", default=120, type=int, help="Simulated panel refresh rate, 0 to disable vsync waits")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes.split(","):
+            width, height = harness.parse_panel_size(size)
+            for framing in args.framings.split(","):
+                results.append(bench(width, height, framing, args, directory))
+    harness.report("stream", results, args.output, duration=args.duration, fps=args.fps,
+                   producer_fps=args.producer_fps, refresh_hz=args.refresh_hz)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# Frame sync on loopback: one coordinator renders on a headless panel and
+# sends its frames to --agents agent processes, each a MatrixDisplay in sync
+# mode on its own headless panel, over UDP and over TCP. Reported per
+# transport and content: frames and bytes sent, bandwidth per agent, how far
+# after its presentation time each frame went up (skew), the spread between
+# the first and the last agent to show the same frame, and the frames that
+# agents skipped, lost or showed late.
+#
+#   python3 benchmarks/sync_bench.py --agents 4 --duration 5 --content scroll,counter
+import argparse
+import contextlib
+import io
+import multiprocessing
+import threading
+import time
+
+import harness
+
+harness.stub_modules("board", "digitalio", "RPi.GPIO", "evdev", "keyboard")
+
+import display_bench
+import hit_counter_v2
+from frame_sync import FrameSender
+
+
+def run_agent(transport, width, height, refresh_hz, ports, stop, results):
+    matrix = harness.make_matrix(width, height, refresh_hz)
+    display = display_bench.make_display(matrix)
+    display._display_mode = "sync"
+    display._sync_listen = f"{transport}://127.0.0.1:0"
+    with contextlib.redirect_stdout(io.StringIO()):
+        receiver = display._frame_receiver()
+        receiver.present_log = []
+        thread = threading.Thread(target=display._sync_frames)
+        thread.daemon = True
+        thread.start()
+        ports.put(receiver.address[1])
+        stop.wait()
+        display._stop_event.set()
+        thread.join()
+        receiver.close()
+    results.put(dict(
+        log=receiver.present_log,
+        skews=list(receiver.skews),
+        received=receiver.received,
+        bytes_received=receiver.bytes_received,
+        skipped=receiver.skipped,
+        broken=receiver.broken,
+        incomplete=receiver.incomplete,
+        late=receiver.late,
+    ))
+
+
+def drive_scroll(matrix, args, stop):
+    display = display_bench.make_display(matrix, display_bench.LONG_TEXT, args.speed)
+    display._display_mode = "scroll-h"
+    image = display.get_display_image()
+    thread = threading.Thread(target=display._scroll_horizontal, args=(image, args.speed))
+    thread.daemon = True
+    thread.start()
+    stop.wait()
+    display._stop_event.set()
+    thread.join()
+
+
+def drive_counter(matrix, args, stop):
+    counter = display_bench.make_counter(hit_counter_v2.DirectTestCounter, matrix, 56)
+    value = 0
+    while not stop.wait(args.hit_interval):
+        value += 1
+        counter.display_number(value)
+
+
+CONTENT = {"scroll": drive_scroll, "counter": drive_counter}
+
+
+def bench(transport, content, width, height, args):
+    ports = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    agents = [multiprocessing.Process(target=run_agent, args=(transport, width, height, args.refresh_hz,
+                                                               ports, stop, results))
+              for _ in range(args.agents)]
+    for agent in agents:
+        agent.start()
+    targets = [f"{transport}://127.0.0.1:{ports.get(timeout=30)}" for _ in agents]
+
+    matrix = harness.make_matrix(width, height, args.refresh_hz)
+    sender = FrameSender(targets, width, height, lead=args.lead)
+    sender.attach(matrix)
+    driving = threading.Event()
+    with contextlib.redirect_stdout(io.StringIO()):
+        driver = threading.Thread(target=CONTENT[content], args=(matrix, args, driving))
+        driver.start()
+        time.sleep(args.duration)
+        driving.set()
+        driver.join()
+    sender.close()
+    time.sleep(args.lead + 0.2)
+    stop.set()
+    reports = [results.get(timeout=30) for _ in agents]
+    for agent in agents:
+        agent.join()
+
+    # When each agent put up each frame, for the spread between agents
+    shown = {}
+    for report in reports:
+        for seq, at in report["log"]:
+            shown.setdefault(seq, []).append(at)
+    spreads = [(max(times) - min(times)) / 1e9 for times in shown.values() if len(times) == len(reports)]
+    skews = [skew for report in reports for skew in report["skews"]]
+    return dict(
+        transport=transport,
+        content=content,
+        panel=f"{width}x{height}",
+        agents=args.agents,
+        frames_sent=sender.frames_sent,
+        keyframes=sender.keyframes,
+        deltas=sender.deltas,
+        dropped=sender.dropped,
+        bytes_sent=sender.bytes_sent,
+        kbytes_per_second_per_agent=sender.bytes_sent / args.duration / args.agents / 1000.0,
+        raw_kbytes_per_second_per_agent=sender.frames_sent * width * height * 3 / args.duration / 1000.0,
+        received=sum(r["received"] for r in reports),
+        shown_by_all=len(spreads),
+        skipped=sum(r["skipped"] for r in reports),
+        broken=sum(r["broken"] for r in reports),
+        incomplete=sum(r["incomplete"] for r in reports),
+        late=sum(r["late"] for r in reports),
+        skew=harness.summarize(skews),
+        spread=harness.summarize(spreads),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure frame sync skew and bandwidth with agents on loopback")
+    parser.add_argument("--agents", default=3, type=int, help="Agent processes")
+    parser.add_argument("--transports", default="udp,tcp", help="Comma separated transports")
+    parser.add_argument("--content", default="scroll,counter", help="Comma separated: scroll, counter")
+    parser.add_argument("--size", default="64x64", help="WxH panel size")
+    parser.add_argument("--duration", default=3.0, type=float, help="Seconds of content per run")
+    parser.add_argument("--lead", default=0.1, type=float, help="Seconds between a swap on the coordinator and its presentation")
+    parser.add_argument("--speed", default=0.03, type=float, help="Scroll speed")
+    parser.add_argument("--hit-interval", default=0.5, type=float, help="Seconds between counter changes")
+    parser.add_argument("--refresh-hz", default=120, type=int, help="Simulated panel refresh rate")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    width, height = harness.parse_panel_size(args.size)
+    results = [bench(transport, content, width, height, args)
+               for transport in args.transports.split(",") for content in args.content.split(",")]
+    harness.report("sync", results, args.output, duration=args.duration, lead=args.lead, refresh_hz=args.refresh_hz)
+
+
+if __name__ == "__main__":
+    main()
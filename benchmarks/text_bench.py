@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# Per-frame text cost of the Pillow path against the native BDF renderer
+# (text_renderer.py) for MatrixDisplay, the counters and the clock.
+#
+#   python3 benchmarks/text_bench.py --sizes 64x64,128x64 -o text.json
+#
+# The BDF numbers come from rgbmatrix_headless.graphics, which draws glyphs
+# pixel by pixel in Python; the C++ DrawText on a Pi is much cheaper, so treat
+# them as an upper bound.
+import argparse
+import contextlib
+import io
+import os
+import time
+
+import harness
+import display_bench
+import text_renderer
+
+from PIL import Image, ImageDraw, ImageFont
+
+COUNTER_FONTS = "texgyre-27.bdf,10x20.bdf,6x10.bdf"
+CLOCK_COLOR = (0, 191, 255)
+
+
+def time_font_load(name):
+    text_renderer._fonts.clear()
+    start = time.perf_counter()
+    text_renderer.load_bdf_font(name)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def bench_display(matrix, repeat, bdf_font):
+    results = []
+    canvas = matrix.CreateFrameCanvas()
+    for renderer in text_renderer.TEXT_RENDERERS:
+        for label, text in (("short", display_bench.SHORT_TEXT), ("long", display_bench.LONG_TEXT)):
+            display = display_bench.make_display(matrix, text=text)
+            display._text_renderer = text_renderer.make_text_renderer(renderer, bdf_font)
+
+            # Text changed: lay out / render and put it on the panel
+            def text_frame():
+                display._blit(canvas, display.create_text_image(), [(0, 0)])
+
+            results.append(dict(name="text_frame", renderer=renderer, text=label,
+                                **harness.time_call(text_frame, repeat)))
+
+            # One scroll step of already rendered text
+            frame = display.create_text_image()
+            width, height = frame.size
+            tiled = display._tile(frame, (width, height * 2), (0, height))
+            positions = [(0, -1), (0, -1 + height)]
+            results.append(dict(name="scroll_frame", renderer=renderer, text=label,
+                                **harness.time_call(lambda: display._blit(canvas, tiled, positions), repeat)))
+    return results
+
+
+def bench_counters(matrix, repeat):
+    results = []
+    for renderer in text_renderer.TEXT_RENDERERS:
+        fonts = text_renderer.make_text_renderer(renderer, COUNTER_FONTS)
+        for name, cls, font_size in display_bench.COUNTERS:
+            counter = display_bench.make_counter(cls, matrix, font_size, fonts)
+            for value in display_bench.COUNTER_VALUES:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stats = harness.time_call(lambda: display_bench.redraw(counter, value), repeat)
+                results.append(dict(name="display_number", renderer=renderer, counter=name,
+                                    value=str(value), **stats))
+    return results
+
+
+def bench_clock(matrix, repeat, bdf_font):
+    canvas = matrix.CreateFrameCanvas()
+    font = ImageFont.truetype(next(p for p in display_bench.FONT_PATHS if os.path.exists(p)), 14)
+    time_str = "12:34:56"
+
+    def pil_frame():
+        # clock_example's loop body
+        width, height = matrix.width, matrix.height
+        image = Image.new('RGB', (width, height), (0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        text_bbox = draw.textbbox((0, 0), time_str, font=font)
+        position = ((width - (text_bbox[2] - text_bbox[0])) // 2, (height - (text_bbox[3] - text_bbox[1])) // 2)
+        draw.text(position, time_str, font=font, fill=CLOCK_COLOR)
+        canvas.SetImage(image.convert('RGB'))
+
+    bdf = text_renderer.BDFTextRenderer(bdf_font)
+    return [
+        dict(name="clock_frame", renderer="pil", **harness.time_call(pil_frame, repeat)),
+        dict(name="clock_frame", renderer="bdf",
+             **harness.time_call(lambda: bdf.draw_centered(canvas, time_str, CLOCK_COLOR), repeat)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Pillow and BDF text rendering per frame")
+    parser.add_argument("--sizes", default=",".join(harness.PANEL_SIZES), help="Comma separated WxH panel sizes")
+    parser.add_argument("--bdf-font", default=text_renderer.DEFAULT_BDF_FONT, help="BDF font for MatrixDisplay and the clock")
+    parser.add_argument("--repeat", default=20, type=int, help="Samples per measurement")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    font_load_ms = time_font_load(args.bdf_font)
+    results = []
+    for size in args.sizes.split(","):
+        width, height = harness.parse_panel_size(size)
+        matrix = harness.make_matrix(width, height, 0)
+        for entry in bench_display(matrix, args.repeat, args.bdf_font):
+            results.append(dict(panel=size, benchmark="display", **entry))
+        for entry in bench_counters(matrix, args.repeat):
+            results.append(dict(panel=size, benchmark="counter", **entry))
+        for entry in bench_clock(matrix, args.repeat, args.bdf_font):
+            results.append(dict(panel=size, benchmark="clock", **entry))
+
+    harness.report("text", results, args.output, bdf_font=args.bdf_font,
+                   font_load_ms=font_load_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# Screen transitions per panel size and kind: the cost of one blend frame,
+# how long the first frame takes to reach the panel (its vsync wait
+# included), and the frame rate a transition actually holds against the one
+# it asks for (with the largest gap between two swaps). Then what
+# hit_counter_v2's change_mode costs its caller: it used to sleep through the
+# logo, now it returns once the transition thread has the logo.
+#
+#   python3 benchmarks/transition_bench.py --sizes 64x64,128x64 --refresh-hz 120
+import argparse
+import contextlib
+import io
+import os
+import time
+
+import numpy as np
+
+import harness
+
+harness.stub_modules("board", "digitalio", "RPi.GPIO", "evdev", "keyboard")
+
+import display_bench
+import hit_counter_v2
+from frame_gate import FrameGate
+from transition import Transition, TRANSITIONS, blend, blend_frames
+
+
+class SwapTimes(FrameGate):
+    # Stamps every swap that reaches the matrix
+    def __init__(self, matrix):
+        super(SwapTimes, self).__init__(matrix)
+        self.times = []
+
+    def swap(self, canvas, key=None, framerate_fraction=1):
+        canvas = super(SwapTimes, self).swap(canvas, key, framerate_fraction)
+        self.times.append(time.monotonic())
+        return canvas
+
+
+def playback(matrix, kind, outgoing, incoming, args):
+    frames = SwapTimes(matrix)
+    transition = Transition(frames, kind, args.duration, args.fps)
+    start = time.monotonic()
+    transition.play(outgoing, incoming, ("bench", kind))
+    gaps = np.diff(frames.times)
+    return dict(
+        first_frame_ms=(frames.times[0] - start) * 1000.0,
+        frames=len(frames.times),
+        target_fps=transition.refresh_hz / transition.framerate_fraction(),
+        achieved_fps=len(gaps) / (frames.times[-1] - frames.times[0]),
+        max_gap_ms=float(gaps.max()) * 1000.0,
+    )
+
+
+def bench(width, height, args):
+    rng = np.random.default_rng(0)
+    outgoing = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    incoming = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    out = np.empty_like(incoming)
+    matrix = harness.make_matrix(width, height, args.refresh_hz)
+
+    results = []
+    for kind in TRANSITIONS:
+        results.append(dict(
+            panel=f"{width}x{height}",
+            kind=kind,
+            blend=harness.time_call(lambda: blend(kind, outgoing, incoming, 0.5, out), repeat=args.repeat),
+            first_blend=harness.time_call(lambda: next(blend_frames(kind, outgoing, incoming, 18)), repeat=args.repeat),
+            **playback(matrix, kind, outgoing, incoming, args)
+        ))
+    return results
+
+
+def change_mode(args):
+    # The counter's own __init__ claims GPIO, so display_bench builds it
+    matrix = harness.make_matrix(64, 64, args.refresh_hz)
+    counter = display_bench.make_counter(hit_counter_v2.DirectTestCounter, matrix, 56)
+    counter.logo_path = args.logo
+    counter.mode = "beam"
+    counter.count = 42
+    counter.total_strength_value = 120
+    returned = []
+    value_up = []
+    for _ in range(args.mode_changes):
+        with contextlib.redirect_stdout(io.StringIO()):
+            counter.display_beam_value()
+            start = time.monotonic()
+            counter.change_mode()
+            returned.append(time.monotonic() - start)
+            # Logo in, hold, value in: all on the one transition thread
+            while counter.transition.running:
+                time.sleep(0.001)
+            value_up.append(time.monotonic() - start)
+            counter.mode = "beam"
+    return dict(
+        name="change_mode",
+        returns=harness.summarize(returned),
+        value_up=harness.summarize(value_up),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure screen transitions")
+    parser.add_argument("--sizes", default=",".join(harness.PANEL_SIZES), help="Comma separated WxH panel sizes")
+    parser.add_argument("--refresh-hz", default=120, type=int, help="Simulated panel refresh rate (0 for no vsync wait)")
+    parser.add_argument("--fps", default=60, type=int, help="Transition frame rate")
+    parser.add_argument("--duration", default=0.3, type=float, help="Transition length in seconds")
+    parser.add_argument("--logo", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "logo.png"), help="Logo for the change_mode timing")
+    parser.add_argument("--mode-changes", default=3, type=int, help="change_mode calls to time")
+    parser.add_argument("--repeat", default=50, type=int, help="Repetitions per timing")
+    parser.add_argument("-o", "--output", default=None, help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes.split(","):
+        results.extend(bench(*harness.parse_panel_size(size), args))
+    results.append(change_mode(args))
+    harness.report("transition", results, args.output, repeat=args.repeat, fps=args.fps, refresh_hz=args.refresh_hz)
+
+
+if __name__ == "__main__":
+    main()
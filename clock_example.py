@@ -6,14 +6,123 @@ from datetime import datetime
 from samplebase import SampleBase
 from PIL import Image, ImageDraw, ImageFont
 import os
+from frame_gate import FrameGate
+from text_renderer import TEXT_RENDERERS, DEFAULT_BDF_FONT, make_text_renderer, make_color, draw_runs
 
 class ClockDisplay(SampleBase):
     def __init__(self, *args, **kwargs):
         super(ClockDisplay, self).__init__(*args, **kwargs)
+        self.parser.add_argument("--text-renderer", help="Text rendering: 'pil' (TrueType via Pillow) or 'bdf' (native BDF fonts)", choices=TEXT_RENDERERS, default="pil")
+        self.parser.add_argument("--bdf-font", help="BDF font from fonts/ for the bdf renderer", default=DEFAULT_BDF_FONT)
+        self.parser.add_argument("--tick-aligned", action="store_true", help="Update exactly on second boundaries, redrawing only the digits that changed")
+        self.parser.add_argument("--quiet", action="store_true", help="Don't print the time every second")
+    
+    def wait_for_next_second(self, last_second):
+        # The delay to the next wall-clock second is recomputed on every tick
+        # (so there is no drift and clock steps are picked up) and slept on the
+        # monotonic clock
+        while True:
+            now = time.time()
+            second = int(now)
+            if second != last_second:
+                return second
+            deadline = time.monotonic() + (second + 1 - now)
+            remaining = deadline - time.monotonic()
+            while remaining > 0:
+                time.sleep(remaining)
+                remaining = deadline - time.monotonic()
+    
+    def make_digit_sprites(self, font, color, bg_color=(0, 0, 0)):
+        # One fixed-width cell per character, so digits never shift around
+        measure = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+        boxes = {ch: measure.textbbox((0, 0), ch, font=font) for ch in "0123456789:"}
+        top = min(box[1] for box in boxes.values())
+        bottom = max(box[3] for box in boxes.values())
+        digit_width = max(boxes[ch][2] - boxes[ch][0] for ch in "0123456789")
+        
+        sprites = {}
+        for ch, box in boxes.items():
+            cell_width = box[2] - box[0] if ch == ":" else digit_width
+            sprite = Image.new('RGB', (cell_width, bottom - top), bg_color)
+            draw = ImageDraw.Draw(sprite)
+            draw.text(((cell_width - (box[2] - box[0])) // 2 - box[0], -top), ch, font=font, fill=color)
+            sprites[ch] = sprite
+        return sprites
+    
+    def make_bdf_digit_cells(self, font, color, bg_color=(0, 0, 0)):
+        # The same fixed-width cells for a BDF font: a background patch clears
+        # the cell and the glyph is drawn over it
+        digit_width = max(font.char_width(ch) for ch in "0123456789")
+        color = make_color(color)
+        cells = {}
+        for ch in "0123456789:":
+            cell_width = font.char_width(ch) if ch == ":" else digit_width
+            blank = Image.new('RGB', (cell_width, font.height), bg_color)
+            offset = (cell_width - font.char_width(ch)) // 2
+            cells[ch] = (blank, offset)
+        
+        def draw_cell(canvas, ch, x, y):
+            blank, offset = cells[ch]
+            canvas.SetImage(blank, x, y)
+            draw_runs(canvas, font.font, [(x + offset, y + font.baseline, color, ch)])
+        
+        widths = {ch: blank.width for ch, (blank, offset) in cells.items()}
+        return widths, font.height, draw_cell
+    
+    def run_tick_aligned(self, font, color=(0, 191, 255), text_renderer=None):
+        if text_renderer is None:
+            sprites = self.make_digit_sprites(font, color)
+            cell_widths = {ch: sprite.width for ch, sprite in sprites.items()}
+            cell_height = sprites["0"].height
+            
+            def draw_cell(canvas, ch, x, y):
+                canvas.SetImage(sprites[ch], x, y)
+        else:
+            cell_widths, cell_height, draw_cell = self.make_bdf_digit_cells(text_renderer.font, color)
+        
+        # Cell positions of "HH:MM:SS", centered
+        widths = [cell_widths[ch] for ch in "00:00:00"]
+        x = (self.matrix.width - sum(widths)) // 2
+        y = (self.matrix.height - cell_height) // 2
+        positions = []
+        for width in widths:
+            positions.append(x)
+            x += width
+        
+        # What each of the two buffers shows: after a swap we get back the
+        # frame from two seconds ago, so digits are compared against that
+        # buffer's contents. The buffers are told apart by alternation, since
+        # SwapOnVSync may hand back a new wrapper object each time.
+        shown = [None, None]
+        back = 0
+        canvas = self.matrix.CreateFrameCanvas()
+        second = None
+        print("Starting tick-aligned clock...")
+        try:
+            while True:
+                second = self.wait_for_next_second(second)
+                time_str = datetime.fromtimestamp(second).strftime("%H:%M:%S")
+                if not self.args.quiet:
+                    print(f"Current time: {time_str}")
+                
+                previous = shown[back]
+                if previous is None:
+                    canvas.Clear()
+                for i, ch in enumerate(time_str):
+                    if previous is None or previous[i] != ch:
+                        draw_cell(canvas, ch, positions[i], y)
+                shown[back] = time_str
+                canvas = self.matrix.SwapOnVSync(canvas)
+                back ^= 1
+                
+        except KeyboardInterrupt:
+            print("Interrupted by user")
     
     def run(self):
+        self.placement.apply("render")
         # Create a canvas to draw on
         offscreen_canvas = self.matrix.CreateFrameCanvas()
+        text_renderer = make_text_renderer(self.args.text_renderer, self.args.bdf_font)
         
         # Try to load a font
         font = None
@@ -38,12 +147,29 @@ class ClockDisplay(SampleBase):
             print("Using default font")
             font = ImageFont.load_default()
         
+        if self.args.tick_aligned:
+            self.run_tick_aligned(font, text_renderer=text_renderer)
+            return
+        
+        frames = FrameGate(self.matrix)
         print("Starting clock display loop...")
         try:
             while True:
                 now = datetime.now()
                 time_str = now.strftime("%H:%M:%S")
-                print(f"Current time: {time_str}")
+                key = ("time", time_str)
+                if frames.already_showing(key):
+                    # time.sleep(1) drifted and woke within the same second
+                    time.sleep(1)
+                    continue
+                if not self.args.quiet:
+                    print(f"Current time: {time_str}")
+                
+                if text_renderer is not None:
+                    text_renderer.draw_centered(offscreen_canvas, time_str, (0, 191, 255))
+                    offscreen_canvas = frames.swap(offscreen_canvas, key)
+                    time.sleep(1)
+                    continue
                 
                 width, height = self.matrix.width, self.matrix.height
                 image = Image.new('RGB', (width, height), (0, 0, 0))
@@ -57,7 +183,7 @@ class ClockDisplay(SampleBase):
                 draw.text(position, time_str, font=font, fill=(0, 191, 255))
                 
                 offscreen_canvas.SetImage(image.convert('RGB'))
-                offscreen_canvas = self.matrix.SwapOnVSync(offscreen_canvas)
+                offscreen_canvas = frames.swap(offscreen_canvas, key)
                 
                 time.sleep(1)
                 
@@ -0,0 +1,61 @@
+# Brightness, gamma, tint and night mode for MatrixDisplay, as one 256-entry
+# lookup table per channel that finished frames go through just before they
+# are uploaded. Changing any of them rebuilds three small tables and re-grades
+# the frame with one NumPy pass; text isn't rasterized again and images
+# aren't decoded again.
+#
+#   grade = ColorGrade(brightness=0.5, gamma=2.2, tint=(255, 220, 180))
+#   frame = grade.image(frame)          # PIL image, RGB
+#   grade.apply(array, out)             # height x width x 3 uint8 arrays
+#
+# Text drawn straight into the canvas (the BDF renderer) has no frame to
+# grade; its colors go through the same tables with grade.color().
+import numpy as np
+from PIL import Image
+
+NEUTRAL_TINT = (255, 255, 255)
+# Night mode: dimmed, with the blue pulled down
+NIGHT_BRIGHTNESS = 0.3
+NIGHT_TINT = (255, 160, 96)
+
+
+class ColorGrade(object):
+    def __init__(self, brightness=1.0, gamma=1.0, tint=NEUTRAL_TINT, night=False):
+        # out = 255 * brightness * (tint / 255) * (in / 255) ** gamma per
+        # channel, with night mode's brightness and tint on top
+        if brightness < 0:
+            raise ValueError("Brightness can't be negative")
+        if gamma <= 0:
+            raise ValueError("Gamma has to be positive")
+        self.brightness = brightness
+        self.gamma = gamma
+        self.tint = tuple(tint)
+        self.night = night
+
+        scale = brightness * np.array(self.tint, dtype=np.float64) / 255.0
+        if night:
+            scale *= NIGHT_BRIGHTNESS * np.array(NIGHT_TINT, dtype=np.float64) / 255.0
+        curve = (np.arange(256, dtype=np.float64) / 255.0) ** gamma
+        self.lut = np.clip(np.rint(scale[:, None] * curve[None, :] * 255.0), 0, 255).astype(np.uint8)
+        self.identity = bool((self.lut == np.arange(256, dtype=np.uint8)).all())
+
+    def apply(self, frame, out=None):
+        # Grades a height x width x 3 uint8 array into out (a new array if
+        # None; frame itself works too) and returns it
+        if out is None:
+            out = np.empty_like(frame)
+        for channel in range(3):
+            np.take(self.lut[channel], frame[..., channel], out=out[..., channel])
+        return out
+
+    def image(self, image):
+        # A graded copy of an RGB image; image itself when nothing changes
+        if self.identity:
+            return image
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return Image.fromarray(self.apply(np.asarray(image)))
+
+    def color(self, color):
+        # An (r, g, b) tuple, graded
+        return tuple(int(self.lut[channel][value]) for channel, value in enumerate(color))
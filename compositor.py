@@ -0,0 +1,163 @@
+# Layered screens for the counters and displays. A frame is a stack of layers
+# (background or logo, value text, overlays); each layer renders its pixels
+# only when its inputs change and keeps them as NumPy arrays, and the frame
+# is only re-blended from the lowest layer that changed upwards.
+#
+#   screen = Compositor(64, 64)
+#   screen.add_layer("logo", load_logo, blend=OPAQUE)
+#   screen.add_layer("value", render_text, blend=COLORKEY)
+#   screen.update("value", text="42")
+#   screen.draw(canvas)
+import numpy as np
+from PIL import Image
+
+OPAQUE = "opaque"
+COLORKEY = "colorkey"
+ALPHA = "alpha"
+BLEND_MODES = [OPAQUE, COLORKEY, ALPHA]
+
+
+class Layer(object):
+    def __init__(self, name, render, blend=COLORKEY, colorkey=(0, 0, 0), position=(0, 0), visible=True):
+        if blend not in BLEND_MODES:
+            raise ValueError(f"Unknown blend mode: {blend}")
+        # render(**inputs) returns a PIL image (RGB, or RGBA for ALPHA) or an
+        # HxWx3 / HxWx4 uint8 array
+        self.name = name
+        self.render = render
+        self.blend = blend
+        self.colorkey = np.array(colorkey, dtype=np.uint8)
+        self.position = position
+        self.visible = visible
+        self.inputs = None
+        self.renders = 0
+        self._rgb = None
+        self._mask = None
+
+    def set_inputs(self, inputs):
+        if inputs == self.inputs:
+            return False
+        self.inputs = inputs
+        self._rgb = None
+        return True
+
+    def pixels(self):
+        if self._rgb is None:
+            self._rgb, self._mask = self._prepare(self.render(**(self.inputs or {})))
+            self.renders += 1
+        return self._rgb, self._mask
+
+    def _prepare(self, rendered):
+        if isinstance(rendered, Image.Image):
+            if self.blend == ALPHA and rendered.mode != "RGBA":
+                rendered = rendered.convert("RGBA")
+            elif self.blend != ALPHA and rendered.mode != "RGB":
+                rendered = rendered.convert("RGB")
+        array = np.asarray(rendered, dtype=np.uint8)
+        if array.ndim == 2:
+            array = np.repeat(array[:, :, None], 3, axis=2)
+
+        rgb = np.ascontiguousarray(array[:, :, :3])
+        if self.blend == COLORKEY:
+            return rgb, np.any(rgb != self.colorkey, axis=2)
+        if self.blend == ALPHA:
+            if array.shape[2] == 4:
+                alpha = array[:, :, 3:4].astype(np.uint16)
+            else:
+                alpha = np.full(rgb.shape[:2] + (1,), 255, dtype=np.uint16)
+            return rgb, alpha
+        return rgb, None
+
+    def blend_onto(self, frame):
+        rgb, mask = self.pixels()
+        x, y = self.position
+        height, width = frame.shape[:2]
+        # Clip the layer to the frame
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(width, x + rgb.shape[1]), min(height, y + rgb.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        src = rgb[y0 - y:y1 - y, x0 - x:x1 - x]
+        dst = frame[y0:y1, x0:x1]
+        if self.blend == OPAQUE:
+            dst[...] = src
+        elif self.blend == COLORKEY:
+            np.copyto(dst, src, where=mask[y0 - y:y1 - y, x0 - x:x1 - x, None])
+        else:
+            alpha = mask[y0 - y:y1 - y, x0 - x:x1 - x]
+            dst[...] = (src * alpha + dst * (255 - alpha) + 127) // 255
+
+
+class Compositor(object):
+    def __init__(self, width, height, background=(0, 0, 0)):
+        self.width = width
+        self.height = height
+        self.layers = []
+        self._by_name = {}
+        self._base = np.empty((height, width, 3), dtype=np.uint8)
+        self._base[...] = background
+        # _composites[i] is the frame with layers[0..i] blended in; entries
+        # from _dirty_from on are stale
+        self._composites = []
+        self._dirty_from = 0
+        self.version = 0
+        self.recomposites = 0
+
+    def add_layer(self, name, render, **kwargs):
+        layer = Layer(name, render, **kwargs)
+        self.layers.append(layer)
+        self._by_name[name] = layer
+        self._composites.append(None)
+        self._mark(len(self.layers) - 1)
+        return layer
+
+    def layer(self, name):
+        return self._by_name[name]
+
+    def _mark(self, index):
+        self._dirty_from = min(self._dirty_from, index)
+
+    def update(self, name, visible=None, **inputs):
+        # Returns True if the frame has to be recomposited
+        layer = self._by_name[name]
+        index = self.layers.index(layer)
+        changed = False
+        if visible is not None and visible != layer.visible:
+            layer.visible = visible
+            changed = True
+        if inputs and layer.set_inputs(inputs):
+            changed = changed or layer.visible
+        if changed:
+            self._mark(index)
+        return changed
+
+    def invalidate(self):
+        # Forces every layer to render again on the next compose()
+        for layer in self.layers:
+            layer._rgb = None
+        self._mark(0)
+
+    @property
+    def dirty(self):
+        return self._dirty_from < len(self.layers)
+
+    def compose(self):
+        count = len(self.layers)
+        if self._dirty_from < count:
+            frame = self._base if self._dirty_from == 0 else self._composites[self._dirty_from - 1]
+            for i in range(self._dirty_from, count):
+                layer = self.layers[i]
+                if layer.visible:
+                    frame = frame.copy()
+                    layer.blend_onto(frame)
+                self._composites[i] = frame
+            self._dirty_from = count
+            self.version += 1
+            self.recomposites += 1
+        return self._composites[-1] if count else self._base
+
+    def image(self):
+        return Image.fromarray(self.compose(), "RGB")
+
+    def draw(self, canvas):
+        canvas.SetImage(self.image())
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# Control a running MatrixDisplay from other processes. An asyncio server on
+# its own thread, on a Unix socket or loopback TCP, reads newline-delimited
+# JSON requests and answers each with one line:
+#
+#   {"id": 1, "set": {"text": "Go!", "color": [255, 0, 0], "mode": "scroll-h"}}
+#   {"id": 1, "ok": true, "version": 7}
+#   {"id": 2, "get": true}
+#   {"id": 2, "ok": true, "settings": {"text": "Go!", ...}}
+#   {"id": 3, "set": {"mode": "sideways"}}
+#   {"id": 3, "ok": false, "error": "Unknown mode: sideways"}
+#
+# A "set" is one MatrixDisplay.update(): all of its settings land together
+# and cost one re-render. Settings are only assigned under the display's
+# lock, and images and fonts are loaded on worker threads first, so neither
+# the display thread nor other clients wait on a slow request.
+#
+#   python3 matrix_display.py --mode static --control /tmp/matrix.sock
+#   python3 control_server.py /tmp/matrix.sock --set text=Go! --set color=255,0,0
+import argparse
+import asyncio
+import functools
+import json
+import os
+import socket
+import stat
+import threading
+
+CONTROL_ENV = "RGBMATRIX_CONTROL"
+MAX_REQUEST_BYTES = 65536
+# Settings that read files, applied on a worker thread
+SLOW_SETTINGS = {"image", "text_renderer"}
+
+
+def parse_address(address):
+    # "tcp://host:port" -> ("tcp", (host, port)); "unix:PATH" or a plain
+    # path -> ("unix", PATH)
+    if address.startswith("tcp://"):
+        host, colon, port = address[len("tcp://"):].rpartition(":")
+        if not colon:
+            raise ValueError(f"Expected tcp://host:port, got {address!r}")
+        return "tcp", (host, int(port))
+    if address.startswith("unix:"):
+        address = address[len("unix:"):]
+    return "unix", address
+
+
+class ControlServer(object):
+    def __init__(self, display, address):
+        self.display = display
+        self.transport, self.address = parse_address(address)
+        self.loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+        self.clients = 0
+        self.requests = 0
+        self.errors = 0
+
+    def start(self):
+        # Returns once the socket is listening; False if it couldn't be opened
+        self._thread = threading.Thread(target=self._run, name="control-server")
+        self._thread.daemon = True
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            print(f"Error starting control server: {self._error}")
+            return False
+        return True
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self._listen())
+        except (OSError, ValueError) as e:
+            self._error = e
+            self._ready.set()
+            self.loop.close()
+            return
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self._server.close()
+            self.loop.run_until_complete(self._server.wait_closed())
+            self.loop.close()
+
+    async def _listen(self):
+        if self.transport == "tcp":
+            self._server = await asyncio.start_server(self._client, *self.address, limit=MAX_REQUEST_BYTES)
+            self.address = self._server.sockets[0].getsockname()[:2]
+        else:
+            # A socket left behind by an earlier run that didn't shut down
+            if os.path.exists(self.address) and stat.S_ISSOCK(os.stat(self.address).st_mode):
+                os.unlink(self.address)
+            self._server = await asyncio.start_unix_server(self._client, self.address, limit=MAX_REQUEST_BYTES)
+
+    async def _client(self, reader, writer):
+        self.clients += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Longer than MAX_REQUEST_BYTES
+                    writer.write(b'{"ok": false, "error": "Request too long"}\n')
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                reply = await self.handle(line)
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def handle(self, line):
+        self.requests += 1
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("A request is a JSON object")
+            request_id = request.get("id")
+            reply = {"id": request_id, "ok": True}
+            changes = request.get("set")
+            if changes is not None:
+                if not isinstance(changes, dict):
+                    raise ValueError('"set" takes an object of settings')
+                if SLOW_SETTINGS.intersection(changes):
+                    await self.loop.run_in_executor(None, functools.partial(self.display.update, **changes))
+                else:
+                    self.display.update(**changes)
+                reply["version"] = self.display._render_version
+            if request.get("get"):
+                reply["settings"] = self.display.settings()
+            return reply
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError too
+            self.errors += 1
+            return {"id": request_id, "ok": False, "error": str(e)}
+
+    def stop(self):
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=2.0)
+        if self.transport == "unix" and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+def request(address, message, timeout=5.0):
+    # One request from a script or the shell; returns the reply
+    transport, address = parse_address(address)
+    family = socket.AF_INET if transport == "tcp" else socket.AF_UNIX
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.sendall(json.dumps(message).encode() + b"\n")
+        with sock.makefile("rb") as replies:
+            return json.loads(replies.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Change the settings of a running MatrixDisplay")
+    parser.add_argument("address", help="The display's --control address: a Unix socket path or tcp://host:port")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="A setting to change, e.g. text=Hello or color=255,0,0; all of them change at once")
+    parser.add_argument("--get", action="store_true", help="Print the current settings")
+    args = parser.parse_args()
+
+    message = {"id": 1}
+    if args.set:
+        changes = {}
+        for item in args.set:
+            name, sep, value = item.partition("=")
+            if not sep:
+                parser.error(f"Expected NAME=VALUE, got {item!r}")
+            try:
+                changes[name] = json.loads(value)
+            except ValueError:
+                changes[name] = value
+        message["set"] = changes
+    if args.get or not args.set:
+        message["get"] = True
+    reply = request(args.address, message)
+    print(json.dumps(reply, indent=2))
+    if not reply.get("ok"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
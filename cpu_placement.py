@@ -0,0 +1,155 @@
+# CPU placement for the Python render and input threads. A placement spec
+# names a role, the cores its threads may run on and optionally a scheduling
+# policy:
+#
+#   render=1:fifo=40;input=2:nice=-5
+#
+# pins threads that apply the "render" role to core 1 with SCHED_FIFO
+# priority 40, and "input" threads to core 2 at nice -5. Cores take lists and
+# ranges ("0,2" or "0-1"). Each thread calls apply(role) itself, since
+# affinity, policy and nice are per thread on Linux. The library's refresh
+# thread is left alone; on a 4-core Pi it sits on core 3, so keep the Python
+# threads off it.
+#
+# The spec comes from --placement (SampleBase scripts), the counters'
+# placement= argument or the RGBMATRIX_PLACEMENT environment variable.
+import os
+import threading
+
+PLACEMENT_ENV = "RGBMATRIX_PLACEMENT"
+ROLES = ["render", "input"]
+
+_POLICY_NAMES = {
+    getattr(os, "SCHED_OTHER", 0): "other",
+    getattr(os, "SCHED_FIFO", 1): "fifo",
+    getattr(os, "SCHED_RR", 2): "rr",
+    getattr(os, "SCHED_BATCH", 3): "batch",
+    getattr(os, "SCHED_IDLE", 5): "idle",
+}
+
+
+def parse_cpus(text):
+    cpus = set()
+    for part in text.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.update(range(int(first), int(last) + 1))
+        elif part:
+            cpus.add(int(part))
+    return cpus
+
+
+def format_cpus(cpus):
+    return ",".join(str(cpu) for cpu in sorted(cpus))
+
+
+class ThreadPlacement(object):
+    def __init__(self, cpus=None, fifo=None, nice=None):
+        self.cpus = cpus
+        self.fifo = fifo
+        self.nice = nice
+
+    @classmethod
+    def parse(cls, text):
+        # "1-2:fifo=40" or "3:nice=-5" (cores may be left empty: ":nice=5")
+        parts = text.split(":")
+        placement = cls(cpus=parse_cpus(parts[0]) if parts[0] else None)
+        for option in parts[1:]:
+            key, _, value = option.partition("=")
+            if key == "fifo":
+                placement.fifo = int(value)
+            elif key == "nice":
+                placement.nice = int(value)
+            else:
+                raise ValueError(f"Unknown placement option: {option}")
+        return placement
+
+    def apply(self):
+        # Applies to the calling thread; failures are reported, not raised
+        errors = []
+        tid = threading.get_native_id()
+        if self.cpus:
+            try:
+                os.sched_setaffinity(0, self.cpus)
+            except OSError as e:
+                errors.append(f"affinity {format_cpus(self.cpus)}: {e}")
+        if self.fifo is not None:
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.fifo))
+            except OSError as e:
+                errors.append(f"SCHED_FIFO {self.fifo}: {e}")
+        if self.nice is not None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, tid, self.nice)
+            except OSError as e:
+                errors.append(f"nice {self.nice}: {e}")
+        return errors
+
+
+def describe_thread(tid):
+    # What the kernel says a thread of this process actually got
+    info = dict(tid=tid)
+    try:
+        with open(f"/proc/self/task/{tid}/comm") as f:
+            info["name"] = f.read().strip()
+        info["cpus"] = format_cpus(os.sched_getaffinity(tid))
+        info["policy"] = _POLICY_NAMES.get(os.sched_getscheduler(tid), "unknown")
+        info["priority"] = os.sched_getparam(tid).sched_priority
+        info["nice"] = os.getpriority(os.PRIO_PROCESS, tid)
+    except OSError:
+        # The thread exited while we looked
+        pass
+    return info
+
+
+def describe_threads():
+    # Every thread in the process, including the library's refresh thread
+    return [describe_thread(int(tid)) for tid in sorted(os.listdir("/proc/self/task"), key=int)]
+
+
+class Placement(object):
+    def __init__(self, roles=None):
+        self.roles = roles or {}
+        self.applied = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec):
+        roles = {}
+        for entry in (spec or "").split(";"):
+            entry = entry.strip()
+            if not entry:
+                continue
+            role, _, text = entry.partition("=")
+            if role not in ROLES:
+                raise ValueError(f"Unknown thread role: {role} (expected one of {', '.join(ROLES)})")
+            roles[role] = ThreadPlacement.parse(text)
+        return cls(roles)
+
+    @classmethod
+    def from_env(cls):
+        return cls.parse(os.environ.get(PLACEMENT_ENV, ""))
+
+    def __bool__(self):
+        return bool(self.roles)
+
+    def apply(self, role):
+        # Called by a thread when it starts; returns what it ended up with
+        placement = self.roles.get(role)
+        if placement is None:
+            return None
+        errors = placement.apply()
+        info = describe_thread(threading.get_native_id())
+        info.update(role=role, thread=threading.current_thread().name, errors=errors)
+        with self._lock:
+            self.applied.append(info)
+        print(f"Placement {role} ({info['thread']}, tid {info['tid']}): cpus {info.get('cpus')} "
+              f"policy {info.get('policy')} priority {info.get('priority')} nice {info.get('nice')}")
+        for error in errors:
+            print(f"Placement {role} failed: {error}")
+        return info
+
+    def report(self):
+        with self._lock:
+            applied = list(self.applied)
+        return dict(applied=applied, threads=describe_threads())
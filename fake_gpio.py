@@ -0,0 +1,194 @@
+# Software GPIO for running the counters without a Pi. install() registers
+# stand-ins for RPi.GPIO, board and digitalio in sys.modules, all backed by
+# one FakePins object that tests and load generators drive with set_level().
+# Pins idle high like the pulled-up beam inputs; a broken beam reads low.
+import bisect
+import sys
+import threading
+import time
+import types
+
+
+class FakePins(object):
+    def __init__(self):
+        self._levels = {}
+        self._lock = threading.Lock()
+        self._edge_callbacks = {}
+        self.reads = 0
+        # Set to {} to record perf_counter() of every read, keyed by pin
+        self.read_log = None
+
+    def set_level(self, pin, level):
+        level = bool(level)
+        with self._lock:
+            previous = self._levels.get(pin, True)
+            self._levels[pin] = level
+            callbacks = list(self._edge_callbacks.get(pin, ()))
+        if previous == level:
+            return
+        edge = RISING if level else FALLING
+        for wanted, callback in callbacks:
+            if wanted in (edge, BOTH):
+                callback(pin)
+
+    def read(self, pin):
+        self.reads += 1
+        if self.read_log is not None:
+            self.read_log.setdefault(pin, []).append(time.perf_counter())
+        return self._levels.get(pin, True)
+
+    def add_edge_callback(self, pin, edge, callback):
+        with self._lock:
+            self._edge_callbacks.setdefault(pin, []).append((edge, callback))
+
+    def remove_edge_callbacks(self, pin=None):
+        with self._lock:
+            if pin is None:
+                self._edge_callbacks.clear()
+            else:
+                self._edge_callbacks.pop(pin, None)
+
+    def watched_pins(self):
+        with self._lock:
+            return [pin for pin, callbacks in self._edge_callbacks.items() if callbacks]
+
+    def reset(self):
+        with self._lock:
+            self._levels.clear()
+            self._edge_callbacks.clear()
+        self.reads = 0
+        if self.read_log is not None:
+            self.read_log = {}
+
+
+class PulseSource(object):
+    # Beam levels for a sampler in another process, where set_level() can't
+    # reach: pulse trains {pin: [(break, restore), ...]} in seconds after
+    # `start` (a time.monotonic() value, which is the same clock in every
+    # process). Picklable, so it can be handed to beam_process.BeamProcess.
+    def __init__(self, pins, trains, start):
+        self.pins = pins
+        self.trains = trains
+        self.start = start
+
+    def open(self):
+        breaks = {pin: [b for b, _ in self.trains.get(pin, [])] for pin in self.pins}
+
+        def level(pin, t):
+            i = bisect.bisect_right(breaks[pin], t) - 1
+            return i < 0 or self.trains[pin][i][1] <= t
+
+        return lambda: [level(pin, time.monotonic() - self.start) for pin in self.pins]
+
+
+# RPi.GPIO constants
+BCM = 11
+BOARD = 10
+IN = 1
+OUT = 0
+LOW = 0
+HIGH = 1
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+RISING = 31
+FALLING = 32
+BOTH = 33
+
+
+def _make_rpi_gpio(pins):
+    gpio = types.ModuleType("RPi.GPIO")
+    for name in ("BCM", "BOARD", "IN", "OUT", "LOW", "HIGH", "PUD_OFF", "PUD_DOWN", "PUD_UP", "RISING", "FALLING", "BOTH"):
+        setattr(gpio, name, globals()[name])
+    callbacks = {}
+
+    def add_event_detect(pin, edge, callback=None, bouncetime=None):
+        last = [0.0]
+
+        def on_edge(channel):
+            now = time.monotonic()
+            if bouncetime and (now - last[0]) * 1000.0 < bouncetime:
+                return
+            last[0] = now
+            for cb in callbacks.get(channel, ()):
+                cb(channel)
+
+        callbacks.setdefault(pin, [])
+        if callback is not None:
+            callbacks[pin].append(callback)
+        pins.add_edge_callback(pin, edge, on_edge)
+
+    def add_event_callback(pin, callback):
+        callbacks.setdefault(pin, []).append(callback)
+
+    def remove_event_detect(pin):
+        callbacks.pop(pin, None)
+        pins.remove_edge_callbacks(pin)
+
+    def cleanup(*args):
+        callbacks.clear()
+        pins.remove_edge_callbacks()
+
+    gpio.setmode = lambda mode: None
+    gpio.setwarnings = lambda flag: None
+    gpio.setup = lambda pin, direction, pull_up_down=PUD_OFF, initial=None: None
+    gpio.input = lambda pin: HIGH if pins.read(pin) else LOW
+    gpio.output = lambda pin, value: pins.set_level(pin, value)
+    gpio.add_event_detect = add_event_detect
+    gpio.add_event_callback = add_event_callback
+    gpio.remove_event_detect = remove_event_detect
+    gpio.cleanup = cleanup
+    return gpio
+
+
+class Pin(object):
+    def __init__(self, pin_id):
+        self.id = pin_id
+
+    def __repr__(self):
+        return "Pin(%d)" % self.id
+
+
+def _make_digitalio(pins):
+    digitalio = types.ModuleType("digitalio")
+    digitalio.Direction = types.SimpleNamespace(INPUT="input", OUTPUT="output")
+    digitalio.Pull = types.SimpleNamespace(UP="up", DOWN="down")
+
+    class DigitalInOut(object):
+        def __init__(self, pin):
+            self.pin = pin.id if isinstance(pin, Pin) else int(pin)
+            self.direction = digitalio.Direction.INPUT
+            self.pull = None
+
+        @property
+        def value(self):
+            return pins.read(self.pin)
+
+        @value.setter
+        def value(self, level):
+            pins.set_level(self.pin, level)
+
+        def deinit(self):
+            pass
+
+    digitalio.DigitalInOut = DigitalInOut
+    return digitalio
+
+
+def _make_board():
+    board = types.ModuleType("board")
+    for n in range(28):
+        setattr(board, "D%d" % n, Pin(n))
+    return board
+
+
+def install(pins=None):
+    if pins is None:
+        pins = FakePins()
+    rpi = types.ModuleType("RPi")
+    rpi.GPIO = _make_rpi_gpio(pins)
+    sys.modules["RPi"] = rpi
+    sys.modules["RPi.GPIO"] = rpi.GPIO
+    sys.modules["digitalio"] = _make_digitalio(pins)
+    sys.modules["board"] = _make_board()
+    return pins
@@ -0,0 +1,117 @@
+# Flashing input value for the counters' manual mode. The "on" frame (the
+# value) and the "off" frame (blank) are drawn once into two FrameCanvases
+# and then just swapped back and forth; each swap waits for the next phase
+# with SwapOnVSync's framerate_fraction, so the flash is locked to the panel
+# refresh and costs next to no CPU. The value is only re-rendered when it
+# changes, and the new value goes up with the next swap.
+import threading
+import time
+
+DEFAULT_REFRESH_HZ = 120
+MAX_REFRESH_HZ = 2000
+
+
+class FlashAnimation(object):
+    def __init__(self, matrix, render, interval=0.5, refresh_hz=None, idle=None):
+        # render(canvas, value) draws the "on" frame; every toggle counts as
+        # activity for the idle monitor
+        self.matrix = matrix
+        self.idle = idle
+        self.render = render
+        self.interval = interval
+        if refresh_hz is None:
+            refresh_hz = getattr(matrix, "refresh_rate_hz", 0) or DEFAULT_REFRESH_HZ
+        self.refresh_hz = refresh_hz
+        self.renders = 0
+        self.toggles = 0
+        self._spare = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._value = None
+        self._changed = False
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def framerate_fraction(self):
+        return max(1, min(255, int(round(self.interval * self.refresh_hz))))
+
+    def start(self, canvas, value):
+        # Takes over the caller's offscreen canvas until stop()
+        if self.running:
+            self.set_value(value)
+            return
+        self._on = canvas
+        self._off = self._spare.pop() if self._spare else self.matrix.CreateFrameCanvas()
+        self._off.Clear()
+        self._off_stale = False
+        self._displayed = None
+        self._value = value
+        self._changed = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def set_value(self, value):
+        with self._lock:
+            if value == self._value:
+                return False
+            self._value = value
+            self._changed = True
+            return True
+
+    def stop(self):
+        # Returns a canvas that is not on the panel for the caller to draw into
+        if not self.running:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        # The frame still up comes back to the caller with its next swap
+        return self._off if self._displayed is self._on else self._on
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                changed = self._changed
+                value = self._value
+                self._changed = False
+
+            if changed:
+                # Draw the new value into whichever canvas is off the panel and
+                # show it right away; the frame it replaces becomes "off"
+                hidden = self._off if self._displayed is self._on else self._on
+                self.render(hidden, value)
+                self.renders += 1
+                if hidden is self._off:
+                    self._on, self._off = self._off, self._on
+                    self._off_stale = True
+                frame, fraction = self._on, 1
+            else:
+                frame = self._off if self._displayed is self._on else self._on
+                if frame is self._off and self._off_stale:
+                    frame.Clear()
+                    self._off_stale = False
+                fraction = self.framerate_fraction()
+
+            start = time.monotonic()
+            previous = self.matrix.SwapOnVSync(frame, fraction)
+            elapsed = time.monotonic() - start
+            if previous is not self._on and previous is not self._off:
+                self._spare.append(previous)
+            self._displayed = frame
+            if self.idle is not None:
+                self.idle.activity()
+
+            if not changed:
+                self.toggles += 1
+                # Learn the real refresh rate from how long the swap waited
+                if elapsed * MAX_REFRESH_HZ >= fraction:
+                    self.refresh_hz = fraction / elapsed
+                # No vsync wait at all (or far too short): keep the phase
+                # length on the monotonic clock instead
+                if elapsed < self.interval / 2:
+                    self._stop.wait(self.interval - elapsed)
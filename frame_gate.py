@@ -0,0 +1,63 @@
+# Skips frames that are already on the panel. Every frame handed to the
+# matrix gets a key: a version tag the caller knows (("number", "42", color))
+# or a content hash of the source image. Drawing code asks already_showing()
+# before rendering, and swap() / set_image() drop frames whose key matches the
+# one on the panel. Frames without a key always go through. Frames that do go
+# through are reported to the idle monitor, if there is one, and direct draws
+# are handed to whatever taps the matrix's frames (frame_recorder.tap_frames).
+import hashlib
+
+
+def image_key(image):
+    # The panel can't be read back, so identity comes from the source image
+    return ("image", image.size, hashlib.blake2b(image.tobytes(), digest_size=16).digest())
+
+
+class FrameGate(object):
+    def __init__(self, matrix, idle=None):
+        self.matrix = matrix
+        self.idle = idle
+        self.shown = None
+        self.swaps = 0
+        self.skipped = 0
+
+    def already_showing(self, key):
+        if key is not None and key == self.shown:
+            self.skipped += 1
+            return True
+        return False
+
+    def swap(self, canvas, key=None, framerate_fraction=1):
+        # Returns the canvas to draw the next frame into, like SwapOnVSync
+        if self.already_showing(key):
+            return canvas
+        self.shown = key
+        self.swaps += 1
+        if self.idle is not None:
+            self.idle.activity()
+        return self.matrix.SwapOnVSync(canvas, framerate_fraction)
+
+    def update(self, key, draw):
+        # draw() paints the matrix directly (no double buffer)
+        if self.already_showing(key):
+            return False
+        draw()
+        for capture in getattr(self.matrix, "frame_taps", ()):
+            capture(self.matrix)
+        self.shown = key
+        self.swaps += 1
+        if self.idle is not None:
+            self.idle.activity()
+        return True
+
+    def set_image(self, image, key=None):
+        # Keyed by content unless the caller has a better tag
+        if key is None:
+            key = image_key(image)
+        return self.update(key, lambda: self.matrix.SetImage(image))
+
+    def forget(self):
+        # Something drew to the panel behind the gate's back
+        self.shown = None
+        if self.idle is not None:
+            self.idle.activity()
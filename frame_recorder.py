@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# Record the frames a matrix actually shows, and play them back or export
+# them to GIF.
+#
+# attach() wraps the matrix's SwapOnVSync (and FrameGate's direct draws), so
+# MatrixDisplay, the counters and the clock are all covered without changes to
+# their drawing code. On the display path a swap costs one copy of the pixels
+# and a queue put; comparing, encoding and writing happen on a background
+# thread. Only frames that differ from the one before are written, so an hour
+# of a counter sitting on the same number is a handful of records.
+#
+# A recording is an 8 byte magic, then width, height (u16) and the wall clock
+# start time (double), then one record per changed frame: kind (u8),
+# nanoseconds since start (i64), swaps of the previous frame since it was
+# recorded (u32) and the payload size (u32). Keyframes carry the deflated
+# RGB24 frame, deltas the deflated XOR with the previous frame (all zero bytes
+# where nothing changed). An end record closes the file.
+#
+# The headless backend's canvases can always be read back. On a Pi, attach()
+# turns on the rgbmatrix binding's readback (RGBMatrix.EnableReadback()),
+# which keeps an RGB24 copy of everything drawn, so the recording shows the
+# colors drawn, before the panel's brightness and luminance correction:
+#   RGBMATRIX_RECORD=monday.frames sudo -E python3 hit_counter_v2.py
+#   python3 frame_recorder.py info monday.frames
+#   python3 frame_recorder.py play monday.frames --speed 4
+#   python3 frame_recorder.py gif monday.frames monday.gif
+import argparse
+import atexit
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+MAGIC = b"GYMFRM01"
+HEADER = struct.Struct("<8sHHd")
+RECORD = struct.Struct("<BqII")
+
+RECORD_ENV = "RGBMATRIX_RECORD"
+
+KIND_KEYFRAME = 1
+KIND_DELTA = 2
+KIND_END = 3
+
+DEFAULT_KEYFRAME_INTERVAL = 60.0
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_MAX_PENDING = 256
+
+
+def tap_frames(matrix, capture):
+    # Calls capture(canvas) with every frame swapped onto matrix, and with
+    # the matrix itself after FrameGate draws on it directly
+    swap = matrix.SwapOnVSync
+
+    def tapped_swap(canvas, *args, **kwargs):
+        capture(canvas)
+        return swap(canvas, *args, **kwargs)
+
+    matrix.SwapOnVSync = tapped_swap
+    if not hasattr(matrix, "frame_taps"):
+        matrix.frame_taps = []
+    matrix.frame_taps.append(capture)
+
+
+def xor_frames(frame, previous):
+    # Zero wherever the two frames match; applying it again undoes it
+    return np.bitwise_xor(np.frombuffer(frame, dtype=np.uint8), np.frombuffer(previous, dtype=np.uint8)).tobytes()
+
+
+class FrameRecorder(object):
+    def __init__(self, path, width, height, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, max_pending=DEFAULT_MAX_PENDING, level=6):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.keyframe_interval = keyframe_interval
+        self.flush_interval = flush_interval
+        self.level = level
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, width, height, time.time()))
+        self._start_ns = time.monotonic_ns()
+        self._queue = queue.Queue(max_pending)
+        self._closed = False
+        self._previous = None
+        self._last_keyframe_ns = None
+        self._repeats = 0
+
+        self.captured = 0
+        self.dropped = 0
+        self.keyframes = 0
+        self.deltas = 0
+        self.bytes_written = HEADER.size
+
+        self._thread = threading.Thread(target=self._write_loop, name="frame-recorder")
+        self._thread.daemon = True
+        self._thread.start()
+
+    # Display path
+
+    def capture(self, canvas):
+        # Never blocks: if the writer has fallen this far behind, the frame
+        # is dropped and counted
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait((time.monotonic_ns() - self._start_ns, bytes(canvas.pixels)))
+            self.captured += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def attach(self, matrix):
+        # Records every frame shown on matrix from now on. False if the
+        # backend's frames can't be read back.
+        if not hasattr(matrix, "pixels") and hasattr(matrix, "EnableReadback"):
+            matrix.EnableReadback()
+        if not hasattr(matrix, "pixels"):
+            print("Frame recording needs frames that can be read back: the headless backend or rgbmatrix bindings with EnableReadback()")
+            return False
+        tap_frames(matrix, self.capture)
+        self.capture(matrix)
+        return True
+
+    # Writer thread
+
+    def _write_loop(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                self._write_frame(*item)
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self._file.flush()
+                last_flush = time.monotonic()
+
+    def _write_frame(self, t_ns, pixels):
+        if pixels == self._previous:
+            self._repeats += 1
+            return
+        keyframe = self._previous is None or t_ns - self._last_keyframe_ns >= self.keyframe_interval * 1e9
+        if keyframe:
+            payload = zlib.compress(pixels, self.level)
+        else:
+            payload = zlib.compress(xor_frames(pixels, self._previous), self.level)
+        if keyframe:
+            self._last_keyframe_ns = t_ns
+            self.keyframes += 1
+        else:
+            self.deltas += 1
+        self._write_record(KIND_KEYFRAME if keyframe else KIND_DELTA, t_ns, payload)
+        self._previous = pixels
+
+    def _write_record(self, kind, t_ns, payload=b""):
+        self._file.write(RECORD.pack(kind, t_ns, self._repeats, len(payload)))
+        self._file.write(payload)
+        self.bytes_written += RECORD.size + len(payload)
+        self._repeats = 0
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._write_record(KIND_END, time.monotonic_ns() - self._start_ns)
+        self._file.close()
+
+
+def record_matrix(matrix, path=None, **kwargs):
+    # Starts recording matrix to path (default: $RGBMATRIX_RECORD, "" for
+    # none). Returns the recorder, closed at exit, or None.
+    if path is None:
+        path = os.environ.get(RECORD_ENV, "")
+    if not path:
+        return None
+    recorder = FrameRecorder(path, matrix.width, matrix.height, **kwargs)
+    if not recorder.attach(matrix):
+        recorder.close()
+        os.unlink(path)
+        return None
+    atexit.register(recorder.close)
+    print(f"Recording frames to {path}")
+    return recorder
+
+
+###########################################################################
+
+############################### PLAYBACK ##################################
+
+###########################################################################
+
+class FrameRecording(object):
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, self.width, self.height, self.start_time = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"Not a frame recording: {path}")
+            self._data = f.read()
+        self.size = HEADER.size + len(self._data)
+
+    def records(self):
+        # (kind, seconds since start, repeats, payload) in file order; a file
+        # cut short by a crash ends at its last complete record
+        data = self._data
+        offset = 0
+        while offset + RECORD.size <= len(data):
+            kind, t_ns, repeats, size = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            if offset + size > len(data):
+                break
+            yield kind, t_ns / 1e9, repeats, data[offset:offset + size]
+            offset += size
+
+    def frames(self):
+        # (seconds since start, RGB24 bytes) for every recorded frame
+        frame_bytes = self.width * self.height * 3
+        frame = None
+        for kind, t, repeats, payload in self.records():
+            if kind == KIND_KEYFRAME:
+                frame = zlib.decompress(payload)
+            elif kind == KIND_DELTA and frame is not None:
+                frame = xor_frames(frame, zlib.decompress(payload))
+            else:
+                continue
+            if len(frame) != frame_bytes:
+                raise ValueError(f"Frame of {len(frame)} bytes in a {self.width}x{self.height} recording")
+            yield t, frame
+
+    def duration(self):
+        end = 0.0
+        for kind, t, repeats, payload in self.records():
+            end = t
+        return end
+
+    def stats(self):
+        kinds = {KIND_KEYFRAME: 0, KIND_DELTA: 0}
+        swaps = 0
+        end = 0.0
+        for kind, t, repeats, payload in self.records():
+            if kind in kinds:
+                kinds[kind] += 1
+                swaps += 1
+            swaps += repeats
+            end = t
+        return dict(
+            size=f"{self.width}x{self.height}",
+            started=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.start_time)),
+            duration=end,
+            keyframes=kinds[KIND_KEYFRAME],
+            deltas=kinds[KIND_DELTA],
+            swaps=swaps,
+            bytes=self.size,
+            bytes_per_hour=self.size * 3600.0 / end if end else None,
+        )
+
+
+def play(path, speed=1.0, loop=False):
+    from matrix_backend import RGBMatrix, RGBMatrixOptions
+    from PIL import Image
+    recording = FrameRecording(path)
+    options = RGBMatrixOptions()
+    options.rows = recording.height
+    options.cols = recording.width
+    options.chain_length = 1
+    options.parallel = 1
+    options.hardware_mapping = 'regular'
+    options.disable_hardware_pulsing = True
+    matrix = RGBMatrix(options=options)
+    canvas = matrix.CreateFrameCanvas()
+    size = (recording.width, recording.height)
+    while True:
+        start = time.monotonic()
+        for t, frame in recording.frames():
+            delay = start + t / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            canvas.SetImage(Image.frombuffer("RGB", size, frame, "raw", "RGB", 0, 1))
+            canvas = matrix.SwapOnVSync(canvas)
+        if not loop:
+            break
+
+
+def export_gif(path, output, speed=1.0, scale=1, min_frame_time=0.02):
+    # GIF frame times are whole centiseconds, and viewers slow down anything
+    # under 20 ms, so frames shown for less than min_frame_time are dropped
+    from PIL import Image
+    recording = FrameRecording(path)
+    size = (recording.width, recording.height)
+    images = []
+    times = []
+    for t, frame in recording.frames():
+        if images and (t - times[-1]) / speed < min_frame_time:
+            images.pop()
+            times.pop()
+        image = Image.frombytes("RGB", size, frame)
+        if scale != 1:
+            image = image.resize((size[0] * scale, size[1] * scale), Image.NEAREST)
+        images.append(image)
+        times.append(t)
+    if not images:
+        raise ValueError(f"No frames in {path}")
+    end = recording.duration()
+    durations = [max(min_frame_time, (b - a) / speed) for a, b in zip(times, times[1:] + [max(end, times[-1])])]
+    # GIF has no frame longer than 655.35 s
+    durations = [int(min(d, 655.35) * 1000) for d in durations]
+    images[0].save(output, save_all=True, append_images=images[1:], duration=durations, loop=0, optimize=False)
+    return len(images)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, play back or export recorded matrix frames")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    info = sub.add_parser("info", help="Print what a recording holds")
+    info.add_argument("recording")
+
+    pl = sub.add_parser("play", help="Show a recording on the matrix (RGBMATRIX_HEADLESS=1 for the headless one)")
+    pl.add_argument("recording")
+    pl.add_argument("--speed", default=1.0, type=float, help="Playback speed factor (1 = original timing)")
+    pl.add_argument("--loop", action="store_true", help="Start over at the end")
+
+    gif = sub.add_parser("gif", help="Export a recording as an animated GIF")
+    gif.add_argument("recording")
+    gif.add_argument("output")
+    gif.add_argument("--speed", default=1.0, type=float, help="Speed factor for the frame times")
+    gif.add_argument("--scale", default=1, type=int, help="Pixel scale factor")
+
+    args = parser.parse_args()
+    if args.command == "info":
+        for key, value in FrameRecording(args.recording).stats().items():
+            print(f"{key:15} {value}")
+    elif args.command == "play":
+        try:
+            play(args.recording, args.speed, args.loop)
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(f"Wrote {export_gif(args.recording, args.output, args.speed, args.scale)} frames to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# Raw RGB24 frames from stdin or a named pipe, for MatrixDisplay's stream
+# mode. Frames are width * height * 3 bytes, back to back ("raw"), or each
+# preceded by its length as a little-endian uint32 ("length"; frames of the
+# wrong size are skipped). Everything is read with readinto() into one
+# preallocated buffer, and image() copies it into one persistent PIL image
+# (Pillow copies RGB buffers anyway), so showing a frame allocates nothing.
+#
+# When the producer runs ahead, read_latest() reads through every complete
+# frame already waiting in the pipe and keeps only the newest.
+#
+#   ffmpeg -i clip.mp4 -vf scale=64:64 -f rawvideo -pix_fmt rgb24 - | \
+#       python3 matrix_display.py --mode stream
+import fcntl
+import os
+import select
+import stat
+import struct
+import sys
+import termios
+
+from PIL import Image
+
+FRAMINGS = ["raw", "length"]
+_LENGTH = struct.Struct("<I")
+
+
+class FrameStream(object):
+    def __init__(self, source, width, height, framing="raw"):
+        if framing not in FRAMINGS:
+            raise ValueError(f"Unknown framing: {framing}")
+        self.source = source
+        self.width = width
+        self.height = height
+        self.framing = framing
+        self.frame_bytes = width * height * 3
+        self.record_bytes = self.frame_bytes + (_LENGTH.size if framing == "length" else 0)
+
+        if source == "-":
+            self.fd = sys.stdin.fileno()
+            self._owned = False
+        else:
+            # O_RDWR keeps a FIFO open with no writer attached, so producers
+            # can come and go without us ever seeing end of file
+            self.fd = os.open(source, os.O_RDWR if stat.S_ISFIFO(os.stat(source).st_mode) else os.O_RDONLY)
+            self._owned = True
+        self.file = os.fdopen(self.fd, "rb", buffering=0, closefd=False)
+        mode = os.fstat(self.fd).st_mode
+        # Regular files are played back frame by frame, never skipped ahead
+        self.live = stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or stat.S_ISCHR(mode)
+
+        self.frame = bytearray(self.frame_bytes)
+        self._frame_view = memoryview(self.frame)
+        self._length = bytearray(_LENGTH.size)
+        self._length_view = memoryview(self._length)
+        self._scratch = memoryview(bytearray(65536))
+        self._image = None
+        self.received = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.eof = False
+
+    def _read_exact(self, view):
+        filled = 0
+        while filled < len(view):
+            n = self.file.readinto(view[filled:])
+            if not n:
+                self.eof = True
+                return False
+            filled += n
+        return True
+
+    def _discard(self, count):
+        while count > 0:
+            if not self._read_exact(self._scratch[:min(count, len(self._scratch))]):
+                return False
+            count -= min(count, len(self._scratch))
+        return True
+
+    def read_frame(self):
+        # Blocks until one whole frame is in self.frame; False at end of file
+        while self.framing == "length":
+            if not self._read_exact(self._length_view):
+                return False
+            length = _LENGTH.unpack_from(self._length)[0]
+            if length == self.frame_bytes:
+                break
+            self.skipped += 1
+            if not self._discard(length):
+                return False
+        if not self._read_exact(self._frame_view):
+            return False
+        self.received += 1
+        return True
+
+    def available(self):
+        # Bytes waiting in the pipe
+        count = bytearray(4)
+        fcntl.ioctl(self.fd, termios.FIONREAD, count)
+        return struct.unpack("i", count)[0]
+
+    def readable(self, timeout):
+        return bool(select.select([self.fd], [], [], timeout)[0])
+
+    def read_latest(self, timeout=None):
+        # Waits up to timeout for a frame; True if self.frame has a new one
+        if self.eof or not self.readable(timeout):
+            return False
+        if not self.read_frame():
+            return False
+        while self.live and self.available() >= self.record_bytes:
+            if not self.read_frame():
+                break
+            self.dropped += 1
+        return True
+
+    def image(self):
+        # The frame in self.frame as a PIL image. The same image is refilled
+        # on every call, so call this again after each new frame.
+        if self._image is None:
+            self._image = Image.new("RGB", (self.width, self.height))
+        self._image.frombytes(self.frame)
+        return self._image
+
+    def close(self):
+        self._image = None
+        self.file.close()
+        if self._owned:
+            os.close(self.fd)
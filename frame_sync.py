@@ -0,0 +1,429 @@
+# Frame sync for a fleet of panels. A coordinator renders on one machine (any
+# of the scripts here on the headless backend, with --sync-to) and sends every
+# frame it swaps to the agents, each a MatrixDisplay in "sync" mode on a Pi.
+#
+# Frames carry a sequence number and a presentation time: the coordinator's
+# wall clock at the swap plus a fixed lead. Agents decode ahead and swap each
+# frame on the first vsync after its presentation time, so the panels change
+# together as long as the machines' clocks agree (run chrony or NTP).
+#
+# Payloads are deflated keyframes or XOR deltas, as in frame_recorder. Only
+# frames that changed are sent. Over TCP every connection starts with a
+# keyframe and gets every frame after it. Over UDP messages are split into
+# datagrams of at most DATAGRAM_BYTES; a lost datagram loses its frame, the
+# agent ignores deltas until the next keyframe, and a keyframe goes out every
+# keyframe_interval seconds even while nothing changes.
+#
+# Coordinator and two agents:
+#   python3 matrix_display.py --led-headless --mode scroll-h --sync-to udp://10.0.0.2:5005,tcp://10.0.0.3:5005
+#   sudo python3 matrix_display.py --mode sync --sync-listen udp://0.0.0.0:5005
+#   sudo python3 matrix_display.py --mode sync --sync-listen tcp://0.0.0.0:5005
+import atexit
+import collections
+import os
+import queue
+import select
+import socket
+import struct
+import threading
+import time
+import zlib
+
+from frame_recorder import tap_frames, xor_frames
+
+MAGIC = b"RGBS"
+# magic, seq, presentation time (time.time_ns()), kind, chunk, chunks,
+# width, height, payload bytes (all chunks)
+MESSAGE = struct.Struct("<4sIqBHHHHI")
+
+KIND_KEYFRAME = 1
+KIND_DELTA = 2
+
+SYNC_ENV = "RGBMATRIX_SYNC_TO"
+DEFAULT_LISTEN = "udp://0.0.0.0:5005"
+DEFAULT_LEAD = 0.1
+DEFAULT_KEYFRAME_INTERVAL = 2.0
+DEFAULT_MAX_PENDING = 64
+DATAGRAM_BYTES = 1400
+RECONNECT_INTERVAL = 2.0
+SKEW_SAMPLES = 4096
+
+
+def parse_address(address):
+    # "udp://host:port" or "tcp://host:port" -> (transport, (host, port))
+    transport, sep, rest = address.partition("://")
+    host, colon, port = rest.rpartition(":")
+    if not sep or not colon or transport not in ("udp", "tcp"):
+        raise ValueError(f"Expected udp://host:port or tcp://host:port, got {address!r}")
+    return transport, (host, int(port))
+
+
+def messages(seq, pts_ns, kind, width, height, payload, chunk_bytes=None):
+    # The message for payload, split into chunks of at most chunk_bytes
+    if not chunk_bytes:
+        return [MESSAGE.pack(MAGIC, seq, pts_ns, kind, 0, 1, width, height, len(payload)) + payload]
+    chunks = max(1, -(-len(payload) // chunk_bytes))
+    return [MESSAGE.pack(MAGIC, seq, pts_ns, kind, i, chunks, width, height, len(payload))
+            + payload[i * chunk_bytes:(i + 1) * chunk_bytes] for i in range(chunks)]
+
+
+###########################################################################
+
+############################# COORDINATOR #################################
+
+###########################################################################
+
+class UdpTarget(object):
+    def __init__(self, address, sock):
+        self.address = address
+        self.sock = sock
+        self.needs_keyframe = True
+
+    def send(self, datagrams):
+        sent = 0
+        for datagram in datagrams:
+            try:
+                sent += self.sock.sendto(datagram, self.address)
+            except OSError:
+                # Nobody listening yet (ICMP unreachable) or a full buffer
+                pass
+        return sent
+
+
+class TcpTarget(object):
+    def __init__(self, address):
+        self.address = address
+        self.sock = None
+        self.needs_keyframe = True
+        self._next_attempt = 0
+
+    def connect(self):
+        if self.sock is not None:
+            return True
+        if time.monotonic() < self._next_attempt:
+            return False
+        try:
+            self.sock = socket.create_connection(self.address, timeout=1.0)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            self._next_attempt = time.monotonic() + RECONNECT_INTERVAL
+            return False
+        self.needs_keyframe = True
+        return True
+
+    def send(self, message):
+        try:
+            self.sock.sendall(message[0])
+            return len(message[0])
+        except OSError:
+            self.close()
+            self._next_attempt = time.monotonic() + RECONNECT_INTERVAL
+            return 0
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class FrameSender(object):
+    def __init__(self, targets, width, height, lead=DEFAULT_LEAD, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                 max_pending=DEFAULT_MAX_PENDING, level=1):
+        self.width = width
+        self.height = height
+        self.lead = lead
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+        self._udp = []
+        self._tcp = []
+        udp_sock = None
+        for address in targets:
+            transport, address = parse_address(address)
+            if transport == "udp":
+                if udp_sock is None:
+                    udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self._udp.append(UdpTarget(address, udp_sock))
+            else:
+                self._tcp.append(TcpTarget(address))
+        self._udp_sock = udp_sock
+        self._queue = queue.Queue(max_pending)
+        self._closed = False
+        self._seq = 0
+        self._previous = None
+        self._next_keyframe = 0
+
+        self.captured = 0
+        self.dropped = 0
+        self.frames_sent = 0
+        self.keyframes = 0
+        self.deltas = 0
+        self.bytes_sent = 0
+
+        self._thread = threading.Thread(target=self._send_loop, name="frame-sender")
+        self._thread.daemon = True
+        self._thread.start()
+
+    # Display path
+
+    def capture(self, canvas):
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait((time.time_ns() + int(self.lead * 1e9), bytes(canvas.pixels)))
+            self.captured += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def attach(self, matrix):
+        if not hasattr(matrix, "pixels"):
+            print("The sync coordinator needs the headless backend (--led-headless), the panel can't be read back")
+            return False
+        tap_frames(matrix, self.capture)
+        self.capture(matrix)
+        return True
+
+    # Sender thread
+
+    def _send_loop(self):
+        while True:
+            timeout = None
+            if self._udp and self._previous is not None:
+                timeout = max(0.0, self._next_keyframe - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                # Nothing changed for a while: repeat the frame as a keyframe
+                # for UDP agents that lost something
+                self._send(time.time_ns() + int(self.lead * 1e9), self._previous)
+                continue
+            if item is None:
+                break
+            pts_ns, frame = item
+            if frame != self._previous:
+                self._send(pts_ns, frame)
+
+    def _send(self, pts_ns, frame):
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        keyframe = None
+        delta = None
+        if self._udp and time.monotonic() >= self._next_keyframe:
+            for target in self._udp:
+                target.needs_keyframe = True
+            self._next_keyframe = time.monotonic() + self.keyframe_interval
+        for target in self._tcp:
+            target.connect()
+        for target in self._udp + self._tcp:
+            if isinstance(target, TcpTarget) and target.sock is None:
+                continue
+            if target.needs_keyframe or self._previous is None:
+                if keyframe is None:
+                    keyframe = zlib.compress(frame, self.level)
+                    self.keyframes += 1
+                kind, payload = KIND_KEYFRAME, keyframe
+            else:
+                if delta is None:
+                    delta = zlib.compress(xor_frames(frame, self._previous), self.level)
+                    self.deltas += 1
+                kind, payload = KIND_DELTA, delta
+            chunk_bytes = DATAGRAM_BYTES if isinstance(target, UdpTarget) else None
+            sent = target.send(messages(self._seq, pts_ns, kind, self.width, self.height, payload, chunk_bytes))
+            if sent:
+                target.needs_keyframe = False
+            self.bytes_sent += sent
+        self._previous = frame
+        self.frames_sent += 1
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        for target in self._tcp:
+            target.close()
+        if self._udp_sock is not None:
+            self._udp_sock.close()
+
+
+def send_frames(matrix, targets=None, **kwargs):
+    # Starts sending matrix's frames to targets ("udp://host:port,...",
+    # default: $RGBMATRIX_SYNC_TO, "" for none). Returns the sender, closed
+    # at exit, or None.
+    if targets is None:
+        targets = os.environ.get(SYNC_ENV, "")
+    targets = [t.strip() for t in targets.split(",") if t.strip()]
+    if not targets:
+        return None
+    try:
+        sender = FrameSender(targets, matrix.width, matrix.height, **kwargs)
+    except ValueError as e:
+        print(f"Error setting up frame sync: {e}")
+        return None
+    if not sender.attach(matrix):
+        sender.close()
+        return None
+    atexit.register(sender.close)
+    print(f"Sending frames to {', '.join(targets)}")
+    return sender
+
+
+###########################################################################
+
+################################ AGENT ####################################
+
+###########################################################################
+
+class FrameReceiver(object):
+    def __init__(self, listen, width, height):
+        self.transport, self.address = parse_address(listen)
+        self.width = width
+        self.height = height
+        self.frame_bytes = width * height * 3
+        if self.transport == "udp":
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(self.address)
+        if self.transport == "tcp":
+            self.sock.listen(1)
+        self.address = self.sock.getsockname()
+
+        self._pending = collections.deque()
+        self._ready = threading.Condition()
+        self._frame = None
+        self._seq = None
+        self._partial = None
+        self._closed = False
+
+        self.received = 0
+        self.presented = 0
+        self.skipped = 0
+        self.broken = 0
+        self.incomplete = 0
+        self.late = 0
+        self.bytes_received = 0
+        self.skews = collections.deque(maxlen=SKEW_SAMPLES)
+        self.present_log = None  # [(seq, time.time_ns())], if a list
+
+        self._thread = threading.Thread(target=self._receive_loop, name="frame-receiver")
+        self._thread.daemon = True
+        self._thread.start()
+
+    # Receiver thread
+
+    def _receive_loop(self):
+        try:
+            if self.transport == "udp":
+                self._receive_datagrams()
+            else:
+                self._receive_stream()
+        except OSError:
+            if not self._closed:
+                raise
+
+    def _receive_datagrams(self):
+        while not self._closed:
+            if not select.select([self.sock], [], [], 0.5)[0]:
+                continue
+            datagram = self.sock.recv(65536)
+            self.bytes_received += len(datagram)
+            if len(datagram) < MESSAGE.size:
+                continue
+            magic, seq, pts_ns, kind, chunk, chunks, width, height, size = MESSAGE.unpack_from(datagram)
+            if magic != MAGIC:
+                continue
+            partial = self._partial
+            if partial is None or partial[0] != seq:
+                if partial is not None:
+                    self.incomplete += 1
+                partial = self._partial = [seq, pts_ns, kind, width, height, [None] * chunks, 0]
+            if chunk < len(partial[5]) and partial[5][chunk] is None:
+                partial[5][chunk] = datagram[MESSAGE.size:]
+                partial[6] += 1
+            if partial[6] == len(partial[5]):
+                self._partial = None
+                self._decode(seq, pts_ns, kind, width, height, b"".join(partial[5]))
+
+    def _receive_stream(self):
+        while not self._closed:
+            if not select.select([self.sock], [], [], 0.5)[0]:
+                continue
+            conn, peer = self.sock.accept()
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            print(f"Frame sync coordinator connected from {peer[0]}:{peer[1]}")
+            with conn, conn.makefile("rb") as stream:
+                while not self._closed:
+                    header = stream.read(MESSAGE.size)
+                    if len(header) < MESSAGE.size:
+                        break
+                    magic, seq, pts_ns, kind, chunk, chunks, width, height, size = MESSAGE.unpack(header)
+                    if magic != MAGIC:
+                        break
+                    payload = stream.read(size)
+                    if len(payload) < size:
+                        break
+                    self.bytes_received += MESSAGE.size + size
+                    self._decode(seq, pts_ns, kind, width, height, payload)
+            # The next connection starts with a keyframe
+            self._seq = None
+
+    def _decode(self, seq, pts_ns, kind, width, height, payload):
+        if (width, height) != (self.width, self.height):
+            self.broken += 1
+            return
+        if kind == KIND_KEYFRAME:
+            frame = zlib.decompress(payload)
+        elif kind == KIND_DELTA and self._frame is not None and self._seq is not None \
+                and seq == (self._seq + 1) & 0xFFFFFFFF:
+            frame = xor_frames(zlib.decompress(payload), self._frame)
+        else:
+            # A delta on top of a frame we never got
+            self.broken += 1
+            self._seq = None
+            return
+        if len(frame) != self.frame_bytes:
+            self.broken += 1
+            return
+        self._frame = frame
+        self._seq = seq
+        self.received += 1
+        with self._ready:
+            self._pending.append((seq, pts_ns, frame))
+            self._ready.notify()
+
+    # Presenter side
+
+    def next_frame(self, timeout=None):
+        # (seq, pts_ns, frame bytes) of the next frame to show, or None.
+        # Frames superseded by one that is already due are skipped.
+        with self._ready:
+            if not self._pending:
+                self._ready.wait(timeout)
+            if not self._pending:
+                return None
+            now = time.time_ns()
+            while len(self._pending) > 1 and self._pending[1][1] <= now:
+                self._pending.popleft()
+                self.skipped += 1
+            return self._pending.popleft()
+
+    def shown(self, seq, pts_ns, period):
+        # Called right after the swap; skew is how far after its presentation
+        # time the frame went up
+        now = time.time_ns()
+        skew = (now - pts_ns) / 1e9
+        self.skews.append(skew)
+        if skew > period:
+            self.late += 1
+        self.presented += 1
+        if self.present_log is not None:
+            self.present_log.append((seq, now))
+
+    def close(self):
+        self._closed = True
+        with self._ready:
+            self._ready.notify_all()
+        self._thread.join(timeout=1.0)
+        self.sock.close()
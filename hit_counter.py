@@ -5,13 +5,25 @@ import os
 import board
 import digitalio
 from PIL import Image, ImageDraw, ImageFont
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
+from matrix_backend import RGBMatrix, RGBMatrixOptions
+from text_renderer import make_text_renderer
+from frame_gate import FrameGate
+from cpu_placement import Placement
+from frame_recorder import record_matrix
+from frame_sync import send_frames
+from idle_power import IdlePower, DEFAULT_IDLE_AFTER, SENSOR_POLL, MAIN_LOOP_POLL
+from flash_animation import FlashAnimation
+from beam_process import BeamProcess, DigitalioSource
 import threading
 import traceback
 import getpass
 
+BEAM_PINS = [26, 16, 5, 6]
+BEAM_NAMES = ["beam1", "beam2", "beam3", "beam4"]
+
 class BreakBeamCounter:
-    def __init__(self, logo_path="./logo.png", debounce_time=1):
+    def __init__(self, logo_path="./logo.png", debounce_time=1, bdf_font=None, idle_after=DEFAULT_IDLE_AFTER, placement=None,
+                 sensor_process=False, beam_source=None, record=None, sync_to=None):
         self.count = 0
         self.logo_path = logo_path
         self.debounce_time = debounce_time
@@ -25,7 +37,19 @@ class BreakBeamCounter:
         
         # Configure the sensors
         # Using the pins specified in your documentation
-        self.setup_sensors()
+        if sensor_process:
+            # Sampled in a separate process (started before the matrix and
+            # fonts exist) and read back through shared memory
+            self.beams = BeamProcess(BEAM_PINS, beam_source or DigitalioSource(BEAM_PINS), debounce_time=debounce_time)
+            self.beams.start()
+            print("Break beam sensors sampled in a separate process")
+        else:
+            self.beams = None
+            self.setup_sensors()
+        
+        # Cores and scheduling for the input and render threads, e.g.
+        # placement="render=1;input=2:fifo=40" (default: $RGBMATRIX_PLACEMENT)
+        self.placement = Placement.parse(placement) if placement else Placement.from_env()
         
         # Configure matrix options
         self.options = RGBMatrixOptions()
@@ -40,7 +64,15 @@ class BreakBeamCounter:
         
         # Create matrix
         self.matrix = RGBMatrix(options=self.options)
+        # Frames shown go to record (default: $RGBMATRIX_RECORD) and to the sync
+        # agents in sync_to (default: $RGBMATRIX_SYNC_TO), headless only
+        self.recorder = record_matrix(self.matrix, record)
+        self.sync = send_frames(self.matrix, sync_to)
         self.canvas = self.matrix.CreateFrameCanvas()
+        # Slows the polling loops down while the frame doesn't change
+        self.idle = IdlePower(self.matrix, idle_after)
+        self.frames = FrameGate(self.matrix, self.idle)
+        self.flash = FlashAnimation(self.matrix, self.render_number, self.flash_interval, idle=self.idle)
         
         # Try to load a font 
         self.font = None
@@ -64,9 +96,13 @@ class BreakBeamCounter:
         if self.font is None:
             print("Using default font")
             self.font = ImageFont.load_default()
+
+        # Native BDF text instead of Pillow when fonts are given, e.g.
+        # bdf_font="texgyre-27.bdf,10x20.bdf,6x10.bdf" (largest first)
+        self.text_renderer = make_text_renderer("bdf", bdf_font) if bdf_font else None
         
         # Start sensor monitoring thread
-        self.sensor_thread = threading.Thread(target=self.monitor_sensors)
+        self.sensor_thread = threading.Thread(target=self.monitor_beam_counts if self.beams else self.monitor_sensors)
         self.sensor_thread.daemon = True
         self.sensor_thread.start()
     
@@ -121,6 +157,7 @@ class BreakBeamCounter:
                 self.kb_thread.start()
     
     def keyboard_listener(self):
+        self.placement.apply("input")
         print("Numeric Keypad Controls:")
         print("Beam Mode: '+' to increment, '.' to switch modes")
         print("Manual Mode: '.' to switch modes, 'Enter' to start input")
@@ -139,40 +176,43 @@ class BreakBeamCounter:
                 
             while self.running:
                 key = getch()
-                if self.mode == "beam":
-                    if key == '+':  # Plus key on numpad
-                        self.hit_detected("Keyboard")
-                    elif key == '.':  # Decimal point key for mode switching
-                        self.switch_mode()
-                    elif key.lower() == 'q':
-                        self.running = False
-                        break
-                else:  # manual mode
-                    if key == '\r' or key == '\n':  # Enter key on numpad
-                        if self.flashing:
-                            self.cancel_input()  # Confirm input
-                        else:
-                            self.start_input()  # Start input mode
-                    elif key == '\x7f' or key == '\x08':  # Clear/Delete key on numpad
-                        self.cancel_input()  # Cancel input
-                    elif key == '.':  # Decimal point key for mode switching
-                        self.switch_mode()
-                    elif key.lower() == 'q':
-                        self.running = False
-                        break
-                    elif self.flashing and key.isdigit():
-                        self.input_buffer += key
-                        self.display_number(int(self.input_buffer))
-                    elif self.flashing and (key == '\x7f' or key == '\x08'):  # Clear/Delete key
-                        if self.input_buffer:
-                            self.input_buffer = self.input_buffer[:-1]
-                            if self.input_buffer:
-                                self.display_number(int(self.input_buffer))
-                            else:
-                                self.display_number(0)
+                if not self.handle_key(key):
+                    break
         except Exception as e:
             print(f"Error in keyboard listener: {e}")
     
+    def handle_key(self, key):
+        # Returns False once the listener should stop
+        if self.mode == "beam":
+            if key == '+':  # Plus key on numpad
+                self.hit_detected("Keyboard")
+            elif key == '.':  # Decimal point key for mode switching
+                self.switch_mode()
+            elif key.lower() == 'q':
+                self.running = False
+                return False
+        else:  # manual mode
+            if key == '\r' or key == '\n':  # Enter key on numpad
+                if self.flashing:
+                    self.cancel_input()  # Confirm input
+                else:
+                    self.start_input()  # Start input mode
+            elif key == '\x7f' or key == '\x08':  # Clear/Delete key on numpad
+                self.cancel_input()  # Cancel input
+            elif key == '.':  # Decimal point key for mode switching
+                self.switch_mode()
+            elif key.lower() == 'q':
+                self.running = False
+                return False
+            elif self.flashing and key.isdigit():
+                self.input_buffer += key
+                self.update_display()
+            elif self.flashing and (key == '\x7f' or key == '\x08'):  # Clear/Delete key
+                if self.input_buffer:
+                    self.input_buffer = self.input_buffer[:-1]
+                    self.update_display()
+        return True
+    
     def switch_mode(self):
         self.mode = "manual" if self.mode == "beam" else "beam"
         print(f"Switched to {self.mode} mode")
@@ -185,6 +225,8 @@ class BreakBeamCounter:
             self.flashing = True
             self.input_buffer = ""
             self.last_flash_time = time.time()
+            # Hands the offscreen canvas to the flash until the input ends
+            self.flash.start(self.canvas, 0)
             print("Input mode started - type numbers to set count")
     
     def cancel_input(self):
@@ -198,6 +240,8 @@ class BreakBeamCounter:
                     print("Invalid input")
             self.flashing = False
             self.input_buffer = ""
+            self.canvas = self.flash.stop()
+            self.frames.forget()
             print("Input mode ended")
             self.update_display()
         else:  # If not flashing, just clear any pending input
@@ -209,14 +253,8 @@ class BreakBeamCounter:
             self.display_number(self.count)
         else:  # manual mode
             if self.flashing:
-                current_time = time.time()
-                if current_time - self.last_flash_time >= self.flash_interval:
-                    self.last_flash_time = current_time
-                    # Toggle between showing the number and a blank screen
-                    if self.input_buffer:
-                        self.display_number(int(self.input_buffer))
-                    else:
-                        self.display_number(0)
+                # The flash alternates the number with a blank screen by itself
+                self.flash.set_value(int(self.input_buffer) if self.input_buffer else 0)
             else:
                 self.display_number(self.count)
     
@@ -231,6 +269,15 @@ class BreakBeamCounter:
                 
                 self.update_display()
     
+    def count_hits(self, source, hits):
+        # Hits the beam process has already debounced
+        if self.mode == "beam":
+            self.count += hits
+            self.last_hit_time = time.time()
+            print(f"Hit detected from {source}! Count: {self.count}")
+            
+            self.update_display()
+    
     def display_image(self, image_path, duration=None):
         try:
             path = os.path.dirname(os.path.realpath(__file__)) + "/" + 'logo.png'
@@ -247,7 +294,7 @@ class BreakBeamCounter:
             
             # Display the image
             self.canvas.SetImage(img, x_offset, y_offset)
-            self.canvas = self.matrix.SwapOnVSync(self.canvas)
+            self.canvas = self.frames.swap(self.canvas, ("image", image_path))
             
             if duration:
                 time.sleep(duration)
@@ -260,6 +307,22 @@ class BreakBeamCounter:
             return False
     
     def display_number(self, number):
+        if self.flash.running:
+            # The flash owns the canvases while input is flashing
+            self.flash.set_value(number)
+            return
+
+        key = ("number", str(number), self.text_color)
+        if self.frames.already_showing(key):
+            return
+
+        self.render_number(self.canvas, number)
+        self.canvas = self.frames.swap(self.canvas, key)
+
+    def render_number(self, canvas, number):
+        if self.text_renderer is not None:
+            self.text_renderer.draw_centered(canvas, number, self.text_color)
+            return
 
         img = Image.new('RGB', (self.matrix.width, self.matrix.height), (0, 0, 0))
         draw = ImageDraw.Draw(img)
@@ -278,10 +341,10 @@ class BreakBeamCounter:
         draw.text(position, text, font=self.font, fill=self.text_color)
         
         # Display the image
-        self.canvas.SetImage(img)
-        self.canvas = self.matrix.SwapOnVSync(self.canvas)
+        canvas.SetImage(img)
     
     def monitor_sensors(self):
+        self.placement.apply("input")
         # Store previous states to detect changes
         prev_states = {
             "beam1": True,
@@ -313,10 +376,33 @@ class BreakBeamCounter:
             except Exception as e:
                 print(f"Error reading sensors: {e}")
             
-            # Small delay to prevent CPU overuse
-            time.sleep(0.01)
+            # Small delay to prevent CPU overuse, longer while idle
+            self.idle.sleep(SENSOR_POLL)
+    
+    def monitor_beam_counts(self):
+        self.placement.apply("input")
+        counts = self.beams.counts
+        debounce_time = self.debounce_time
+        hits, _, pins = counts.snapshot()
+        edges = [pin[0] for pin in pins]
+        
+        while self.running:
+            if self.debounce_time != debounce_time:
+                debounce_time = self.debounce_time
+                counts.set_debounce(debounce_time)
+            
+            # Edges that came in while this thread was busy are still counted
+            new_hits, _, pins = counts.snapshot()
+            if new_hits != hits:
+                broken = [BEAM_NAMES[i] for i, pin in enumerate(pins) if pin[0] != edges[i]]
+                self.count_hits(", ".join(broken), new_hits - hits)
+                hits = new_hits
+            edges = [pin[0] for pin in pins]
+            
+            self.idle.sleep(SENSOR_POLL)
     
     def run(self):
+        self.placement.apply("render")
         try:
             print("Starting break beam counter...")
 
@@ -331,7 +417,7 @@ class BreakBeamCounter:
             
             # Keep the program running
             while self.running:
-                time.sleep(0.1)
+                self.idle.sleep(MAIN_LOOP_POLL)
                 
         except KeyboardInterrupt:
             print("Program interrupted")
@@ -340,13 +426,21 @@ class BreakBeamCounter:
     
     def cleanup(self):
         print(f"Final count: {self.count}")
+        if self.flash.running:
+            self.canvas = self.flash.stop()
         # Clear the display
         self.canvas.Clear()
-        self.matrix.SwapOnVSync(self.canvas)
+        self.frames.swap(self.canvas)
         # Stop monitoring
         self.running = False
         if hasattr(self, 'sensor_thread'):
             self.sensor_thread.join(timeout=1.0)
+        if self.beams is not None:
+            self.beams.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.sync is not None:
+            self.sync.close()
 
 if __name__ == "__main__":
     counter = BreakBeamCounter()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# hit_counter_v2 on a single asyncio loop. Keyboard events come from evdev's
+# async reader, beam breaks arrive as GPIO edge callbacks handed over to the
+# loop, and the logo / "mode reset" screens are timed with call_later instead
+# of sleeping, so input keeps being handled while they are up. Only the loop
+# thread ever draws to the matrix.
+import asyncio
+import os
+
+import hit_counter_v2
+from hit_counter_v2 import GPIO
+from idle_power import SENSOR_POLL
+
+
+class DirectTestCounter(hit_counter_v2.DirectTestCounter):
+    def __init__(self, *args, **kwargs):
+        super(DirectTestCounter, self).__init__(*args, **kwargs)
+        self.loop = None
+        self._stop_event = None
+        self._screen_timer = None
+        self._poll_beams = False
+
+    ########################### TIMED SCREENS #################################
+
+    def show_timed_screen(self, draw, duration, then):
+        # Draws a screen now and `then` after `duration` seconds, unless
+        # something else gets drawn in the meantime
+        draw()
+        self._screen_timer = self.loop.call_later(duration, self._end_timed_screen, then)
+
+    def _end_timed_screen(self, then):
+        self._screen_timer = None
+        then()
+
+    def _cancel_timed_screen(self):
+        if self._screen_timer is not None:
+            self._screen_timer.cancel()
+            self._screen_timer = None
+
+    def display_number(self, number):
+        self._cancel_timed_screen()
+        super(DirectTestCounter, self).display_number(number)
+
+    def display_image(self, image_path, duration=None):
+        self._cancel_timed_screen()
+        return super(DirectTestCounter, self).display_image(image_path)
+
+    def init(self):
+        print("Starting async hit counter...")
+        init_load_wait_time = 2
+        if os.path.exists(self.logo_path):
+            print(f"Displaying logo for {init_load_wait_time} seconds: {self.logo_path}")
+            self.show_timed_screen(lambda: self.display_image(self.logo_path), init_load_wait_time,
+                                   lambda: self.display_number(0))
+        else:
+            print(f"Logo file not found: {self.logo_path}")
+            self.display_number(0)
+
+    def change_mode(self):
+        # if you dont want it to show the logo inbetween changing modes set this to 0
+        logo_show_time = 1
+        if self.mode == "beam":
+            self.mode = "strength"
+            show_value = self.display_strength_value
+        else:
+            self.mode = "beam"
+            show_value = self.display_beam_value
+
+        if logo_show_time and os.path.exists(self.logo_path):
+            self.show_timed_screen(lambda: self.display_image(self.logo_path), logo_show_time, show_value)
+        else:
+            show_value()
+
+    def strength_reset_input(self):
+        self.reset_counter += 1
+        if self.reset_counter >= 2:
+            self.reset_strength_mode()
+            self.show_timed_screen(lambda: self.display_number("Stregth\nmode\nreset"), 1,
+                                   lambda: self.display_number("0"))
+
+    ############################### INPUT #####################################
+
+    async def read_keyboard(self):
+        dev = self.open_keyboard()
+        if dev is None:
+            return
+        async for event in dev.async_read_loop():
+            self.handle_key_event(event)
+
+    def _beam_edge(self, pin):
+        # Called on the GPIO library's thread
+        try:
+            self.loop.call_soon_threadsafe(self.increment_counter)
+        except RuntimeError:
+            pass  # loop already closed while shutting down
+
+    def watch_beams(self):
+        try:
+            for pin in self.beam_pins:
+                GPIO.add_event_detect(pin, GPIO.FALLING, callback=self._beam_edge)
+        except Exception as e:
+            print(f"Edge detection unavailable ({e}), polling beams instead")
+            self._poll_beams = True
+
+    def unwatch_beams(self):
+        for pin in self.beam_pins:
+            try:
+                GPIO.remove_event_detect(pin)
+            except Exception:
+                pass
+
+    async def poll_beams(self):
+        while self._poll_beams:
+            for pin in self.beam_pins:
+                if GPIO.input(pin) == GPIO.LOW:
+                    self.increment_counter()
+                    break
+            await asyncio.sleep(self.idle.interval(SENSOR_POLL))
+
+    ############################### LOOP ######################################
+
+    async def main(self):
+        # One thread for beams, keyboard and drawing
+        self.placement.apply("input")
+        self._stop_event = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        if not self.running:
+            # stop() was called before the loop existed
+            return
+        self.init()
+        self.watch_beams()
+        tasks = [asyncio.create_task(self.read_keyboard())]
+        if self._poll_beams:
+            tasks.append(asyncio.create_task(self.poll_beams()))
+        print("Counter started.")
+        try:
+            await self._stop_event.wait()
+        finally:
+            self._poll_beams = False
+            self.unwatch_beams()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        self.running = False
+        if self.loop is not None and self._stop_event is not None:
+            try:
+                self.loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                pass  # loop already finished
+
+    def run(self):
+        try:
+            asyncio.run(self.main())
+        except KeyboardInterrupt:
+            print("Program interrupted")
+        finally:
+            self.cleanup()
+
+
+if __name__ == "__main__":
+    counter = DirectTestCounter()
+    counter.run()
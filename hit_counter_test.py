@@ -4,11 +4,18 @@ import sys
 import os
 import threading
 from PIL import Image, ImageDraw, ImageFont
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
-import keyboard as kb
+from matrix_backend import RGBMatrix, RGBMatrixOptions
+from text_renderer import make_text_renderer
+from frame_gate import FrameGate
+from cpu_placement import Placement
+from frame_recorder import record_matrix
+from frame_sync import send_frames
+from idle_power import IdlePower, DEFAULT_IDLE_AFTER
+from flash_animation import FlashAnimation
+from keyboard_events import KeyboardEvents
 
 class DirectTestCounter:
-    def __init__(self, logo_path="logo.png", debounce_time=0.5):
+    def __init__(self, logo_path="logo.png", debounce_time=0.5, bdf_font=None, idle_after=DEFAULT_IDLE_AFTER, placement=None, record=None, sync_to=None):
         self.count = 0
         self.logo_path = logo_path
         self.debounce_time = debounce_time
@@ -18,6 +25,13 @@ class DirectTestCounter:
         self.input_buffer = ""
         self.last_flash_time = 0
         self.flash_interval = 0.5  # seconds between flashes
+        self.keyboard_events = None
+        # Read directly when the keyboard library's hook is unavailable
+        self.keyboard_device_path = '/dev/input/by-path/platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.3:1.0-event-kbd'
+        
+        # Cores and scheduling for the input and render threads, e.g.
+        # placement="render=1;input=2:fifo=40" (default: $RGBMATRIX_PLACEMENT)
+        self.placement = Placement.parse(placement) if placement else Placement.from_env()
         
         # Configure matrix options
         self.options = RGBMatrixOptions()
@@ -32,7 +46,15 @@ class DirectTestCounter:
         
         # Create matrix
         self.matrix = RGBMatrix(options=self.options)
+        # Frames shown go to record (default: $RGBMATRIX_RECORD) and to the sync
+        # agents in sync_to (default: $RGBMATRIX_SYNC_TO), headless only
+        self.recorder = record_matrix(self.matrix, record)
+        self.sync = send_frames(self.matrix, sync_to)
         self.canvas = self.matrix.CreateFrameCanvas()
+        # Slows the polling loops down while the frame doesn't change
+        self.idle = IdlePower(self.matrix, idle_after)
+        self.frames = FrameGate(self.matrix, self.idle)
+        self.flash = FlashAnimation(self.matrix, self.render_number, self.flash_interval, idle=self.idle)
         
         # Try to load a font
         self.font = None
@@ -56,6 +78,9 @@ class DirectTestCounter:
         if self.font is None:
             print("Using default font")
             self.font = ImageFont.load_default()
+
+        # BDF fonts from fonts/ (largest first) replace Pillow text when given
+        self.text_renderer = make_text_renderer("bdf", bdf_font) if bdf_font else None
     
     def keyboard_listener(self):
         print("Numeric Keypad Controls:")
@@ -97,14 +122,11 @@ class DirectTestCounter:
                         break
                     elif self.flashing and key.isdigit():
                         self.input_buffer += key
-                        self.display_number(int(self.input_buffer))
+                        self.update_display()
                     elif self.flashing and (key == '\x7f' or key == '\x08'):  # Clear/Delete key
                         if self.input_buffer:
                             self.input_buffer = self.input_buffer[:-1]
-                            if self.input_buffer:
-                                self.display_number(int(self.input_buffer))
-                            else:
-                                self.display_number(0)
+                            self.update_display()
         except Exception as e:
             print(f"Error in keyboard listener: {e}")
     
@@ -120,6 +142,8 @@ class DirectTestCounter:
             self.flashing = True
             self.input_buffer = ""
             self.last_flash_time = time.time()
+            # Hands the offscreen canvas to the flash until the input ends
+            self.flash.start(self.canvas, 0)
             print("Input mode started - type numbers to set count")
     
     def cancel_input(self):
@@ -133,6 +157,8 @@ class DirectTestCounter:
                     print("Invalid input")
             self.flashing = False
             self.input_buffer = ""
+            self.canvas = self.flash.stop()
+            self.frames.forget()
             print("Input mode ended")
             self.update_display()
         else:  # If not flashing, just clear any pending input
@@ -144,14 +170,8 @@ class DirectTestCounter:
             self.display_number(self.count)
         else:  # manual mode
             if self.flashing:
-                current_time = time.time()
-                if current_time - self.last_flash_time >= self.flash_interval:
-                    self.last_flash_time = current_time
-                    # Toggle between showing the number and a blank screen
-                    if self.input_buffer:
-                        self.display_number(int(self.input_buffer))
-                    else:
-                        self.display_number(0)
+                # The flash alternates the number with a blank screen by itself
+                self.flash.set_value(int(self.input_buffer) if self.input_buffer else 0)
             else:
                 self.display_number(self.count)
     
@@ -184,7 +204,7 @@ class DirectTestCounter:
             
             # Display the image
             self.canvas.SetImage(img, x_offset, y_offset)
-            self.canvas = self.matrix.SwapOnVSync(self.canvas)
+            self.canvas = self.frames.swap(self.canvas, ("image", image_path))
             
             if duration:
                 time.sleep(duration)
@@ -196,7 +216,23 @@ class DirectTestCounter:
             return False
     
     def display_number(self, number):
-        # Create a new image with black background
+        if self.flash.running:
+            # The flash owns the canvases while input is flashing
+            self.flash.set_value(number)
+            return
+
+        key = ("number", str(number), self.text_color)
+        if self.frames.already_showing(key):
+            return
+
+        self.render_number(self.canvas, number)
+        self.canvas = self.frames.swap(self.canvas, key)
+
+    def render_number(self, canvas, number):
+        if self.text_renderer is not None:
+            self.text_renderer.draw_centered(canvas, number, self.text_color)
+            return
+
         img = Image.new('RGB', (self.matrix.width, self.matrix.height), (0, 0, 0))
         draw = ImageDraw.Draw(img)
         
@@ -214,8 +250,7 @@ class DirectTestCounter:
         draw.text(position, text, font=self.font, fill=self.text_color)
         
         # Display the image
-        self.canvas.SetImage(img)
-        self.canvas = self.matrix.SwapOnVSync(self.canvas)
+        canvas.SetImage(img)
     
     def init(self):
         print("Starting test hit counter...")
@@ -231,6 +266,7 @@ class DirectTestCounter:
         self.display_number(0)
 
     def run(self):
+        self.placement.apply("render")
         try:
             self.init()
             
@@ -249,35 +285,44 @@ class DirectTestCounter:
     
     def cleanup(self):
         print(f"Final count: {self.count}")
+        if self.keyboard_events is not None:
+            self.keyboard_events.stop()
+        if self.flash.running:
+            self.canvas = self.flash.stop()
         # Clear the display
         self.canvas.Clear()
-        self.matrix.SwapOnVSync(self.canvas)
+        self.frames.swap(self.canvas)
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.sync is not None:
+            self.sync.close()
 
 
 
 
     def check_for_keyboard_input(self):
+        self.placement.apply("input")
         plus = "-"
         minus = "+"
-        
+
+        # Sleeps until a key goes down instead of spinning on kb.is_pressed()
+        self.keyboard_events = KeyboardEvents(self.keyboard_device_path)
+        if not self.keyboard_events.start():
+            print("No keyboard input available")
+            return
         while True:
-            if kb.is_pressed(minus):
+            key = self.keyboard_events.get()
+            if key is None:
+                break
+            if key == minus:
                 self.decrement_counter()
-                while kb.is_pressed(minus):
-                    pass
-            elif kb.is_pressed(plus):
+            elif key == plus:
                 self.increment_counter()
-                while kb.is_pressed(plus):
-                    pass
-            elif kb.is_pressed("/"):
+            elif key == "/":
                 self.display_number("/")
-                while kb.is_pressed("/"):
-                    pass
-            elif kb.is_pressed("0"):
+            elif key == "0":
                 self.count = 0
                 self.update_display()
-                while kb.is_pressed("0"):
-                    pass
 
     def increment_counter(self):
         current_time = time.time()
@@ -3,12 +3,18 @@ import time
 import os
 import threading
 from PIL import Image, ImageDraw, ImageFont
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
+from matrix_backend import RGBMatrix, RGBMatrixOptions
+from text_renderer import make_text_renderer
+from frame_gate import FrameGate
+from cpu_placement import Placement
+from frame_recorder import record_matrix
+from frame_sync import send_frames
+from idle_power import IdlePower, DEFAULT_IDLE_AFTER, SENSOR_POLL
 from evdev import InputDevice, categorize, ecodes
 import RPi.GPIO as GPIO
 
 class DirectTestCounter:
-    def __init__(self, logo_path="logo.png", debounce_time=0.5):
+    def __init__(self, logo_path="logo.png", debounce_time=0.5, bdf_font=None, idle_after=DEFAULT_IDLE_AFTER, placement=None, record=None, sync_to=None):
         self.count = 0
         self.logo_path = logo_path
         self.debounce_time = debounce_time
@@ -18,12 +24,17 @@ class DirectTestCounter:
         self.input_buffer = ""
         self.last_flash_time = 0
         self.flash_interval = 0.5
+        self.running = True
 
         self.beam_pins = [26, 16, 5, 6]
         GPIO.setmode(GPIO.BCM)
         for pin in self.beam_pins:
             GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 
+        # Cores and scheduling for the input and render threads, e.g.
+        # placement="render=1;input=2:fifo=40" (default: $RGBMATRIX_PLACEMENT)
+        self.placement = Placement.parse(placement) if placement else Placement.from_env()
+
         self.options = RGBMatrixOptions()
         self.options.rows = 64
         self.options.cols = 64
@@ -35,7 +46,14 @@ class DirectTestCounter:
         self.options.disable_hardware_pulsing = True
 
         self.matrix = RGBMatrix(options=self.options)
+        # Frames shown go to record (default: $RGBMATRIX_RECORD) and to the sync
+        # agents in sync_to (default: $RGBMATRIX_SYNC_TO), headless only
+        self.recorder = record_matrix(self.matrix, record)
+        self.sync = send_frames(self.matrix, sync_to)
         self.canvas = self.matrix.CreateFrameCanvas()
+        # Slows the polling loops down while the frame doesn't change
+        self.idle = IdlePower(self.matrix, idle_after)
+        self.frames = FrameGate(self.matrix, self.idle)
 
         self.font = None
         self.font_size = 56
@@ -61,6 +79,9 @@ class DirectTestCounter:
             print("Using default font")
             self.font = ImageFont.load_default()
 
+        # BDF fonts from fonts/ (largest first) replace Pillow text when given
+        self.text_renderer = make_text_renderer("bdf", bdf_font) if bdf_font else None
+
     def init(self):
         print("Starting test hit counter...")
         init_load_wait_time = 2
@@ -72,6 +93,8 @@ class DirectTestCounter:
         self.display_number(0)
 
     def run(self):
+        # The beams are polled (and the frames they trigger drawn) here
+        self.placement.apply("input")
         try:
             self.init()
             kb_thread = threading.Thread(target=self.check_for_keyboard_input)
@@ -79,14 +102,14 @@ class DirectTestCounter:
             kb_thread.start()
             print("Counter started.")
 
-            while True:
+            while self.running:
                 current_time = time.time()
                 if current_time - self.last_hit_time > self.debounce_time:
                     for pin in self.beam_pins:
                         if GPIO.input(pin) == GPIO.LOW:
                             self.increment_counter()
                             break
-                time.sleep(0.01)
+                self.idle.sleep(SENSOR_POLL)
 
         except KeyboardInterrupt:
             print("Program interrupted")
@@ -96,10 +119,15 @@ class DirectTestCounter:
     def cleanup(self):
         print(f"Final count: {self.count}")
         self.canvas.Clear()
-        self.matrix.SwapOnVSync(self.canvas)
+        self.frames.swap(self.canvas)
         GPIO.cleanup()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.sync is not None:
+            self.sync.close()
 
     def check_for_keyboard_input(self):
+        self.placement.apply("input")
         device_path = '/dev/input/by-path/platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.3:1.0-event-kbd'
         try:
             dev = InputDevice(device_path)
@@ -158,7 +186,7 @@ class DirectTestCounter:
 
             self.canvas.Clear()
             self.canvas.SetImage(img, x_offset, y_offset)
-            self.canvas = self.matrix.SwapOnVSync(self.canvas)
+            self.canvas = self.frames.swap(self.canvas, ("image", image_path))
 
             if duration:
                 time.sleep(duration)
@@ -170,6 +198,15 @@ class DirectTestCounter:
             return False
 
     def display_number(self, number):
+        key = ("number", str(number), self.text_color)
+        if self.frames.already_showing(key):
+            return
+
+        if self.text_renderer is not None:
+            self.text_renderer.draw_centered(self.canvas, number, self.text_color)
+            self.canvas = self.frames.swap(self.canvas, key)
+            return
+
         img = Image.new('RGB', (self.matrix.width, self.matrix.height), (0, 0, 0))
         draw = ImageDraw.Draw(img)
         text = str(number)
@@ -198,7 +235,7 @@ class DirectTestCounter:
 
         draw.text((x_position, y_position), text, font=font, fill=self.text_color)
         self.canvas.SetImage(img)
-        self.canvas = self.matrix.SwapOnVSync(self.canvas)
+        self.canvas = self.frames.swap(self.canvas, key)
 
 
 if __name__ == "__main__":
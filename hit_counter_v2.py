@@ -3,12 +3,21 @@ import time
 import os
 import threading
 from PIL import Image, ImageDraw, ImageFont
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
+from matrix_backend import RGBMatrix, RGBMatrixOptions
+from text_renderer import make_text_renderer
+from frame_gate import FrameGate
+from cpu_placement import Placement
+from frame_recorder import record_matrix
+from frame_sync import send_frames
+from idle_power import IdlePower, DEFAULT_IDLE_AFTER, SENSOR_POLL
+from compositor import Compositor, OPAQUE, COLORKEY
+from image_fit import fit, open_reduced
+from transition import Transition, CROSSFADE
 from evdev import InputDevice, categorize, ecodes
 import RPi.GPIO as GPIO
 
 class DirectTestCounter:
-    def __init__(self, logo_path="logo.png", debounce_time=0.5):
+    def __init__(self, logo_path="logo.png", debounce_time=0.5, bdf_font=None, idle_after=DEFAULT_IDLE_AFTER, placement=None, record=None, sync_to=None, transition=CROSSFADE):
         self.count = 0
         self.logo_path = logo_path
         self.debounce_time = debounce_time
@@ -18,6 +27,7 @@ class DirectTestCounter:
         self.input_buffer = ""
         self.last_flash_time = 0
         self.flash_interval = 0.5
+        self.running = True
 
         # Storing data for strength setting
         self.total_strength_value = 0
@@ -25,10 +35,15 @@ class DirectTestCounter:
         self.reset_counter = 0
 
         self.beam_pins = [26, 16, 5, 6]
+        self.keyboard_device_path = '/dev/input/by-path/platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.3:1.0-event-kbd'
         GPIO.setmode(GPIO.BCM)
         for pin in self.beam_pins:
             GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 
+        # Cores and scheduling for the input and render threads, e.g.
+        # placement="render=1;input=2:fifo=40" (default: $RGBMATRIX_PLACEMENT)
+        self.placement = Placement.parse(placement) if placement else Placement.from_env()
+
         self.options = RGBMatrixOptions()
         self.options.rows = 64
         self.options.cols = 64
@@ -40,7 +55,17 @@ class DirectTestCounter:
         self.options.disable_hardware_pulsing = True
 
         self.matrix = RGBMatrix(options=self.options)
+        # Frames shown go to record (default: $RGBMATRIX_RECORD) and to the sync
+        # agents in sync_to (default: $RGBMATRIX_SYNC_TO), headless only
+        self.recorder = record_matrix(self.matrix, record)
+        self.sync = send_frames(self.matrix, sync_to)
         self.canvas = self.matrix.CreateFrameCanvas()
+        # Slows the polling loops down while the frame doesn't change
+        self.idle = IdlePower(self.matrix, idle_after)
+        self.frames = FrameGate(self.matrix, self.idle)
+        # Blends the logo in and out when the mode changes ("crossfade",
+        # "wipe" or "slide"), on a thread of its own
+        self.transition = Transition(self.frames, transition)
 
         self.font = None
         self.font_size = 56
@@ -66,6 +91,47 @@ class DirectTestCounter:
             print("Using default font")
             self.font = ImageFont.load_default()
 
+        # BDF fonts from fonts/ (largest first) replace Pillow text when given
+        self.text_renderer = make_text_renderer("bdf", bdf_font) if bdf_font else None
+        self.setup_screen()
+
+    def setup_screen(self):
+        # The value and the logo are cached layers, so going back from the
+        # logo to an unchanged value (or showing the logo again) renders nothing
+        self.screen = Compositor(self.matrix.width, self.matrix.height)
+        self.screen.add_layer("value", self.render_number, blend=COLORKEY)
+        self.screen.add_layer("logo", self.render_image, blend=OPAQUE, visible=False)
+
+    def show_screen(self):
+        # The compositor's version tells whether the frame changed at all
+        self.screen.compose()
+        key = ("screen", self.screen.version)
+        if self.frames.already_showing(key):
+            return
+        self.screen.draw(self.canvas)
+        self.canvas = self.frames.swap(self.canvas, key)
+
+    def shown_screen(self):
+        # The frame on the panel if the compositor drew it, None otherwise
+        frame = self.screen.compose()
+        if self.frames.shown != ("screen", self.screen.version):
+            return None
+        return frame
+
+    def transition_to(self, set_screen, hold=0, then=None):
+        # Like show_screen after set_screen() changes the layers, but blended
+        # in from the frame that is up. Returns right away; then() is called
+        # on the transition thread once the new screen has been up for hold
+        # seconds, unless something else is drawn first.
+        self.transition.stop()
+        outgoing = self.shown_screen()
+        set_screen()
+        incoming = self.screen.compose()
+        key = ("screen", self.screen.version)
+        if self.frames.shown == key:
+            outgoing = None
+        self.transition.start(outgoing, incoming, key, hold, then)
+
     def init(self):
         print("Starting test hit counter...")
         init_load_wait_time = 2
@@ -77,6 +143,8 @@ class DirectTestCounter:
         self.display_number(0)
 
     def run(self):
+        # The beams are polled (and the frames they trigger drawn) here
+        self.placement.apply("input")
         try:
             self.init()
             kb_thread = threading.Thread(target=self.check_for_keyboard_input)
@@ -84,14 +152,14 @@ class DirectTestCounter:
             kb_thread.start()
             print("Counter started.")
 
-            while True:
+            while self.running:
                 current_time = time.time()
                 if current_time - self.last_hit_time > self.debounce_time:
                     for pin in self.beam_pins:
                         if GPIO.input(pin) == GPIO.LOW:
                             self.increment_counter()
                             break
-                time.sleep(0.01)
+                self.idle.sleep(SENSOR_POLL)
 
         except KeyboardInterrupt:
             print("Program interrupted")
@@ -100,40 +168,78 @@ class DirectTestCounter:
 
     def cleanup(self):
         print(f"Final count: {self.count}")
+        self.transition.stop()
         self.canvas.Clear()
-        self.matrix.SwapOnVSync(self.canvas)
+        self.frames.swap(self.canvas)
         GPIO.cleanup()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.sync is not None:
+            self.sync.close()
 
-    def check_for_keyboard_input(self):
-        device_path = '/dev/input/by-path/platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.3:1.0-event-kbd'
+    def open_keyboard(self):
+        device_path = self.keyboard_device_path
         try:
             dev = InputDevice(device_path)
             print(f"Listening for keypresses from: {device_path}")
+            return dev
         except Exception as e:
             print(f"Failed to open device at {device_path}: {e}")
+            return None
+
+    def check_for_keyboard_input(self):
+        self.placement.apply("input")
+        dev = self.open_keyboard()
+        if dev is None:
             return
         for event in dev.read_loop():
-            if event.type == ecodes.EV_KEY:
-                key_event = categorize(event)
-                if key_event.keystate == key_event.key_down:
-                    keycode = key_event.keycode
-                    print(f"Key pressed: {keycode}")
-                    if self.mode == "beam":
-                        self.beam_keyboard_input_check(keycode)
-                    elif self.mode == "strength":
-                        self.strength_keyboard_input_check(keycode)
+            self.handle_key_event(event)
+
+    def handle_key_event(self, event):
+        if event.type == ecodes.EV_KEY:
+            key_event = categorize(event)
+            if key_event.keystate == key_event.key_down:
+                keycode = key_event.keycode
+                print(f"Key pressed: {keycode}")
+                if self.mode == "beam":
+                    self.beam_keyboard_input_check(keycode)
+                elif self.mode == "strength":
+                    self.strength_keyboard_input_check(keycode)
 
     def change_mode(self):
-        # if you dont want it to show the logo inbetween changing modes comment the lines below
-        logo_show_time = 1 
-        self.display_image(self.logo_path, logo_show_time)
-        
+        # if you dont want it to show the logo inbetween changing modes set this to 0
+        logo_show_time = 1
         if self.mode == "beam":
             self.mode = "strength"
-            self.display_strength_value()
         elif self.mode == "strength":
             self.mode = "beam"
-            self.display_beam_value()
+
+        # The logo is blended in, held and blended out on the transition
+        # thread, so keys and beams keep being handled meanwhile
+        if logo_show_time and os.path.exists(self.logo_path):
+            self.transition_to(self.set_logo_screen, logo_show_time, self.show_mode_value)
+        else:
+            self.show_mode_value()
+
+    def set_logo_screen(self):
+        self.screen.update("logo", path=self.logo_path, visible=True)
+
+    def set_value_screen(self):
+        self.screen.update("logo", visible=False)
+        self.screen.update("value", text=str(self.mode_value()), color=self.text_color)
+
+    def mode_value(self):
+        if self.mode == "strength":
+            return f"{self.total_strength_value}kg"
+        return self.count
+
+    def show_mode_value(self):
+        # BDF text is drawn straight into the canvas, so there's no frame to
+        # blend into: that one is a cut
+        if self.text_renderer is not None:
+            self.display_number(self.mode_value())
+        else:
+            self.transition_to(self.set_value_screen)
 
     ###########################################################################
 
@@ -237,22 +343,19 @@ class DirectTestCounter:
     def display_beam_value(self):
         self.display_number(self.count)
 
+    def render_image(self, path):
+        size = (self.matrix.width, self.matrix.height)
+        return fit(open_reduced(path, size), size, (0, 0, 0))
+
     def display_image(self, image_path, duration=None):
         try:
             if not os.path.exists(image_path):
                 print(f"Image not found: {image_path}")
                 return False
 
-            img = Image.open(image_path).convert('RGB')
-            img.thumbnail((self.matrix.width, self.matrix.height), Image.LANCZOS)
-
-            width, height = img.size
-            x_offset = (self.matrix.width - width) // 2
-            y_offset = (self.matrix.height - height) // 2
-
-            self.canvas.Clear()
-            self.canvas.SetImage(img, x_offset, y_offset)
-            self.canvas = self.matrix.SwapOnVSync(self.canvas)
+            self.transition.stop()
+            self.screen.update("logo", path=image_path, visible=True)
+            self.show_screen()
 
             if duration:
                 time.sleep(duration)
@@ -260,13 +363,29 @@ class DirectTestCounter:
             return True
 
         except Exception as e:
+            self.screen.update("logo", visible=False)
             print(f"Error displaying image: {e}")
             return False
 
     def display_number(self, number):
+        # Whatever transition is playing gives way to the new value
+        self.transition.stop()
+        key = ("number", str(number), self.text_color)
+        if self.frames.already_showing(key):
+            return
+
+        if self.text_renderer is not None:
+            self.text_renderer.draw_centered(self.canvas, number, self.text_color)
+            self.canvas = self.frames.swap(self.canvas, key)
+            return
+
+        self.screen.update("logo", visible=False)
+        self.screen.update("value", text=str(number), color=self.text_color)
+        self.show_screen()
+
+    def render_number(self, text, color):
         img = Image.new('RGB', (self.matrix.width, self.matrix.height), (0, 0, 0))
         draw = ImageDraw.Draw(img)
-        text = str(number)
 
         # Try largest font, reduce until it fits
         max_font_size = 60
@@ -290,9 +409,8 @@ class DirectTestCounter:
 
         print(f"Auto font size: {font_size}, Text: {text}, Pos: ({x_position}, {y_position})")
 
-        draw.text((x_position, y_position), text, font=font, fill=self.text_color)
-        self.canvas.SetImage(img)
-        self.canvas = self.matrix.SwapOnVSync(self.canvas)
+        draw.text((x_position, y_position), text, font=font, fill=color)
+        return img
 
 
 if __name__ == "__main__":
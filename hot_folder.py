@@ -0,0 +1,260 @@
+# Content dropped into a directory goes into MatrixDisplay's rotation. The
+# directory is watched with inotify (through ctypes, Linux only); where that
+# isn't available, it is rescanned every --watch-interval seconds instead.
+#
+# Every new or changed file is handed to a worker thread, which decodes it
+# and scales it to the panel once. The result is cached along with the
+# file's size and mtime, so a file is only processed again when it changes,
+# and an inotify event only touches the file it names. Files starting with
+# "." are ignored, so tools that write a temporary file and rename it into
+# place (rsync, most editors) are picked up once, when the rename lands.
+#
+#   python3 matrix_display.py --mode playlist --watch /home/pi/content
+#   scp poster.jpg pi@matrix:/home/pi/content/
+import ctypes
+import ctypes.util
+import errno
+import os
+import queue
+import select
+import struct
+import threading
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}
+POLL_INTERVAL = 10.0
+
+# From <sys/inotify.h>
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+_EVENT = struct.Struct("iIII")
+
+_libc = None
+
+
+def _inotify():
+    # libc's inotify functions, or None where there aren't any
+    global _libc
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            _libc = libc
+        except (OSError, AttributeError):
+            _libc = False
+    return _libc or None
+
+
+def wanted(name):
+    return not name.startswith(".") and os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def signature(st):
+    return (st.st_mtime_ns, st.st_size)
+
+
+class HotFolder(object):
+    def __init__(self, directory, prepare, on_change=None, interval=POLL_INTERVAL, use_inotify=True):
+        # prepare(path) turns a file into whatever the rotation needs and runs
+        # on the worker; on_change() is called once the worker has caught up
+        # with a batch of changes
+        if not os.path.isdir(directory):
+            raise ValueError(f"Not a directory: {directory}")
+        self.directory = directory
+        self.prepare = prepare
+        self.on_change = on_change
+        self.interval = interval
+        self.use_inotify = use_inotify
+        self.watching = None  # "inotify" or "poll" once started
+        self._cache = {}  # name -> (signature, prepared or None if it failed)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._stop_event = threading.Event()
+        self._fd = None
+        self._wake = None
+        self._threads = []
+
+        self.events = 0
+        self.scans = 0
+        self.processed = 0
+        self.unchanged = 0
+        self.errors = 0
+        self.removed = 0
+
+    def start(self):
+        if self.use_inotify:
+            self._fd = self._open_inotify()
+        self.watching = "inotify" if self._fd is not None else "poll"
+        # The first scan after the watch is set, so nothing slips between them
+        self._scan()
+        for target, name in ((self._work, "hot-folder-worker"), (self._watch, "hot-folder-watch")):
+            thread = threading.Thread(target=target, name=name)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop_event.set()
+        self._queue.put(None)
+        if self._wake is not None:
+            os.write(self._wake[1], b"\0")
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        for fd in ([self._fd] if self._fd is not None else []) + list(self._wake or ()):
+            os.close(fd)
+        self._fd = self._wake = None
+
+    def items(self):
+        # Prepared files in name order
+        with self._lock:
+            return [prepared for name, (sig, prepared) in sorted(self._cache.items()) if prepared is not None]
+
+    def _open_inotify(self):
+        libc = _inotify()
+        if libc is None:
+            print("inotify isn't available, polling the hot folder instead")
+            return None
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            print(f"Error starting inotify: {os.strerror(ctypes.get_errno())}; polling the hot folder instead")
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(self.directory), WATCH_MASK) < 0:
+            # ENOSPC: out of watches (fs.inotify.max_user_watches)
+            print(f"Error watching {self.directory}: {os.strerror(ctypes.get_errno())}; polling instead")
+            os.close(fd)
+            return None
+        self._wake = os.pipe()
+        return fd
+
+    def _watch(self):
+        if self._fd is None:
+            while not self._stop_event.wait(self.interval):
+                self._scan()
+            return
+        while not self._stop_event.is_set():
+            readable, _, _ = select.select([self._fd, self._wake[0]], [], [])
+            if self._fd not in readable:
+                continue
+            try:
+                data = os.read(self._fd, 65536)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    continue
+                raise
+            self._events(data)
+
+    def _events(self, data):
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            self.events += 1
+            if mask & IN_Q_OVERFLOW:
+                # The kernel dropped events; only a scan can tell what changed
+                self._scan()
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                print(f"Hot folder {self.directory} went away")
+            elif name and wanted(name):
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._remove(name)
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    self._enqueue(name)
+
+    def _scan(self):
+        # stat() of every entry: queues what's new or changed, drops what's
+        # gone
+        self.scans += 1
+        seen = set()
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError as e:
+            print(f"Error scanning {self.directory}: {e}")
+            return
+        for entry in entries:
+            if not wanted(entry.name):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                sig = signature(entry.stat())
+            except OSError:
+                continue
+            seen.add(entry.name)
+            with self._lock:
+                cached = self._cache.get(entry.name)
+            if cached is None or cached[0] != sig:
+                self._enqueue(entry.name)
+        with self._lock:
+            gone = set(self._cache) - seen
+        for name in gone:
+            self._remove(name)
+
+    def _enqueue(self, name):
+        with self._lock:
+            if name in self._pending:
+                return
+            self._pending.add(name)
+        self._queue.put(name)
+
+    def _remove(self, name):
+        with self._lock:
+            removed = self._cache.pop(name, None) is not None
+        if removed:
+            self.removed += 1
+            self._changed()
+
+    def _work(self):
+        changed = False
+        while True:
+            name = self._queue.get()
+            if name is None:
+                return
+            with self._lock:
+                self._pending.discard(name)
+            changed = self._process(name) or changed
+            if changed and self._queue.empty():
+                self._changed()
+                changed = False
+
+    def _process(self, name):
+        # Returns True if the rotation changed
+        path = os.path.join(self.directory, name)
+        try:
+            sig = signature(os.stat(path))
+        except OSError:
+            self._remove(name)
+            return False
+        with self._lock:
+            cached = self._cache.get(name)
+        if cached is not None and cached[0] == sig:
+            self.unchanged += 1
+            return False
+        try:
+            prepared = self.prepare(path)
+            self.processed += 1
+        except Exception as e:
+            # Kept with its signature so it isn't retried until it changes,
+            # e.g. once a slow copy has finished
+            print(f"Error loading {path}: {e}")
+            prepared = None
+            self.errors += 1
+        with self._lock:
+            self._cache[name] = (sig, prepared)
+        return True
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
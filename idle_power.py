@@ -0,0 +1,89 @@
+# Idle power mode for the counters and MatrixDisplay. Frames that reach the
+# panel count as activity; after idle_after seconds without one the polling
+# loops switch to their idle intervals and, where the matrix lets us change
+# it at runtime (the headless matrix), the refresh rate drops as well. The
+# next frame change snaps everything back and wakes the sleeping loops.
+#
+# The real rgbmatrix library only reads limit_refresh_rate_hz at startup
+# (--led-limit-refresh), so on hardware the idle mode saves the Python-side
+# wakeups and the panel keeps its configured rate.
+import threading
+import time
+
+DEFAULT_IDLE_AFTER = 30.0
+IDLE_REFRESH_HZ = 30
+
+# Poll intervals in seconds, (active, idle). The beam sensors keep their
+# active rate while idle: a break is only a few milliseconds long, and the
+# first hit after a quiet spell must not be missed.
+SENSOR_POLL = (0.01, 0.01)
+MAIN_LOOP_POLL = (0.1, 1.0)
+DISPLAY_POLL = (0.1, 1.0)
+FRAMEBUFFER_POLL = (0.002, 0.1)
+
+
+class IdlePower(object):
+    def __init__(self, matrix=None, idle_after=DEFAULT_IDLE_AFTER, idle_refresh_hz=IDLE_REFRESH_HZ):
+        # idle_after of 0 (or None) disables the idle mode
+        self.matrix = matrix
+        self.idle_after = idle_after
+        self.idle_refresh_hz = idle_refresh_hz
+        self.idle = False
+        self.transitions = 0
+        self.wakeups = {"active": 0, "idle": 0}
+        self._active_refresh_hz = None
+        self._last_activity = time.monotonic()
+        self._condition = threading.Condition()
+
+    @property
+    def state(self):
+        return "idle" if self.idle else "active"
+
+    def activity(self):
+        # Called for every frame that actually changes the panel
+        with self._condition:
+            self._last_activity = time.monotonic()
+            if self.idle:
+                self.idle = False
+                self.transitions += 1
+                self._set_refresh(self._active_refresh_hz)
+                self._condition.notify_all()
+
+    def check(self):
+        if self.idle or not self.idle_after:
+            return self.idle
+        with self._condition:
+            if not self.idle and time.monotonic() - self._last_activity >= self.idle_after:
+                self.idle = True
+                self.transitions += 1
+                self._active_refresh_hz = getattr(self.matrix, "refresh_rate_hz", None)
+                if self._active_refresh_hz:
+                    self._set_refresh(min(self._active_refresh_hz, self.idle_refresh_hz))
+        return self.idle
+
+    def interval(self, intervals):
+        # The poll interval for the current state, from an (active, idle) pair
+        return intervals[1] if self.check() else intervals[0]
+
+    def sleep(self, intervals, stop=None):
+        # Sleeps one poll interval; an idle sleep ends early on activity.
+        # Returns False if the stop event is set.
+        idle = self.check()
+        self.wakeups[self.state] += 1
+        if not idle:
+            if stop is not None:
+                return not stop.wait(intervals[0])
+            time.sleep(intervals[0])
+            return True
+        with self._condition:
+            self._condition.wait_for(lambda: not self.idle or (stop is not None and stop.is_set()), intervals[1])
+        return stop is None or not stop.is_set()
+
+    def wake(self):
+        # Lets idle sleepers re-check their stop event
+        with self._condition:
+            self._condition.notify_all()
+
+    def _set_refresh(self, hz):
+        if hz and hasattr(self.matrix, "refresh_rate_hz"):
+            self.matrix.refresh_rate_hz = hz
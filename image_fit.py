@@ -0,0 +1,72 @@
+# Images scaled to fit the panel without decoding more than that needs. A
+# 4000x3000 photo for a 64x64 panel is 36 MB of pixels at full resolution,
+# and all but a few KB of it is thrown away. So:
+#   - JPEGs are decoded at reduced size: draft() lets the decoder skip DCT
+#     detail, at 1/2, 1/4 or 1/8 scale, down to the smallest size that is
+#     still at least as large as the result.
+#   - Everything else is decoded in full, then shrunk by an integer factor
+#     with reduce() (a box filter, cheap) to within REDUCING_GAP times the
+#     result, and only that is resampled with LANCZOS.
+# The source is dropped as soon as it has been reduced. load_fitted() returns
+# the panel-sized result and a small preview (PREVIEW_SCALE times the panel),
+# which is enough to fit again for another background color without going
+# back to the file.
+#
+#   fitted, preview = load_fitted("photo.jpg", (64, 64), (0, 0, 0))
+from PIL import Image
+
+REDUCING_GAP = 2
+PREVIEW_SCALE = 2
+# Modes reduce() and resize() handle directly; others are converted first
+SHRINK_MODES = {"RGB", "RGBA", "L", "LA"}
+
+
+def fitted_size(size, box):
+    # size scaled to fit inside box, keeping its aspect ratio; never enlarged
+    width, height = size
+    scale = min(box[0] / width, box[1] / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def shrink(image, size):
+    # image resampled to size, reduced by a whole factor first if it is more
+    # than REDUCING_GAP times larger
+    factor = min(image.width // (size[0] * REDUCING_GAP), image.height // (size[1] * REDUCING_GAP))
+    if factor >= 2:
+        image = image.reduce(factor)
+    if image.size != size:
+        image = image.resize(size, Image.LANCZOS)
+    return image
+
+
+def fit(image, box, bg_color):
+    # Scaled down to fit box and centered on bg_color
+    image = shrink(image, fitted_size(image.size, box))
+    if image.size == tuple(box):
+        return image
+    frame = Image.new("RGB", box, bg_color)
+    frame.paste(image, ((box[0] - image.width) // 2, (box[1] - image.height) // 2))
+    return frame
+
+
+def open_reduced(path, box):
+    # The image at path as RGB, decoded or reduced to no more than needed to
+    # fit box
+    with Image.open(path) as image:
+        if image.format == "JPEG":
+            # Only asks the decoder to scale; the size it picks is still
+            # at least the fitted size
+            image.draft("RGB", fitted_size(image.size, box))
+        if image.mode not in SHRINK_MODES:
+            image = image.convert("RGB")
+        image.load()
+    # Shrunk before converting, so a full-size copy is never made
+    if image.width > box[0] or image.height > box[1]:
+        image = shrink(image, fitted_size(image.size, box))
+    return image.convert("RGB") if image.mode != "RGB" else image
+
+
+def load_fitted(path, box, bg_color):
+    # (panel-sized image, preview) for the file at path
+    preview = open_reduced(path, (box[0] * PREVIEW_SCALE, box[1] * PREVIEW_SCALE))
+    return fit(preview, box, bg_color), preview
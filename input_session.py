@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+# Record and replay counter input sessions.
+#
+# A session file is an 8 byte magic, the wall clock start time as a double,
+# then one 12 byte record per event: microseconds since start (u64), kind
+# (u8), code (u16) and value (u8). Kinds are evdev key events (code/keystate),
+# raw terminal characters read by keyboard_listener (ord(char)) and beam pin
+# levels sampled every millisecond (BCM pin/level).
+#
+# Record on the Pi while the gym uses the counter:
+#   sudo python3 input_session.py record --counter hit_counter_v2 -o monday.rec
+# Replay on any machine against the headless matrix, at the original speed or
+# as fast as the counter can sample:
+#   python3 input_session.py replay monday.rec --counter hit_counter_v2 --fast
+import argparse
+import asyncio
+import bisect
+import contextlib
+import hashlib
+import importlib
+import io
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import types
+
+MAGIC = b"GYMINP01"
+HEADER = struct.Struct("<8sd")
+RECORD = struct.Struct("<QBHB")
+
+KIND_KEY = 1
+KIND_CHAR = 2
+KIND_PIN = 3
+
+EV_KEY = 1
+
+# Linux input key codes for the keys the counters look at, used when replaying
+# without python-evdev installed.
+KEY_NAMES = {
+    2: 'KEY_1', 3: 'KEY_2', 4: 'KEY_3', 5: 'KEY_4', 6: 'KEY_5', 7: 'KEY_6',
+    8: 'KEY_7', 9: 'KEY_8', 10: 'KEY_9', 11: 'KEY_0', 12: 'KEY_MINUS',
+    13: 'KEY_EQUAL', 14: 'KEY_BACKSPACE', 28: 'KEY_ENTER', 52: 'KEY_DOT',
+    53: 'KEY_SLASH', 55: 'KEY_KPASTERISK', 69: 'KEY_NUMLOCK', 71: 'KEY_KP7',
+    72: 'KEY_KP8', 73: 'KEY_KP9', 74: 'KEY_KPMINUS', 75: 'KEY_KP4',
+    76: 'KEY_KP5', 77: 'KEY_KP6', 78: 'KEY_KPPLUS', 79: 'KEY_KP1',
+    80: 'KEY_KP2', 81: 'KEY_KP3', 82: 'KEY_KP0', 83: 'KEY_KPDOT',
+    96: 'KEY_KPENTER', 98: 'KEY_KPSLASH',
+}
+
+COUNTERS = ["hit_counter", "hit_counter_v1", "hit_counter_v2", "hit_counter_async"]
+
+# BreakBeamCounter sensor attributes and the BCM pins they are wired to
+BEAM_SENSORS = [("break_beam1", 26), ("break_beam2", 16), ("break_beam3", 5), ("break_beam4", 6)]
+
+
+class InputRecorder(object):
+    def __init__(self, path):
+        self._file = open(path, "wb")
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._file.write(HEADER.pack(MAGIC, time.time()))
+        self.events = 0
+
+    def record(self, kind, code, value):
+        offset = int((time.monotonic() - self._start) * 1000000)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(RECORD.pack(offset, kind, code, value))
+            self.events += 1
+
+    def key(self, code, value):
+        self.record(KIND_KEY, code, value)
+
+    def char(self, ch):
+        self.record(KIND_CHAR, ord(ch) & 0xFFFF, 0)
+
+    def pin(self, pin, level):
+        self.record(KIND_PIN, pin, 1 if level else 0)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_session(path):
+    with open(path, "rb") as f:
+        magic, start_time = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"Not an input session file: {path}")
+        data = f.read()
+    events = [(offset / 1000000.0, kind, code, value)
+              for offset, kind, code, value in RECORD.iter_unpack(data[:len(data) - len(data) % RECORD.size])]
+    return start_time, events
+
+
+###########################################################################
+
+############################## RECORDING ##################################
+
+###########################################################################
+
+class PinSampler(threading.Thread):
+    # Samples the beam pins on its own schedule, independent of when (or
+    # whether) the counter reads them, and logs every level change. 1 ms keeps
+    # real pulse widths well below the counters' 10 ms polling.
+    def __init__(self, readers, recorder, interval=0.001):
+        super(PinSampler, self).__init__()
+        self.daemon = True
+        self._readers = readers
+        self._recorder = recorder
+        self._interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        levels = {}
+        while not self._stop_event.is_set():
+            for pin, read in self._readers.items():
+                try:
+                    level = bool(read())
+                except Exception:
+                    continue
+                if levels.get(pin) != level:
+                    levels[pin] = level
+                    self._recorder.pin(pin, level)
+            self._stop_event.wait(self._interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class RecordingInputDevice(object):
+    def __init__(self, device, recorder):
+        self._device = device
+        self._recorder = recorder
+
+    def read_loop(self):
+        for event in self._device.read_loop():
+            if event.type == EV_KEY:
+                self._recorder.key(event.code, event.value)
+            yield event
+
+    async def async_read_loop(self):
+        async for event in self._device.async_read_loop():
+            if event.type == EV_KEY:
+                self._recorder.key(event.code, event.value)
+            yield event
+
+    def __getattr__(self, name):
+        return getattr(self._device, name)
+
+
+def counter_modules(counter):
+    # The counter's module and the modules its base classes come from, e.g.
+    # hit_counter_async inherits open_keyboard() from hit_counter_v2
+    modules = []
+    for klass in type(counter).__mro__:
+        module = sys.modules.get(klass.__module__)
+        if module is not None and module not in modules:
+            modules.append(module)
+    return modules
+
+
+def attach_recorder(counter, recorder):
+    readers = {}
+    modules = counter_modules(counter)
+    gpio = next((m.GPIO for m in modules if getattr(m, "GPIO", None) is not None), None)
+    if gpio is not None and hasattr(counter, "beam_pins"):
+        for pin in counter.beam_pins:
+            readers[pin] = lambda pin=pin: gpio.input(pin)
+    for attr, pin in BEAM_SENSORS:
+        sensor = getattr(counter, attr, None)
+        if sensor is not None:
+            readers[pin] = lambda sensor=sensor: sensor.value
+    for module in modules:
+        input_device = getattr(module, "InputDevice", None)
+        if input_device is not None:
+            module.InputDevice = lambda path, input_device=input_device: RecordingInputDevice(input_device(path), recorder)
+    if hasattr(counter, "handle_key"):
+        handle_key = counter.handle_key
+
+        def recording_handle_key(key):
+            recorder.char(key)
+            return handle_key(key)
+
+        counter.handle_key = recording_handle_key
+
+    sampler = PinSampler(readers, recorder)
+    sampler.start()
+    return sampler
+
+
+###########################################################################
+
+############################### REPLAYING #################################
+
+###########################################################################
+
+class InputEvent(object):
+    def __init__(self, type, code, value):
+        now = time.time()
+        self.sec = int(now)
+        self.usec = int((now - self.sec) * 1000000)
+        self.type = type
+        self.code = code
+        self.value = value
+
+
+class KeyEvent(object):
+    key_up = 0
+    key_down = 1
+    key_hold = 2
+
+    def __init__(self, event):
+        self.event = event
+        self.scancode = event.code
+        self.keycode = KEY_NAMES.get(event.code, f"KEY_{event.code}")
+        self.keystate = event.value
+
+
+class ReplayInputDevice(object):
+    def __init__(self):
+        self._events = queue.Queue()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._async_events = None
+
+    def push(self, code, value):
+        self._put(InputEvent(EV_KEY, code, value))
+
+    def close(self):
+        self._put(None)
+
+    def _put(self, event):
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._async_events.put_nowait, event)
+            else:
+                self._events.put(event)
+
+    def read_loop(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            yield event
+
+    async def async_read_loop(self):
+        # Events are handed straight to the loop, so a cancelled reader never
+        # leaves an executor thread blocked on the queue
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._async_events = asyncio.Queue()
+            while not self._events.empty():
+                self._async_events.put_nowait(self._events.get_nowait())
+        try:
+            while True:
+                event = await self._async_events.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            with self._lock:
+                self._loop = None
+
+
+def install_fake_evdev(device):
+    evdev = types.ModuleType("evdev")
+    evdev.InputDevice = lambda path: device
+    evdev.categorize = lambda event: KeyEvent(event) if event.type == EV_KEY else event
+    evdev.ecodes = types.SimpleNamespace(EV_KEY=EV_KEY, KEY=dict(KEY_NAMES))
+    sys.modules["evdev"] = evdev
+    return evdev
+
+
+class ReplayTime(object):
+    # Stands in for the counter module's `time` so debounce checks see the
+    # session's own clock rather than how fast it is being replayed.
+    def __init__(self, replayer):
+        self._replayer = replayer
+
+    def time(self):
+        return self._replayer.session_time()
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class InputReplayer(object):
+    def __init__(self, start_time, events, speed=1.0, fast_gap=0.02):
+        self.start_time = start_time
+        self.events = events
+        # Real seconds after replay start at which each event is injected.
+        # speed 0 means as fast as possible: idle gaps shrink to fast_gap,
+        # which keeps pulses longer than the counters' 10 ms polling.
+        self._due = []
+        due = 0.0
+        previous = 0.0
+        for t, _, _, _ in events:
+            if speed > 0:
+                due = t / speed
+            elif t > previous:
+                due += fast_gap
+            previous = t
+            self._due.append(due)
+        self._index = -1
+        self._injected_at = None
+        self._replay_start = None
+        self.injected = []
+
+    def session_time(self):
+        i = self._index
+        if i < 0:
+            return self.start_time
+        t = self.events[i][0]
+        if i + 1 < len(self.events):
+            real_gap = self._due[i + 1] - self._due[i]
+            session_gap = self.events[i + 1][0] - t
+            if real_gap > 0:
+                t += session_gap * min(1.0, (time.perf_counter() - self._injected_at) / real_gap)
+        return self.start_time + t
+
+    def run(self, handlers):
+        self._replay_start = time.perf_counter()
+        for i, (t, kind, code, value) in enumerate(self.events):
+            delay = self._replay_start + self._due[i] - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self._injected_at = time.perf_counter()
+            self._index = i
+            handler = handlers.get(kind)
+            if handler is not None:
+                handler(code, value)
+            self.injected.append(self._injected_at)
+
+
+def latency_summary(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {"n": 0}
+    pct = lambda p: ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))] * 1000.0
+    return {"n": len(ordered), "p50_ms": pct(50), "p90_ms": pct(90), "p99_ms": pct(99), "max_ms": ordered[-1] * 1000.0}
+
+
+def wait_until_ready(first_frame, pins, timeout=10.0):
+    # Ready once init() has drawn its first frame and the counter has started
+    # watching the beams, by reading them or by registering edge callbacks
+    deadline = time.monotonic() + timeout
+    first_frame.wait(timeout)
+    reads = pins.reads
+    while time.monotonic() < deadline:
+        if pins.reads > reads or pins.watched_pins():
+            return True
+        time.sleep(0.001)
+    return False
+
+
+def replay(path, counter_name, speed=1.0, fast_gap=0.02, settle=0.5):
+    from matrix_backend import HEADLESS_ENV
+    os.environ[HEADLESS_ENV] = "1"
+    import fake_gpio
+    pins = fake_gpio.install()
+    device = ReplayInputDevice()
+    install_fake_evdev(device)
+
+    start_time, events = read_session(path)
+    replayer = InputReplayer(start_time, events, speed, fast_gap)
+
+    module = importlib.import_module(counter_name)
+    cls = getattr(module, "BreakBeamCounter", None) or module.DirectTestCounter
+    swaps = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        counter = cls(logo_path="")
+        for owner in counter_modules(counter):
+            if getattr(owner, "time", None) is not None:
+                owner.time = ReplayTime(replayer)
+        swap = counter.matrix.SwapOnVSync
+        first_frame = threading.Event()
+
+        def timed_swap(*args, **kwargs):
+            result = swap(*args, **kwargs)
+            swaps.append(time.perf_counter())
+            first_frame.set()
+            return result
+
+        counter.matrix.SwapOnVSync = timed_swap
+        handlers = {
+            KIND_PIN: lambda code, value: pins.set_level(code, value),
+            KIND_KEY: device.push,
+        }
+        if hasattr(counter, "handle_key"):
+            handlers[KIND_CHAR] = lambda code, value: counter.handle_key(chr(code))
+
+        counter_thread = threading.Thread(target=counter.run)
+        counter_thread.daemon = True
+        counter_thread.start()
+        wait_until_ready(first_frame, pins)
+
+        cpu_before = time.process_time()
+        replay_start = time.perf_counter()
+        replayer.run(handlers)
+        time.sleep(settle)
+        elapsed = time.perf_counter() - replay_start
+        cpu = time.process_time() - cpu_before
+
+        frame = hashlib.sha1(bytes(counter.matrix.pixels)).hexdigest()
+        if hasattr(counter, "stop"):
+            counter.stop()
+        else:
+            counter.running = False
+        device.close()
+        counter_thread.join(timeout=2.0)
+
+    # Input-to-display latency for events that were followed by a new frame
+    # before the next event came in
+    latencies = []
+    for i, injected in enumerate(replayer.injected):
+        j = bisect.bisect_left(swaps, injected)
+        limit = replayer.injected[i + 1] if i + 1 < len(replayer.injected) else float("inf")
+        if j < len(swaps) and swaps[j] < limit:
+            latencies.append(swaps[j] - injected)
+
+    result = {
+        "session": path,
+        "counter": counter_name,
+        "speed": speed,
+        "events": len(events),
+        "session_seconds": events[-1][0] if events else 0.0,
+        "replay_seconds": elapsed,
+        "events_per_second": len(events) / elapsed if elapsed else 0.0,
+        "frames": len(swaps),
+        "cpu_percent": 100.0 * cpu / elapsed if elapsed else 0.0,
+        "count": counter.count,
+        "final_frame_sha1": frame,
+        "latency": latency_summary(latencies),
+    }
+    if hasattr(counter, "total_strength_value"):
+        result["total_strength_value"] = counter.total_strength_value
+    return result
+
+
+def record(path, counter_name):
+    module = importlib.import_module(counter_name)
+    recorder = InputRecorder(path)
+    cls = getattr(module, "BreakBeamCounter", None) or module.DirectTestCounter
+    counter = cls()
+    sampler = attach_recorder(counter, recorder)
+    print(f"Recording input to {path}")
+    try:
+        counter.run()
+    finally:
+        sampler.stop()
+        sampler.join(timeout=1.0)
+        recorder.close()
+        print(f"Recorded {recorder.events} events")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay hit counter input sessions")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Run a counter on the hardware and log its input")
+    rec.add_argument("--counter", default="hit_counter_v2", choices=COUNTERS)
+    rec.add_argument("-o", "--output", required=True)
+
+    rep = sub.add_parser("replay", help="Feed a session into a counter on the headless matrix")
+    rep.add_argument("session")
+    rep.add_argument("--counter", default="hit_counter_v2", choices=COUNTERS)
+    rep.add_argument("--speed", default=1.0, type=float, help="Replay speed factor (1 = original timing)")
+    rep.add_argument("--fast", action="store_true", help="Replay as fast as the counter can sample")
+    rep.add_argument("--fast-gap", default=0.02, type=float, help="Seconds between events with --fast")
+
+    dump = sub.add_parser("dump", help="Print the events of a session")
+    dump.add_argument("session")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.output, args.counter)
+    elif args.command == "replay":
+        result = replay(args.session, args.counter, 0 if args.fast else args.speed, args.fast_gap)
+        print(json.dumps(result, indent=2))
+    else:
+        start_time, events = read_session(args.session)
+        names = {KIND_KEY: "key", KIND_CHAR: "char", KIND_PIN: "pin"}
+        print(f"# started {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}, {len(events)} events")
+        for t, kind, code, value in events:
+            print(f"{t:12.6f} {names.get(kind, kind):5} {code:5} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Key-down events for the counters without polling. Events come from the
+# keyboard library's hook (or straight from an evdev device when that library
+# is unavailable) and are handed to the consumer through a queue, so the
+# consumer thread sleeps in get() until a key actually goes down.
+import queue
+import threading
+
+# evdev key codes -> the names the keyboard library reports
+EVDEV_KEY_NAMES = {
+    'KEY_MINUS': '-', 'KEY_KPMINUS': '-',
+    'KEY_EQUAL': '+', 'KEY_KPPLUS': '+',
+    'KEY_SLASH': '/', 'KEY_KPSLASH': '/',
+    'KEY_KPASTERISK': '*', 'KEY_DOT': '.', 'KEY_KPDOT': '.',
+    'KEY_ENTER': 'enter', 'KEY_KPENTER': 'enter',
+    'KEY_BACKSPACE': 'backspace', 'KEY_NUMLOCK': 'num lock',
+}
+for _n in range(10):
+    EVDEV_KEY_NAMES[f'KEY_{_n}'] = str(_n)
+    EVDEV_KEY_NAMES[f'KEY_KP{_n}'] = str(_n)
+
+
+class KeyboardEvents(object):
+    def __init__(self, device_path=None):
+        self.device_path = device_path
+        self._events = queue.Queue()
+        self._held = set()
+        self._hook = None
+        self._keyboard = None
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        self._running = True
+        try:
+            import keyboard
+            self._keyboard = keyboard
+            self._hook = keyboard.hook(self._on_keyboard_event)
+            return True
+        except Exception as e:
+            print(f"keyboard hook unavailable ({e}), trying evdev")
+
+        if self.device_path:
+            try:
+                from evdev import InputDevice
+                device = InputDevice(self.device_path)
+            except Exception as e:
+                print(f"Failed to open device at {self.device_path}: {e}")
+                return False
+            self._thread = threading.Thread(target=self._read_evdev, args=(device,))
+            self._thread.daemon = True
+            self._thread.start()
+            return True
+        return False
+
+    def stop(self):
+        self._running = False
+        if self._hook is not None:
+            self._keyboard.unhook(self._hook)
+            self._hook = None
+        self._events.put(None)
+
+    def get(self, timeout=None):
+        # Blocks until the next key goes down; None once stopped
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _key_down(self, name):
+        # Held keys auto-repeat; only the first down of each press counts,
+        # like the old wait-for-release loop
+        if name in self._held:
+            return
+        self._held.add(name)
+        self._events.put(name)
+
+    def _key_up(self, name):
+        self._held.discard(name)
+
+    def _on_keyboard_event(self, event):
+        # Runs on the keyboard library's listener thread
+        if event.event_type == 'down':
+            self._key_down(event.name)
+        else:
+            self._key_up(event.name)
+
+    def _read_evdev(self, device):
+        for event in device.read_loop():
+            if not self._running:
+                break
+            if event.type != 1:  # EV_KEY
+                continue
+            name = device_keycode_name(event.code)
+            if event.value == 1:
+                self._key_down(name)
+            elif event.value == 0:
+                self._key_up(name)
+
+
+def device_keycode_name(code):
+    from evdev import ecodes
+    keycode = ecodes.KEY.get(code, str(code))
+    if isinstance(keycode, list):
+        keycode = keycode[0]
+    return EVDEV_KEY_NAMES.get(keycode, keycode)
@@ -0,0 +1,30 @@
+# Picks the matrix bindings for the scripts in this directory: the real
+# rgbmatrix library on a Pi, or the in-memory rgbmatrix_headless backend when
+# RGBMATRIX_HEADLESS is set (or SampleBase runs with --led-headless).
+#
+#   from matrix_backend import RGBMatrix, RGBMatrixOptions
+#   RGBMATRIX_HEADLESS=1 python matrix_display.py --mode scroll-h
+import importlib
+import os
+
+HEADLESS_ENV = "RGBMATRIX_HEADLESS"
+
+
+def headless_requested():
+    return os.environ.get(HEADLESS_ENV, "").lower() not in ("", "0", "false", "no")
+
+
+def load(headless=None):
+    if headless is None:
+        headless = headless_requested()
+    name = "rgbmatrix_headless" if headless else "rgbmatrix"
+    backend = importlib.import_module(name)
+    # rgbmatrix does not import its graphics extension by itself
+    importlib.import_module(name + ".graphics")
+    return backend
+
+
+def __getattr__(name):
+    if name in ("RGBMatrix", "FrameCanvas", "RGBMatrixOptions", "graphics"):
+        return getattr(load(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,12 +7,71 @@ import textwrap
 import random
 import threading
 import sys
+from frame_gate import FrameGate, image_key
+from idle_power import IdlePower, DEFAULT_IDLE_AFTER, DISPLAY_POLL, FRAMEBUFFER_POLL
+from shm_framebuffer import SharedFramebuffer, DEFAULT_NAME as DEFAULT_SHM_NAME
+from frame_stream import FrameStream, FRAMINGS
+from frame_sync import FrameReceiver, DEFAULT_LISTEN as DEFAULT_SYNC_LISTEN
+from control_server import ControlServer, CONTROL_ENV
+from playlist import Playlist, PlaylistItem, load_playlist, prepare, DEFAULT_DURATION, DRAW_AHEAD
+from hot_folder import HotFolder, POLL_INTERVAL as WATCH_INTERVAL
+from image_fit import fit, load_fitted
+from color_grade import ColorGrade
+from transition import Transition, TRANSITIONS, DEFAULT_DURATION as TRANSITION_TIME
+from text_renderer import TEXT_RENDERERS, DEFAULT_BDF_FONT, TextLayout, make_text_renderer
+
+DISPLAY_MODES = ["scroll-h", "scroll", "scroll-up", "scroll-down", "random", "static", "shm", "stream", "sync", "playlist"]
+
+
+def _color(value):
+    if isinstance(value, str):
+        value = value.split(",")
+    color = tuple(int(c) for c in value)
+    if len(color) != 3 or not all(0 <= c <= 255 for c in color):
+        raise ValueError(value)
+    return color
+
+
+def _optional_str(value):
+    return None if value is None else str(value)
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+# update() settings: attribute, conversion
+SETTINGS = {
+    "text": ("_display_text", str),
+    "mode": ("_display_mode", lambda mode: str(mode).lower()),
+    "color": ("_text_color", _color),
+    "bg_color": ("_bg_color", _color),
+    "font_size": ("_font_size", int),
+    "speed": ("_scroll_speed", float),
+    "wrap": ("_wrap_length", int),
+    "font": ("_font_path", _optional_str),
+    "random_interval": ("_random_interval", float),
+    "text_renderer": ("_text_renderer", str),
+    "image": ("_current_image", str),
+    "brightness": ("_brightness", float),
+    "gamma": ("_gamma", float),
+    "tint": ("_tint", _color),
+    "night": ("_night", _flag),
+    "transition": ("_transition", lambda kind: str(kind).lower()),
+    "transition_time": ("_transition_time", float),
+}
+# Settings that change the rendered picture
+RENDER_SETTINGS = {"text", "color", "bg_color", "font_size", "wrap", "font", "text_renderer", "image"}
+# Settings that only change the color grade applied to it
+GRADE_SETTINGS = {"brightness", "gamma", "tint", "night"}
 
 class MatrixDisplay(SampleBase):
     def __init__(self, *args, **kwargs):
         super(MatrixDisplay, self).__init__(*args, **kwargs)
         self.parser.add_argument("-t", "--text", help="The text to display on the RGB LED panel", default="Hello world!")
-        self.parser.add_argument("--mode", help="Display mode: 'scroll-h', 'scroll-up', 'scroll-down', 'random' or 'static'", default="static")
+        self.parser.add_argument("--mode", help="Display mode: 'scroll-h', 'scroll-up', 'scroll-down', 'random', 'static', 'shm' (frames from other processes), 'stream' (raw frames from stdin or a FIFO), 'sync' (frames from a coordinator, see --sync-listen) or 'playlist' (see --playlist)", default="static")
         self.parser.add_argument("--random-interval", help="Seconds between direction changes in random mode", default=5.0, type=float)
         self.parser.add_argument("--font-size", help="Font size to use", default=12, type=int)
         self.parser.add_argument("--color", help="Text color in R,G,B format (0-255)", default="255,255,0")
@@ -21,6 +80,25 @@ class MatrixDisplay(SampleBase):
         self.parser.add_argument("--wrap", help="Number of characters per line (0 for auto)", default=0, type=int)
         self.parser.add_argument("--font", help="TrueType font file path", default=None)
         self.parser.add_argument("--image", help="Path to image file to display", default=None)
+        self.parser.add_argument("--brightness", help="Scales every frame in software, 0.0-1.0 (see also --led-brightness)", default=1.0, type=float)
+        self.parser.add_argument("--gamma", help="Gamma applied to every frame (1.0 leaves it alone, 2.2 darkens midtones)", default=1.0, type=float)
+        self.parser.add_argument("--tint", help="Color every frame is multiplied with in R,G,B format (255,255,255 leaves it alone)", default="255,255,255")
+        self.parser.add_argument("--night", help="Night mode: dimmed, warmer frames", action="store_true")
+        self.parser.add_argument("--transition", help="How the static mode goes from one frame to the next", choices=["none"] + TRANSITIONS, default="none")
+        self.parser.add_argument("--transition-time", help="Seconds a transition takes", default=TRANSITION_TIME, type=float)
+        self.parser.add_argument("--text-renderer", help="Text rendering: 'pil' (TrueType via Pillow) or 'bdf' (native BDF fonts)", choices=TEXT_RENDERERS, default="pil")
+        self.parser.add_argument("--bdf-font", help="BDF font(s) from fonts/ for the bdf renderer, largest first, comma separated", default=DEFAULT_BDF_FONT)
+        self.parser.add_argument("--shm-name", help="Shared framebuffer (in /dev/shm) for the shm mode", default=DEFAULT_SHM_NAME)
+        self.parser.add_argument("--stream", help="Where the stream mode reads frames: a FIFO or file path, or '-' for stdin", default="-")
+        self.parser.add_argument("--stream-fps", help="Frames per second for the stream mode (0 shows frames as they arrive)", default=0.0, type=float)
+        self.parser.add_argument("--stream-framing", help="'raw': back-to-back RGB24 frames of panel size; 'length': each frame preceded by a little-endian uint32 length", choices=FRAMINGS, default="raw")
+        self.parser.add_argument("--sync-listen", help="Where the sync mode takes frames from a coordinator: udp://host:port or tcp://host:port", default=DEFAULT_SYNC_LISTEN)
+        self.parser.add_argument("--playlist", help="JSON playlist of text, images, animations and clocks for the playlist mode", default=None)
+        self.parser.add_argument("--watch", help="Directory of images and GIFs to add to the playlist rotation; files are picked up as they arrive", default=None)
+        self.parser.add_argument("--watch-duration", help="Seconds each file from --watch stays up", default=DEFAULT_DURATION, type=float)
+        self.parser.add_argument("--watch-interval", help="Seconds between rescans of --watch where inotify isn't available", default=WATCH_INTERVAL, type=float)
+        self.parser.add_argument("--control", help="Accept JSON settings changes on this Unix socket path or tcp://127.0.0.1:PORT (default: $%s)" % CONTROL_ENV, default=os.environ.get(CONTROL_ENV, ""))
+        self.parser.add_argument("--idle-after", help="Seconds without a frame change before polling slows down (0 to disable)", default=DEFAULT_IDLE_AFTER, type=float)
         
         self._running = False
         self._thread = None
@@ -38,13 +116,43 @@ class MatrixDisplay(SampleBase):
         self._random_interval = 5.0
         self._image_path = None
         self._current_image = None
+        self._fitted = None  # (preview, bg_color, panel-sized image)
         self._display_type = "text"  # "text" or "image"
+        self._text_renderer = None  # None renders text with Pillow
+        self._frames = None
+        self._idle = None
+        self._idle_after = DEFAULT_IDLE_AFTER
+        self._shm_name = DEFAULT_SHM_NAME
+        self._framebuffer = None
+        self._stream_source = "-"
+        self._stream_fps = 0.0
+        self._stream_framing = "raw"
+        self._stream = None
+        self._sync_listen = DEFAULT_SYNC_LISTEN
+        self._receiver = None
+        self._brightness = 1.0
+        self._gamma = 1.0
+        self._tint = (255, 255, 255)
+        self._night = False
+        self._grade = ColorGrade()
+        self._grade_cache = None
+        self._transition = "none"
+        self._transition_time = TRANSITION_TIME
+        self._transition_player = None
+        self._static_frame = None
+        self._playlist = None
+        self._playlist_items = []
+        self._hot_folder = None
+        self._watch_duration = DEFAULT_DURATION
+        self._render_version = 0
+        self._rendered_version = 0
+        self._content_version = 0
+        self._rendered_content = 0
+        self._control = None
     
     def process_args(self):
-        result = super(MatrixDisplay, self).process()
-        if not result:
-            return False
-            
+        # Applies the command line process() parsed. process() calls run(),
+        # which calls this, so it must not go back into process().
         self._display_text = self.args.text
         self._display_mode = self.args.mode.lower()
         self._font_size = self.args.font_size
@@ -53,11 +161,33 @@ class MatrixDisplay(SampleBase):
         self._font_path = self.args.font
         self._random_interval = self.args.random_interval
         self._image_path = self.args.image
+        self._idle_after = self.args.idle_after
+        self._shm_name = self.args.shm_name
+        self._stream_source = self.args.stream
+        self._stream_fps = self.args.stream_fps
+        self._stream_framing = self.args.stream_framing
+        self._sync_listen = self.args.sync_listen
+        self._transition = self.args.transition
+        self._transition_time = self.args.transition_time
+        try:
+            self._text_renderer = make_text_renderer(self.args.text_renderer, self.args.bdf_font)
+        except Exception as e:
+            print(f"Error loading BDF font: {e}")
+            self._text_renderer = None
         
         if self._image_path and os.path.exists(self._image_path):
             self._display_type = "image"
             self.load_image(self._image_path)
         
+        if self.args.playlist:
+            try:
+                self.set_playlist(load_playlist(self.args.playlist))
+            except (OSError, ValueError) as e:
+                print(f"Error loading playlist: {e}")
+        
+        if self.args.watch:
+            self.watch_folder(self.args.watch, self.args.watch_duration, self.args.watch_interval)
+        
         try:
             r, g, b = map(int, self.args.color.split(','))
             self._text_color = (r, g, b)
@@ -69,73 +199,207 @@ class MatrixDisplay(SampleBase):
             self._bg_color = (r, g, b)
         except:
             self._bg_color = (0, 0, 0)
+        
+        # Only flags that change the grade go through update(), so the
+        # defaults don't cost a render version
+        grade = {}
+        for name in GRADE_SETTINGS:
+            attr, convert = SETTINGS[name]
+            value = getattr(self.args, name)
+            try:
+                if convert(value) == getattr(self, attr):
+                    continue
+            except (TypeError, ValueError):
+                pass  # update() reports it
+            grade[name] = value
+        if grade:
+            try:
+                self.update(**grade)
+            except ValueError as e:
+                print(e)
+        
+        if self.args.control:
+            self.start_control(self.args.control)
             
         return True
     
-    def set_text(self, text):
+    def update(self, **changes):
+        # Several settings as one atomic change, e.g. update(text="Go!",
+        # color=(255, 0, 0)): the display thread sees all of them or none and
+        # re-renders once. Images and fonts are loaded before the lock is
+        # taken, so the display thread never waits on the disk. Raises
+        # ValueError for unknown settings and bad values.
+        unknown = set(changes) - set(SETTINGS) - {"bdf_font"}
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        if "text" in changes and "image" in changes:
+            raise ValueError("Set either text or image, not both")
+        values = {}
+        for name, value in changes.items():
+            if name in SETTINGS:
+                try:
+                    values[name] = SETTINGS[name][1](value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Bad value for {name}: {value!r}")
+        if "mode" in values and values["mode"] not in DISPLAY_MODES:
+            raise ValueError(f"Unknown mode: {values['mode']}")
+        if "transition" in values and values["transition"] not in ["none"] + TRANSITIONS:
+            raise ValueError(f"Unknown transition: {values['transition']}")
+        if values.get("transition_time", 0) < 0:
+            raise ValueError("Transition time can't be negative")
+        if "text_renderer" in values:
+            try:
+                values["text_renderer"] = make_text_renderer(values["text_renderer"], changes.get("bdf_font", DEFAULT_BDF_FONT))
+            except Exception as e:
+                raise ValueError(f"Error loading BDF font: {e}")
+        grade = None
+        if GRADE_SETTINGS.intersection(values):
+            options = {name: values[name] if name in values else getattr(self, SETTINGS[name][0]) for name in GRADE_SETTINGS}
+            try:
+                grade = ColorGrade(**options)
+            except ValueError as e:
+                raise ValueError(f"Bad color grade: {e}")
+        if "image" in values:
+            image_path = values["image"]
+            if not os.path.exists(image_path):
+                raise ValueError(f"Image file not found: {image_path}")
+            try:
+                # The panel-sized frame and a preview a little larger than the
+                # panel are kept; the full-size decode never reaches the
+                # display thread
+                bg_color = values.get("bg_color", self._bg_color)
+                fitted, values["image"] = load_fitted(image_path, (self.matrix.width, self.matrix.height), bg_color)
+            except Exception as e:
+                raise ValueError(f"Error loading image: {e}")
+        
+        with self._update_lock:
+            for name, value in values.items():
+                setattr(self, SETTINGS[name][0], value)
+            if "text" in values:
+                self._display_type = "text"
+            if "image" in values:
+                self._display_type = "image"
+                self._image_path = image_path
+                self._fitted = (values["image"], bg_color, fitted)
+            if RENDER_SETTINGS.intersection(values):
+                self._content_version += 1
+                self._render_version += 1
+            if grade is not None:
+                # The picture changes, but only the grade has to be redone
+                self._grade = grade
+                self._render_version += 1
+        if "mode" in values and self._idle is not None:
+            self._idle.activity()
+    
+    def settings(self):
         with self._update_lock:
-            self._display_text = text
-            self._display_type = "text"
+            current = {name: getattr(self, attr) for name, (attr, convert) in SETTINGS.items()
+                       if name not in ("image", "text_renderer")}
+            current["image"] = self._image_path if self._display_type == "image" else None
+            current["text_renderer"] = "pil" if self._text_renderer is None else "bdf"
+        return current
+    
+    def set_text(self, text):
+        self.update(text=text)
     
     def set_mode(self, mode):
-        if mode in ["scroll-h", "scroll", "scroll-up", "scroll-down", "random", "static"]:
-            with self._update_lock:
-                self._display_mode = mode
+        if mode in DISPLAY_MODES:
+            self.update(mode=mode)
     
     def set_color(self, color):
-        with self._update_lock:
-            self._text_color = color
+        self.update(color=color)
     
     def set_bg_color(self, color):
-        with self._update_lock:
-            self._bg_color = color
+        self.update(bg_color=color)
     
     def set_font_size(self, size):
-        with self._update_lock:
-            self._font_size = size
+        self.update(font_size=size)
     
     def set_speed(self, speed):
-        with self._update_lock:
-            self._scroll_speed = speed
+        self.update(speed=speed)
     
     def set_wrap_length(self, length):
-        with self._update_lock:
-            self._wrap_length = length
+        self.update(wrap=length)
     
     def set_font(self, font_path):
-        with self._update_lock:
-            self._font_path = font_path
+        self.update(font=font_path)
+    
+    def set_text_renderer(self, kind, bdf_font=DEFAULT_BDF_FONT):
+        self.update(text_renderer=kind, bdf_font=bdf_font)
     
     def set_random_interval(self, interval):
+        self.update(random_interval=interval)
+    
+    def set_playlist(self, items, loop=True):
+        # PlaylistItems for the playlist mode; a running playlist restarts
+        # with the new one. Files from watch_folder() follow these items.
+        self._playlist_items = list(items)
+        items = self._playlist_items + (self._hot_folder.items() if self._hot_folder is not None else [])
+        playlist = Playlist(items, loop)
         with self._update_lock:
-            self._random_interval = interval
+            self._playlist = playlist
     
-    def load_image(self, image_path):
-        if not os.path.exists(image_path):
-            print(f"Image file not found: {image_path}")
+    def watch_folder(self, directory, duration=DEFAULT_DURATION, interval=WATCH_INTERVAL):
+        # Images and GIFs in directory join the playlist as they arrive, each
+        # up for duration seconds
+        if self._hot_folder is not None:
+            self._hot_folder.stop()
+        self._watch_duration = duration
+        try:
+            self._hot_folder = HotFolder(directory, self._folder_item, self._folder_changed, interval)
+        except ValueError as e:
+            print(f"Error watching folder: {e}")
+            self._hot_folder = None
             return False
-            
+        self._hot_folder.start()
+        print(f"Watching {directory} ({self._hot_folder.watching})")
+        return True
+    
+    def _folder_item(self, path):
+        # Runs on the hot folder's worker: decoded and scaled once, then the
+        # playlist shows the cached frames
+        kind = "animation" if path.lower().endswith(".gif") else "image"
+        item = PlaylistItem(kind, path, self._watch_duration)
+        item.prepared = prepare(self, item)
+        return item
+    
+    def _folder_changed(self):
+        items = self._playlist_items + self._hot_folder.items()
+        with self._update_lock:
+            playlist = self._playlist
+            if playlist is not None and items:
+                # Keeps its place in the rotation
+                playlist.set_items(items)
+            else:
+                self._playlist = Playlist(items) if items else None
+    
+    def load_image(self, image_path):
         try:
-            with self._update_lock:
-                img = Image.open(image_path).convert('RGB')
-                self._current_image = img
-                self._display_type = "image"
-                self._image_path = image_path
+            self.update(image=image_path)
             return True
-        except Exception as e:
-            print(f"Error loading image: {e}")
+        except ValueError as e:
+            print(e)
             return False
     
     def create_text_image(self):
+        return self.text_image(self._display_text, self._text_color, self._bg_color, self._font_size,
+                               self._font_path, self._wrap_length)
+    
+    def text_image(self, text, color, bg_color, font_size, font_path=None, wrap_length=0):
+        # Panel-sized text; safe to call off the display thread
         width, height = self.matrix.width, self.matrix.height
         
-        image = Image.new('RGB', (width, height), self._bg_color)
+        if self._text_renderer is not None:
+            # A layout drawn straight into the canvas instead of an image
+            return self._text_renderer.layout(text, width, height, color, wrap_chars=wrap_length)
+        
+        image = Image.new('RGB', (width, height), bg_color)
         draw = ImageDraw.Draw(image)
         
         font = None
         try:
-            if self._font_path:
-                font = ImageFont.truetype(self._font_path, self._font_size)
+            if font_path:
+                font = ImageFont.truetype(font_path, font_size)
             else:
                 font_paths = [
                     '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
@@ -144,7 +408,7 @@ class MatrixDisplay(SampleBase):
                 ]
                 for path in font_paths:
                     if os.path.exists(path):
-                        font = ImageFont.truetype(path, self._font_size)
+                        font = ImageFont.truetype(path, font_size)
                         break
         except Exception as e:
             print(f"Error loading font: {e}")
@@ -152,9 +416,8 @@ class MatrixDisplay(SampleBase):
         if font is None:
             font = ImageFont.load_default()
         
-        text = self._display_text
-        if self._wrap_length > 0:
-            wrapped_text = textwrap.fill(text, self._wrap_length)
+        if wrap_length > 0:
+            wrapped_text = textwrap.fill(text, wrap_length)
         else:
             avg_char_width = draw.textlength("X", font=font)
             chars_per_line = max(1, int(width / avg_char_width))
@@ -166,27 +429,26 @@ class MatrixDisplay(SampleBase):
         
         position = ((width - text_width) // 2, (height - text_height) // 2)
         
-        draw.multiline_text(position, wrapped_text, font=font, fill=self._text_color, align="center")
+        draw.multiline_text(position, wrapped_text, font=font, fill=color, align="center")
         
         return image
     
     def get_display_image(self):
         if self._display_type == "image" and self._current_image:
-            width, height = self.matrix.width, self.matrix.height
-            img = self._current_image.copy()
-            img.thumbnail((width, height), Image.LANCZOS)
-            
-            # Center the image if smaller than matrix
-            if img.width < width or img.height < height:
-                new_img = Image.new('RGB', (width, height), self._bg_color)
-                paste_x = (width - img.width) // 2
-                paste_y = (height - img.height) // 2
-                new_img.paste(img, (paste_x, paste_y))
-                return new_img
-            return img
+            # Fitted again from the preview only for another background
+            preview, bg_color = self._current_image, self._bg_color
+            fitted = self._fitted
+            if fitted is None or fitted[0] is not preview or fitted[1] != bg_color:
+                fitted = (preview, bg_color, self.fit_image(preview, bg_color))
+                self._fitted = fitted
+            return fitted[2]
         else:
             return self.create_text_image()
     
+    def fit_image(self, image, bg_color):
+        # Scaled down to the panel and centered on bg_color
+        return fit(image, (self.matrix.width, self.matrix.height), bg_color)
+    
     def start(self):
         if self._running:
             print("Display is already running.")
@@ -197,6 +459,7 @@ class MatrixDisplay(SampleBase):
             return False
         
         if not hasattr(self, 'args'):
+            self.args = self.parser.parse_args([])
             self.process_args()
         
         self._stop_event.clear()
@@ -212,39 +475,48 @@ class MatrixDisplay(SampleBase):
             return
         
         self._stop_event.set()
+        if self._idle is not None:
+            self._idle.wake()
         if self._thread:
             self._thread.join(timeout=1.0)
         self._running = False
     
+    def start_control(self, address):
+        # Other processes can change the settings through control_server
+        if self._control is not None:
+            self._control.stop()
+        self._control = ControlServer(self, address)
+        if not self._control.start():
+            self._control = None
+            return False
+        print(f"Control server listening on {address}")
+        return True
+    
     def _display_loop(self):
-        last_text = None
-        last_color = None
         last_mode = None
-        last_image_path = None
-        last_display_type = None
+        image = None
         
+        self.placement.apply("render")
         try:
             while not self._stop_event.is_set():
                 with self._update_lock:
-                    text_changed = last_text != self._display_text
-                    color_changed = last_color != self._text_color
-                    mode_changed = last_mode != self._display_mode
-                    image_changed = last_image_path != self._image_path
-                    type_changed = last_display_type != self._display_type
-                    
                     mode = self._display_mode
-                    display_type = self._display_type
-                    
-                    if text_changed or color_changed or image_changed or type_changed:
-                        image = self.get_display_image()
-                        last_text = self._display_text
-                        last_color = self._text_color
-                        last_image_path = self._image_path
-                        last_display_type = self._display_type
-                        
+                    version = self._render_version
+                    content = self._content_version
                     speed = self._scroll_speed
                     random_interval = self._random_interval
                 
+                # A batch of settings that changes the picture is one version
+                # step, so it costs one render. Rendering happens outside the
+                # lock so setters never wait for it; a change that lands
+                # meanwhile bumps the version again and gets its own render.
+                # A change of the color grade alone bumps the version but not
+                # the content, and the loops grade the same image again.
+                if image is None or self._rendered_content != content:
+                    image = self.get_display_image()
+                    self._rendered_content = content
+                self._rendered_version = version
+                
                 if mode == "scroll-h" or mode == "scroll":
                     self._scroll_horizontal(image, speed)
                 elif mode == "scroll-up":
@@ -253,6 +525,14 @@ class MatrixDisplay(SampleBase):
                     self._scroll_vertical(image, "down", speed)
                 elif mode == "random":
                     self._scroll_random(image, speed, random_interval)
+                elif mode == "shm":
+                    self._shared_frames()
+                elif mode == "stream":
+                    self._stream_frames()
+                elif mode == "sync":
+                    self._sync_frames()
+                elif mode == "playlist":
+                    self._playlist_frames()
                 else:
                     self._static_image(image)
                 
@@ -263,11 +543,7 @@ class MatrixDisplay(SampleBase):
                 if self._stop_event.is_set():
                     break
                     
-                if (last_text != self._display_text or 
-                    last_color != self._text_color or 
-                    last_mode != self._display_mode or
-                    last_image_path != self._image_path or
-                    last_display_type != self._display_type):
+                if last_mode != self._display_mode or self._rendered_version != self._render_version:
                     continue
                     
                 # Add a small delay to prevent this loop from consuming too much CPU
@@ -279,48 +555,45 @@ class MatrixDisplay(SampleBase):
             self._running = False
     
     def _scroll_horizontal(self, image, speed):
+        self._frame_gate().forget()
         img_width, img_height = image.size
         double_buffer = self.matrix.CreateFrameCanvas()
         
         if img_width < self.matrix.width:
-            scroll_image = Image.new('RGB', (self.matrix.width * 2, img_height), self._bg_color)
-            scroll_image.paste(image, (0, 0))
-            scroll_image.paste(image, (self.matrix.width, 0))
-            img_width = scroll_image.width
-            image = scroll_image
+            image = self._tile(image, (self.matrix.width * 2, img_height), (self.matrix.width, 0))
+            img_width = image.size[0]
         
         xpos = 0
         while not self._stop_event.is_set():
             with self._update_lock:
                 if self._display_mode != "scroll-h" and self._display_mode != "scroll":
                     break
+                if self._rendered_version != self._render_version:
+                    break
                 current_speed = self._scroll_speed
             
             xpos += 1
             if xpos > img_width / 2:
                 xpos = 0
             
-            double_buffer.SetImage(image, -xpos)
-            double_buffer.SetImage(image, -xpos + img_width // 2)
+            self._blit(double_buffer, image, [(-xpos, 0), (-xpos + img_width // 2, 0)])
             
             double_buffer = self.matrix.SwapOnVSync(double_buffer)
             time.sleep(current_speed)
     
     def _scroll_vertical(self, image, direction, speed):
+        self._frame_gate().forget()
         img_width, img_height = image.size
         double_buffer = self.matrix.CreateFrameCanvas()
         
-        scroll_image = Image.new('RGB', (img_width, self.matrix.height * 2), self._bg_color)
-        scroll_image.paste(image, (0, 0))
-        scroll_image.paste(image, (0, self.matrix.height))
-        img_height = scroll_image.height
-        image = scroll_image
+        image = self._tile(image, (img_width, self.matrix.height * 2), (0, self.matrix.height))
+        img_height = image.size[1]
         
         ypos = 0
         while not self._stop_event.is_set():
             with self._update_lock:
                 mode_dir = "up" if self._display_mode == "scroll-up" else "down"
-                if mode_dir != direction:
+                if mode_dir != direction or self._rendered_version != self._render_version:
                     break
                 current_speed = self._scroll_speed
             
@@ -336,25 +609,20 @@ class MatrixDisplay(SampleBase):
             
             y_offset = -ypos if direction == "up" else ypos
             
-            double_buffer.SetImage(image, 0, y_offset)
             if direction == "up":
-                double_buffer.SetImage(image, 0, y_offset - img_height // 2)
+                self._blit(double_buffer, image, [(0, y_offset), (0, y_offset - img_height // 2)])
             else:
-                double_buffer.SetImage(image, 0, y_offset + img_height // 2)
+                self._blit(double_buffer, image, [(0, y_offset), (0, y_offset + img_height // 2)])
             
             double_buffer = self.matrix.SwapOnVSync(double_buffer)
             time.sleep(current_speed)
     
     def _scroll_random(self, image, speed, random_interval):
+            self._frame_gate().forget()
             img_width, img_height = image.size
             
-            h_scroll_image = Image.new('RGB', (self.matrix.width * 2, img_height), self._bg_color)
-            h_scroll_image.paste(image, (0, 0))
-            h_scroll_image.paste(image, (self.matrix.width, 0))
-            
-            v_scroll_image = Image.new('RGB', (img_width, self.matrix.height * 2), self._bg_color)
-            v_scroll_image.paste(image, (0, 0))
-            v_scroll_image.paste(image, (0, self.matrix.height))
+            h_scroll_image = self._tile(image, (self.matrix.width * 2, img_height), (self.matrix.width, 0))
+            v_scroll_image = self._tile(image, (img_width, self.matrix.height * 2), (0, self.matrix.height))
             
             double_buffer = self.matrix.CreateFrameCanvas()
             
@@ -368,7 +636,7 @@ class MatrixDisplay(SampleBase):
             
             while not self._stop_event.is_set():
                 with self._update_lock:
-                    if self._display_mode != "random":
+                    if self._display_mode != "random" or self._rendered_version != self._render_version:
                         break
                     current_speed = self._scroll_speed
                     current_interval = self._random_interval
@@ -384,37 +652,323 @@ class MatrixDisplay(SampleBase):
                     if xpos > h_scroll_image.width / 2:
                         xpos = 0
                     
-                    double_buffer.SetImage(h_scroll_image, -xpos)
-                    double_buffer.SetImage(h_scroll_image, -xpos + h_scroll_image.width // 2)
+                    self._blit(double_buffer, h_scroll_image,
+                               [(-xpos, 0), (-xpos + h_scroll_image.width // 2, 0)])
                 
                 elif current_method == "up":
                     ypos += 1
                     if ypos > v_scroll_image.height / 2:
                         ypos = 0
                     
-                    double_buffer.SetImage(v_scroll_image, 0, -ypos)
-                    double_buffer.SetImage(v_scroll_image, 0, -ypos + v_scroll_image.height // 2)
+                    self._blit(double_buffer, v_scroll_image,
+                               [(0, -ypos), (0, -ypos + v_scroll_image.height // 2)])
                 
                 elif current_method == "down":
                     ypos -= 1
                     if ypos < -v_scroll_image.height / 2:
                         ypos = 0
                     
-                    double_buffer.SetImage(v_scroll_image, 0, ypos)
-                    double_buffer.SetImage(v_scroll_image, 0, ypos + v_scroll_image.height // 2)
+                    self._blit(double_buffer, v_scroll_image,
+                               [(0, ypos), (0, ypos + v_scroll_image.height // 2)])
                 
                 double_buffer = self.matrix.SwapOnVSync(double_buffer)
                 time.sleep(current_speed)
     
+    def _shared_frames(self):
+        # Puts up whatever other processes publish in the shared framebuffer,
+        # newest frame first, one per vsync
+        framebuffer = self._shared_framebuffer()
+        if framebuffer is None:
+            return
+        self._frame_gate().forget()
+        idle = self._idle_power()
+        double_buffer = self.matrix.CreateFrameCanvas()
+        
+        shown = 0
+        while not self._stop_event.is_set():
+            with self._update_lock:
+                if self._display_mode != "shm":
+                    break
+            
+            seq = framebuffer.seq
+            if seq == shown:
+                idle.sleep(FRAMEBUFFER_POLL, self._stop_event)
+                continue
+            
+            double_buffer.SetImage(self._grade.image(framebuffer.image(seq)))
+            if not framebuffer.intact(seq):
+                # The producer lapped us while we copied
+                continue
+            double_buffer = self.matrix.SwapOnVSync(double_buffer)
+            idle.activity()
+            shown = seq
+    
+    def _stream_frames(self):
+        # Raw frames from stdin or a FIFO, as they arrive or at a fixed rate;
+        # frames that fell behind the producer are skipped
+        stream = self._frame_stream()
+        if stream is None:
+            self._stop_event.wait(1.0)
+            return
+        self._frame_gate().forget()
+        idle = self._idle_power()
+        double_buffer = self.matrix.CreateFrameCanvas()
+        period = 1.0 / self._stream_fps if self._stream_fps > 0 else None
+        next_frame = time.monotonic()
+        
+        while not self._stop_event.is_set():
+            with self._update_lock:
+                if self._display_mode != "stream":
+                    break
+            
+            if stream.eof:
+                # The last frame stays up
+                idle.sleep(DISPLAY_POLL, self._stop_event)
+                continue
+            
+            if period is None:
+                # Short timeout so mode changes and stop() are noticed
+                got_frame = stream.read_latest(timeout=0.1)
+            else:
+                delay = next_frame - time.monotonic()
+                if delay > 0 and self._stop_event.wait(delay):
+                    break
+                next_frame = max(next_frame + period, time.monotonic())
+                got_frame = stream.read_latest(timeout=0)
+            if not got_frame:
+                if stream.eof:
+                    print(f"Frame stream ended after {stream.received} frames")
+                continue
+            
+            double_buffer.SetImage(self._grade.image(stream.image()))
+            double_buffer = self.matrix.SwapOnVSync(double_buffer)
+            idle.activity()
+    
+    def _sync_frames(self):
+        # Frames from a sync coordinator, each swapped in on the first vsync
+        # after its presentation time
+        receiver = self._frame_receiver()
+        if receiver is None:
+            self._stop_event.wait(1.0)
+            return
+        self._frame_gate().forget()
+        idle = self._idle_power()
+        double_buffer = self.matrix.CreateFrameCanvas()
+        size = (self.matrix.width, self.matrix.height)
+        refresh_hz = getattr(self.matrix, "refresh_rate_hz", 0) or 0
+        period = 1.0 / refresh_hz if refresh_hz > 0 else 0.0
+        
+        while not self._stop_event.is_set():
+            with self._update_lock:
+                if self._display_mode != "sync":
+                    break
+            
+            pending = receiver.next_frame(timeout=0.1)
+            if pending is None:
+                continue
+            seq, pts_ns, frame = pending
+            double_buffer.SetImage(self._grade.image(Image.frombuffer("RGB", size, frame, "raw", "RGB", 0, 1)))
+            # SwapOnVSync waits for the next vsync, so start it half a
+            # refresh early to land closest to the presentation time
+            delay = (pts_ns - time.time_ns()) / 1e9 - period / 2
+            if delay > 0 and self._stop_event.wait(delay):
+                break
+            double_buffer = self.matrix.SwapOnVSync(double_buffer)
+            receiver.shown(seq, pts_ns, period)
+            idle.activity()
+    
+    def _playlist_frames(self):
+        # Each slot starts at a fixed offset from the start of the playlist.
+        # The next item is prepared in the background while the current one
+        # is up, and its first frame goes into the back buffer before the
+        # boundary so the swap itself is all that happens on it.
+        with self._update_lock:
+            playlist = self._playlist
+        if playlist is None:
+            if self._hot_folder is None:
+                print("No playlist loaded; see --playlist and --watch")
+            self._stop_event.wait(1.0)
+            return
+        self._frame_gate().forget()
+        idle = self._idle_power()
+        double_buffer = self.matrix.CreateFrameCanvas()
+        refresh_hz = getattr(self.matrix, "refresh_rate_hz", 0) or 0
+        period = 1.0 / refresh_hz if refresh_hz > 0 else 0.0
+        
+        def wait_until(deadline):
+            # Short waits so mode changes, a new playlist and stop() are noticed
+            while True:
+                with self._update_lock:
+                    if self._display_mode != "playlist" or self._playlist is not playlist:
+                        return False
+                delay = deadline - time.monotonic()
+                if delay <= 0:
+                    return True
+                if self._stop_event.wait(min(delay, 0.1)):
+                    return False
+        
+        index = 0
+        prepared = playlist.take(self, index)
+        boundary = time.monotonic()
+        while True:
+            item = playlist.index_item(index)
+            end = boundary + item.duration
+            if prepared is not None:
+                # Drawn ahead of time, for the wall-clock time it goes up
+                next_change = prepared.draw(self, double_buffer, 0.0, boundary + time.time() - time.monotonic())
+                # SwapOnVSync waits for the next vsync, so start it half a
+                # refresh early to land closest to the boundary
+                if not wait_until(boundary - period / 2):
+                    return
+                double_buffer = self.matrix.SwapOnVSync(double_buffer)
+                playlist.shown(boundary, time.monotonic(), period)
+                idle.activity()
+            # Started after the swap so it can't hold up the boundary
+            playlist.prefetch(self, index + 1)
+            if prepared is not None:
+                # Frames within the slot: scrolling, animation, the clock
+                drawn = 0.0
+                while next_change is not None:
+                    due = boundary + drawn + next_change
+                    if due >= end - DRAW_AHEAD:
+                        break
+                    if not wait_until(due - period / 2):
+                        return
+                    drawn = max(due, time.monotonic()) - boundary
+                    next_change = prepared.draw(self, double_buffer, drawn, boundary + drawn + time.time() - time.monotonic())
+                    double_buffer = self.matrix.SwapOnVSync(double_buffer)
+            
+            index += 1
+            if playlist.index_item(index) is None:
+                # A one-shot playlist leaves its last frame up
+                while not self._stop_event.is_set():
+                    with self._update_lock:
+                        if self._display_mode != "playlist" or self._playlist is not playlist:
+                            break
+                    idle.sleep(DISPLAY_POLL, self._stop_event)
+                return
+            if not wait_until(end - DRAW_AHEAD):
+                return
+            prepared = playlist.take(self, index)
+            boundary = end
+    
+    def _frame_receiver(self):
+        if self._receiver is None:
+            try:
+                self._receiver = FrameReceiver(self._sync_listen, self.matrix.width, self.matrix.height)
+            except (OSError, ValueError) as e:
+                print(f"Error listening for sync frames: {e}")
+                return None
+            print(f"Waiting for sync frames on {self._sync_listen}")
+        return self._receiver
+    
+    def _frame_stream(self):
+        if self._stream is None:
+            try:
+                self._stream = FrameStream(self._stream_source, self.matrix.width, self.matrix.height, self._stream_framing)
+            except (OSError, ValueError) as e:
+                print(f"Error opening frame stream: {e}")
+                return None
+        return self._stream
+    
+    def _shared_framebuffer(self):
+        size = (self.matrix.width, self.matrix.height)
+        if self._framebuffer is None or (self._framebuffer.width, self._framebuffer.height) != size:
+            try:
+                self._framebuffer = SharedFramebuffer.create(size[0], size[1], self._shm_name)
+            except ValueError as e:
+                print(f"Error opening shared framebuffer: {e}")
+                return None
+        return self._framebuffer
+    
+    def _frame_gate(self):
+        if self._frames is None or self._frames.matrix is not self.matrix:
+            self._frames = FrameGate(self.matrix, self._idle_power())
+        return self._frames
+    
+    def _transitions(self):
+        # The Transition for the current settings, None for cuts
+        with self._update_lock:
+            kind, duration = self._transition, self._transition_time
+        if kind == "none" or duration <= 0:
+            return None
+        player = self._transition_player
+        if player is None or player.frames is not self._frame_gate() or player.kind != kind:
+            player = Transition(self._frame_gate(), kind, duration)
+            self._transition_player = player
+        player.duration = duration
+        return player
+    
+    def _idle_power(self):
+        if self._idle is None or self._idle.matrix is not self.matrix:
+            self._idle = IdlePower(self.matrix, self._idle_after)
+        return self._idle
+    
+    def _tile(self, image, size, offset):
+        # Frame plus a copy at offset on a size canvas, for wrap-around scrolling
+        if isinstance(image, TextLayout):
+            return image.tiled(size, offset)
+        tiled = Image.new('RGB', size, self._bg_color)
+        tiled.paste(image, (0, 0))
+        tiled.paste(image, offset)
+        return tiled
+    
+    def _graded(self, image):
+        # image through the color grade. The last one is kept, since the
+        # loops blit the same image frame after frame.
+        grade = self._grade
+        cached = self._grade_cache
+        if cached is not None and cached[0] is image and cached[1] is grade:
+            return cached[2]
+        if grade.identity:
+            graded = image
+        elif isinstance(image, TextLayout):
+            graded = image.recolored(grade.color((image.color.red, image.color.green, image.color.blue)))
+        else:
+            graded = grade.image(image)
+        self._grade_cache = (image, grade, graded)
+        return graded
+    
+    def _blit(self, canvas, image, positions):
+        image = self._graded(image)
+        if isinstance(image, TextLayout):
+            canvas.Fill(*self._grade.color(self._bg_color))
+            for x, y in positions:
+                image.draw(canvas, x, y)
+        else:
+            for x, y in positions:
+                canvas.SetImage(image, x, y)
+    
     def _static_image(self, image):
-        self.matrix.SetImage(image.convert('RGB'))
+        # Re-entering static mode with the frame already up uploads nothing
+        frames = self._frame_gate()
+        image = self._graded(image)
+        if isinstance(image, TextLayout):
+            bg_color = self._grade.color(self._bg_color)
+            def draw():
+                self.matrix.Fill(*bg_color)
+                image.draw(self.matrix)
+            frames.update(image.key() + (bg_color,), draw)
+            self._static_frame = None
+        else:
+            image = image.convert('RGB')
+            key = image_key(image)
+            # A new frame replacing one this mode put up is blended in; it
+            # plays here, on the display thread, and a stop cuts it short
+            previous = self._static_frame
+            transition = self._transitions()
+            if transition is not None and previous is not None and frames.shown == previous[0] != key:
+                transition.play(previous[1], image, key, self._stop_event)
+            frames.set_image(image, key)
+            self._static_frame = (key, image)
         
-        check_interval = 0.1
+        # Polls for a mode change, slower once the frame has been up a while
+        idle = self._idle_power()
         while not self._stop_event.is_set():
             with self._update_lock:
-                if self._display_mode != "static":
+                if self._display_mode != "static" or self._rendered_version != self._render_version:
                     break
-            time.sleep(check_interval)
+            idle.sleep(DISPLAY_POLL, self._stop_event)
     
     def display_image_for_duration(self, image_path, duration):
         if self.load_image(image_path):
@@ -436,29 +990,17 @@ class MatrixDisplay(SampleBase):
             self.set_font_size(size)
         
     def run(self):
+        # The command line entry point, called by process(). Runs the same
+        # loop as start(), on this thread, so the versions are in step
+        # before the first frame and mode changes from the control server
+        # are followed instead of ending the program.
         self.process_args()
-        
-        image = self.get_display_image()
-        
-        mode = self._display_mode
-        if mode == "scroll-h" or mode == "scroll":
-            self._scroll_horizontal(image, self._scroll_speed)
-        elif mode == "scroll-up":
-            self._scroll_vertical(image, "up", self._scroll_speed)
-        elif mode == "scroll-down":
-            self._scroll_vertical(image, "down", self._scroll_speed)
-        elif mode == "random":
-            self._scroll_random(image, self._scroll_speed, self._random_interval)
-        else:
-            self._static_image(image)
+        self._stop_event.clear()
+        self._running = True
+        self._display_loop()
 
 if __name__ == "__main__":
     display = MatrixDisplay()
+    # process() sets up the matrix and calls run()
     if not display.process():
-        display.print_help()
-    else:
-        try:
-            display.run()
-        except KeyboardInterrupt:
-            print("Exiting\n")
-            sys.exit(0)
\ No newline at end of file
+        display.parser.print_help()
\ No newline at end of file
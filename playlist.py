@@ -0,0 +1,247 @@
+# Rotating content for MatrixDisplay's playlist mode: text (static or
+# scrolling), images, animated GIFs and clocks, each shown for its duration.
+#
+# While an item is up, the next one is rendered and scaled to the panel on a
+# background thread. Its first frame is drawn into the back buffer just before
+# the slot boundary and swapped in on the vsync closest to it. Slots run on a
+# fixed schedule from the start of the playlist, so a slow item doesn't push
+# every later one back. How far each swap landed from its boundary is kept in
+# Playlist.lateness.
+#
+# A playlist file is a JSON list (or {"items": [...]}) of items:
+#   [{"text": "Welcome!", "mode": "scroll-h", "duration": 12, "color": [255, 255, 0]},
+#    {"image": "logo.png", "duration": 5},
+#    {"animation": "test.gif", "duration": 8},
+#    {"clock": "%H:%M:%S", "duration": 10, "font_size": 16}]
+import collections
+import json
+import threading
+import time
+
+from PIL import Image, ImageSequence
+
+from image_fit import open_reduced
+
+ITEM_KINDS = ["text", "image", "animation", "clock"]
+TEXT_MODES = ["static", "scroll-h", "scroll-up", "scroll-down"]
+DEFAULT_DURATION = 10.0
+DEFAULT_SPEED = 0.03
+LATENESS_SAMPLES = 1024
+# How long before its slot boundary the next item's first frame is drawn
+DRAW_AHEAD = 0.02
+
+
+class PlaylistItem(object):
+    def __init__(self, kind, source, duration=DEFAULT_DURATION, mode="static", color=None, bg_color=None,
+                 font_size=None, speed=DEFAULT_SPEED, prepared=None):
+        # source is the text, the image or GIF path, or the clock's strftime
+        # format. Colors and font size default to the display's. prepared is
+        # a PreparedItem made ahead of time (hot_folder does that), which the
+        # playlist then uses as it is.
+        if kind not in ITEM_KINDS:
+            raise ValueError(f"Unknown playlist item: {kind}")
+        if mode not in TEXT_MODES:
+            raise ValueError(f"Unknown playlist text mode: {mode}")
+        if duration <= 0:
+            raise ValueError("Playlist items need a positive duration")
+        self.kind = kind
+        self.source = source
+        self.duration = float(duration)
+        self.mode = mode
+        self.color = tuple(color) if color else None
+        self.bg_color = tuple(bg_color) if bg_color else None
+        self.font_size = font_size
+        self.speed = speed
+        self.prepared = prepared
+
+    @classmethod
+    def from_dict(cls, spec):
+        kinds = [kind for kind in ITEM_KINDS if kind in spec]
+        if len(kinds) != 1:
+            raise ValueError(f"A playlist item needs exactly one of {', '.join(ITEM_KINDS)}: {spec}")
+        options = {key: spec[key] for key in ("duration", "mode", "color", "bg_color", "font_size", "speed")
+                   if key in spec}
+        return cls(kinds[0], spec[kinds[0]], **options)
+
+
+def load_playlist(path):
+    with open(path) as f:
+        spec = json.load(f)
+    if isinstance(spec, dict):
+        spec = spec.get("items", [])
+    return [PlaylistItem.from_dict(item) for item in spec]
+
+
+def gif_frames(path):
+    # [(RGB image, seconds)] for every frame of an animation
+    frames = []
+    with Image.open(path) as animation:
+        for frame in ImageSequence.Iterator(animation):
+            frames.append((frame.convert("RGB"), max(0.02, frame.info.get("duration", 100) / 1000.0)))
+    return frames
+
+
+class PreparedItem(object):
+    # An item's frames, ready to draw. draw() puts the frame for `elapsed`
+    # seconds into the slot on a canvas and returns the seconds until the
+    # picture changes again (None if it never does). `at` is the wall-clock
+    # time the frame goes up (default: now), which the clock shows.
+    def __init__(self, item, frames=None, durations=None, image=None, render=None):
+        self.item = item
+        self.frames = frames
+        self.durations = durations
+        self.image = image
+        self.render = render
+        self._rendered = None
+
+    def draw(self, display, canvas, elapsed, at=None):
+        item = self.item
+        if self.render is not None:
+            # Clock: re-rendered when the text changes, and due again on the
+            # next wall-clock second, not a second into the slot
+            if at is None:
+                at = time.time()
+            text = time.strftime(item.source, time.localtime(at))
+            if self._rendered is None or self._rendered[0] != text:
+                self._rendered = (text, self.render(text))
+            display._blit(canvas, self._rendered[1], [(0, 0)])
+            return 1.0 - at % 1.0
+        if self.frames is not None:
+            # Animation, looped for the length of the slot
+            t = elapsed % sum(self.durations)
+            for frame, duration in zip(self.frames, self.durations):
+                if t < duration:
+                    display._blit(canvas, frame, [(0, 0)])
+                    return duration - t
+                t -= duration
+            display._blit(canvas, self.frames[-1], [(0, 0)])
+            return self.durations[-1]
+        if item.kind == "text" and item.mode != "static":
+            # The epsilon keeps float error from drawing a step twice
+            step = int(elapsed / item.speed + 1e-9) if item.speed > 0 else 0
+            width, height = self.image.size
+            if item.mode == "scroll-h":
+                x = step % (width // 2)
+                display._blit(canvas, self.image, [(-x, 0), (-x + width // 2, 0)])
+            elif item.mode == "scroll-up":
+                y = step % (height // 2)
+                display._blit(canvas, self.image, [(0, -y), (0, -y + height // 2)])
+            else:
+                y = step % (height // 2)
+                display._blit(canvas, self.image, [(0, y), (0, y - height // 2)])
+            return (step + 1) * item.speed - elapsed if item.speed > 0 else None
+        display._blit(canvas, self.image, [(0, 0)])
+        return None
+
+
+def prepare(display, item):
+    # Renders and scales an item for display's panel; runs on the prefetch
+    # thread, so it only reads the display's settings
+    bg_color = item.bg_color or display._bg_color
+    color = item.color or display._text_color
+    font_size = item.font_size or display._font_size
+    width, height = display.matrix.width, display.matrix.height
+    if item.kind == "image":
+        return PreparedItem(item, image=display.fit_image(open_reduced(item.source, (width, height)), bg_color))
+    if item.kind == "animation":
+        frames = gif_frames(item.source)
+        if len(frames) == 1:
+            return PreparedItem(item, image=display.fit_image(frames[0][0], bg_color))
+        return PreparedItem(item, frames=[display.fit_image(frame, bg_color) for frame, _ in frames],
+                            durations=[duration for _, duration in frames])
+    if item.kind == "clock":
+        def render(text):
+            return display.text_image(text, color, bg_color, font_size, display._font_path, display._wrap_length)
+        prepared = PreparedItem(item, render=render)
+        text = time.strftime(item.source)
+        prepared._rendered = (text, render(text))
+        return prepared
+    image = display.text_image(item.source, color, bg_color, font_size, display._font_path, display._wrap_length)
+    # Tiled like the scroll modes do, so a slot wraps around seamlessly
+    if item.mode == "scroll-h":
+        image = display._tile(image, (width * 2, height), (width, 0))
+    elif item.mode in ("scroll-up", "scroll-down"):
+        image = display._tile(image, (width, height * 2), (0, height))
+    return PreparedItem(item, image=image)
+
+
+class Playlist(object):
+    def __init__(self, items, loop=True):
+        if not items:
+            raise ValueError("Empty playlist")
+        self.items = list(items)
+        self.loop = loop
+        self._prefetched = {}
+        self._lock = threading.Lock()
+
+        self.boundaries = 0
+        self.late = 0
+        self.unready = 0
+        self.errors = 0
+        self.lateness = collections.deque(maxlen=LATENESS_SAMPLES)
+
+    def set_items(self, items):
+        # Swaps the items of a running playlist; the rotation carries on
+        # from the slot it is at
+        if not items:
+            raise ValueError("Empty playlist")
+        self.items = list(items)
+
+    def index_item(self, index):
+        # The item in slot `index`, or None past the end of a one-shot list
+        items = self.items
+        if not self.loop and index >= len(items):
+            return None
+        return items[index % len(items)]
+
+    def prefetch(self, display, index):
+        # Starts preparing slot `index` on a background thread
+        item = self.index_item(index)
+        if item is None:
+            return
+        with self._lock:
+            if index in self._prefetched:
+                return
+            done = threading.Event()
+            self._prefetched[index] = [done, item.prepared]
+            if item.prepared is not None:
+                done.set()
+                return
+
+        def run():
+            try:
+                result = prepare(display, item)
+            except Exception as e:
+                print(f"Error preparing playlist item {item.source!r}: {e}")
+                result = None
+            self._prefetched[index][1] = result
+            done.set()
+
+        thread = threading.Thread(target=run, name="playlist-prefetch")
+        thread.daemon = True
+        thread.start()
+
+    def take(self, display, index):
+        # Slot `index`, prepared; waits if it isn't ready yet, and counts it
+        # if it was prefetched and still not done. None if the item couldn't
+        # be prepared.
+        ahead = index in self._prefetched
+        self.prefetch(display, index)
+        done, _ = self._prefetched[index]
+        if not done.is_set():
+            if ahead:
+                self.unready += 1
+            done.wait()
+        with self._lock:
+            prepared = self._prefetched.pop(index)[1]
+        if prepared is None:
+            self.errors += 1
+        return prepared
+
+    def shown(self, boundary, at, period):
+        # A new slot went up at `at`, for a boundary at `boundary`
+        lateness = at - boundary
+        self.lateness.append(lateness)
+        self.boundaries += 1
+        if lateness > period:
+            self.late += 1
@@ -3,12 +3,22 @@ from . cimport cppinc
 
 cdef class Canvas:
     cdef cppinc.Canvas *_getCanvas(self) except *
+    # What drawing goes through: _getCanvas(), or its readback copy
+    cdef cppinc.Canvas *_drawCanvas(self) except *
 
 cdef class FrameCanvas(Canvas):
     cdef cppinc.FrameCanvas *__canvas
+    cdef object _readback
 
 cdef class RGBMatrix(Canvas):
     cdef cppinc.RGBMatrix *__matrix
+    # Readbacks by FrameCanvas address, and the one for drawing on the
+    # matrix itself (None until EnableReadback())
+    cdef dict _readbacks
+    cdef object _direct
+    cdef _frameCanvas(self, cppinc.FrameCanvas *canvas, bytearray shown=*)
+    # Lets SwapOnVSync be wrapped (frame_recorder.tap_frames)
+    cdef dict __dict__
 
 cdef class RGBMatrixOptions:
     cdef cppinc.Options __options
@@ -4,10 +4,76 @@ from libcpp cimport bool
 from libc.stdint cimport uint8_t, uint32_t, uintptr_t
 import cython
 
+# The panel's framebuffers hold PWM bit planes that can't be turned back into
+# the colors drawn, so a canvas that has to be read back (frame_recorder on a
+# Pi) draws through a ReadbackCanvas: every pixel goes to the panel and into an
+# RGB24 copy, the same layout as the headless backend's canvas.pixels.
+cdef extern from *:
+    """
+    #include <string.h>
+    #include "canvas.h"
+
+    class ReadbackCanvas : public rgb_matrix::Canvas {
+    public:
+      ReadbackCanvas(rgb_matrix::Canvas *target, unsigned char *pixels)
+        : target_(target), pixels_(pixels) {}
+      virtual int width() const { return target_->width(); }
+      virtual int height() const { return target_->height(); }
+      virtual void SetPixel(int x, int y, uint8_t red, uint8_t green, uint8_t blue) {
+        target_->SetPixel(x, y, red, green, blue);
+        if (x < 0 || y < 0 || x >= width() || y >= height()) return;
+        unsigned char *pixel = pixels_ + 3 * (y * width() + x);
+        pixel[0] = red; pixel[1] = green; pixel[2] = blue;
+      }
+      virtual void Clear() {
+        target_->Clear();
+        memset(pixels_, 0, 3 * width() * height());
+      }
+      virtual void Fill(uint8_t red, uint8_t green, uint8_t blue) {
+        target_->Fill(red, green, blue);
+        for (int i = 0, n = width() * height(); i < n; ++i) {
+          pixels_[3 * i] = red; pixels_[3 * i + 1] = green; pixels_[3 * i + 2] = blue;
+        }
+      }
+      void SetCopy(unsigned char *pixels) { pixels_ = pixels; }
+    private:
+      rgb_matrix::Canvas *target_;
+      unsigned char *pixels_;
+    };
+    """
+    cdef cppclass ReadbackCanvas(cppinc.Canvas):
+        ReadbackCanvas(cppinc.Canvas*, unsigned char*)
+        void SetCopy(unsigned char*)
+
+cdef class Readback:
+    # The RGB24 copy of one canvas, and the ReadbackCanvas that fills it
+    cdef ReadbackCanvas *canvas
+    cdef readonly bytearray pixels
+
+    def __dealloc__(self):
+        del self.canvas
+
+    cdef show(self, bytearray pixels):
+        # Points the copy at other pixels, for the matrix's own drawing,
+        # which lands in whatever frame is on the panel
+        self.pixels = pixels
+        self.canvas.SetCopy(<unsigned char*>pixels)
+
+cdef Readback __createReadback(cppinc.Canvas *target, bytearray pixels=None):
+    readback = Readback()
+    if pixels is None:
+        pixels = bytearray(3 * target.width() * target.height())
+    readback.pixels = pixels
+    readback.canvas = new ReadbackCanvas(target, <unsigned char*>pixels)
+    return readback
+
 cdef class Canvas:
     cdef cppinc.Canvas* _getCanvas(self) except *:
         raise Exception("Not implemented")
 
+    cdef cppinc.Canvas* _drawCanvas(self) except *:
+        return self._getCanvas()
+
     def SetImage(self, image, int offset_x = 0, int offset_y = 0, unsafe=True):
         if (image.mode != "RGB"):
             raise Exception("Currently, only RGB mode is supported for SetImage(). Please create images with mode 'RGB' or convert first with image = image.convert('RGB'). Pull requests to support more modes natively are also welcome :)")
@@ -33,7 +99,7 @@ cdef class Canvas:
     @cython.boundscheck(False)
     @cython.wraparound(False)
     def SetPixelsPillow(self, int xstart, int ystart, int width, int height, image):
-        cdef cppinc.FrameCanvas* my_canvas = <cppinc.FrameCanvas*>self._getCanvas()
+        cdef cppinc.Canvas* my_canvas = self._drawCanvas()
         cdef int frame_width = my_canvas.width()
         cdef int frame_height = my_canvas.height()
         cdef int row, col
@@ -62,14 +128,27 @@ cdef class FrameCanvas(Canvas):
             return self.__canvas
         raise Exception("Canvas was destroyed or not initialized, you cannot use this object anymore")
 
+    cdef cppinc.Canvas* _drawCanvas(self) except *:
+        cdef cppinc.Canvas* canvas = self._getCanvas()
+        if self._readback is not None:
+            return (<Readback>self._readback).canvas
+        return canvas
+
     def Fill(self, uint8_t red, uint8_t green, uint8_t blue):
-        (<cppinc.FrameCanvas*>self._getCanvas()).Fill(red, green, blue)
+        self._drawCanvas().Fill(red, green, blue)
 
     def Clear(self):
-        (<cppinc.FrameCanvas*>self._getCanvas()).Clear()
+        self._drawCanvas().Clear()
 
     def SetPixel(self, int x, int y, uint8_t red, uint8_t green, uint8_t blue):
-        (<cppinc.FrameCanvas*>self._getCanvas()).SetPixel(x, y, red, green, blue)
+        self._drawCanvas().SetPixel(x, y, red, green, blue)
+
+    property pixels:
+        # RGB24 copy of what was drawn, once RGBMatrix.EnableReadback() ran
+        def __get__(self):
+            if self._readback is None:
+                raise AttributeError("pixels needs RGBMatrix.EnableReadback()")
+            return (<Readback>self._readback).pixels
 
 
     property width:
@@ -232,17 +311,52 @@ cdef class RGBMatrix(Canvas):
             return self.__matrix
         raise Exception("Canvas was destroyed or not initialized, you cannot use this object anymore")
 
+    cdef cppinc.Canvas* _drawCanvas(self) except *:
+        cdef cppinc.Canvas* canvas = self._getCanvas()
+        if self._direct is not None:
+            return (<Readback>self._direct).canvas
+        return canvas
+
     def Fill(self, uint8_t red, uint8_t green, uint8_t blue):
-        self.__matrix.Fill(red, green, blue)
+        self._drawCanvas().Fill(red, green, blue)
 
     def SetPixel(self, int x, int y, uint8_t red, uint8_t green, uint8_t blue):
-        self.__matrix.SetPixel(x, y, red, green, blue)
+        self._drawCanvas().SetPixel(x, y, red, green, blue)
 
     def Clear(self):
-        self.__matrix.Clear()
+        self._drawCanvas().Clear()
+
+    def EnableReadback(self):
+        # From now on everything drawn is also kept as RGB24, so what the
+        # panel shows can be read back from matrix.pixels and canvas.pixels
+        # (before the panel's brightness and luminance correction). Costs a
+        # copy of each pixel drawn; off unless asked for.
+        if self._readbacks is None:
+            self._readbacks = {}
+            self._direct = __createReadback(self.__matrix)
+
+    property pixels:
+        # RGB24 copy of the frame on the panel, once EnableReadback() ran
+        def __get__(self):
+            if self._direct is None:
+                raise AttributeError("pixels needs EnableReadback()")
+            return (<Readback>self._direct).pixels
+
+    cdef _frameCanvas(self, cppinc.FrameCanvas *canvas, bytearray shown=None):
+        # Wraps canvas, with its readback when readback is on. A canvas seen
+        # for the first time coming back from a swap held the shown pixels.
+        frame = __createFrameCanvas(canvas)
+        if self._readbacks is not None:
+            key = <uintptr_t>canvas
+            readback = self._readbacks.get(key)
+            if readback is None:
+                readback = __createReadback(canvas, shown)
+                self._readbacks[key] = readback
+            (<FrameCanvas>frame)._readback = readback
+        return frame
 
     def CreateFrameCanvas(self):
-        return __createFrameCanvas(self.__matrix.CreateFrameCanvas())
+        return self._frameCanvas(self.__matrix.CreateFrameCanvas())
 
     # The optional "framerate_fraction" parameter allows to choose which
     # multiple of the global frame-count to use. So it slows down your animation
@@ -253,7 +367,20 @@ cdef class RGBMatrix(Canvas):
     # If you combine this with RGBMatrixOptions.limit_refresh_rate_hz you can create
     # time-correct animations.
     def SwapOnVSync(self, FrameCanvas newFrame, uint8_t framerate_fraction = 1):
-        return __createFrameCanvas(self.__matrix.SwapOnVSync(newFrame.__canvas, framerate_fraction))
+        # Waiting for the vsync (framerate_fraction of them) must not stall
+        # the other Python threads
+        cdef cppinc.FrameCanvas *frame = newFrame.__canvas
+        cdef cppinc.FrameCanvas *previous
+        if self._readbacks is not None and newFrame._readback is None:
+            # Created before EnableReadback(): its contents are unknown
+            newFrame._readback = self._frameCanvas(frame)._readback
+        with nogil:
+            previous = self.__matrix.SwapOnVSync(frame, framerate_fraction)
+        if self._readbacks is None:
+            return __createFrameCanvas(previous)
+        shown = (<Readback>self._direct).pixels
+        (<Readback>self._direct).show((<Readback>newFrame._readback).pixels)
+        return self._frameCanvas(previous, shown)
 
     property luminanceCorrect:
         def __get__(self): return self.__matrix.luminance_correct()
@@ -22,7 +22,7 @@ cdef extern from "led-matrix.h" namespace "rgb_matrix":
         void SetBrightness(uint8_t)
         uint8_t brightness()
         FrameCanvas *CreateFrameCanvas()
-        FrameCanvas *SwapOnVSync(FrameCanvas*, uint8_t)
+        FrameCanvas *SwapOnVSync(FrameCanvas*, uint8_t) nogil
 
     cdef cppclass FrameCanvas(Canvas):
         bool SetPWMBits(uint8_t)
@@ -32,7 +32,7 @@ cdef class Font:
             raise Exception("Couldn't load font " + file)
 
     def DrawGlyph(self, core.Canvas c, int x, int y, Color color, uint32_t char):
-        return self.__font.DrawGlyph(c._getCanvas(), x, y, color.__color, char)
+        return self.__font.DrawGlyph(c._drawCanvas(), x, y, color.__color, char)
 
     property height:
         def __get__(self): return self.__font.height()
@@ -41,13 +41,47 @@ cdef class Font:
         def __get__(self): return self.__font.baseline()
 
 def DrawText(core.Canvas c, Font f, int x, int y, Color color, text):
-    return cppinc.DrawText(c._getCanvas(), f.__font, x, y, color.__color, text.encode('utf-8'))
+    return cppinc.DrawText(c._drawCanvas(), f.__font, x, y, color.__color, text.encode('utf-8'))
+
+def MeasureText(Font f, text):
+    # (width, height) of text in pixels without a call per character. Lines
+    # are split on '\n'; glyphs missing from the font count as 0 like in
+    # DrawText.
+    cdef int width = 0
+    cdef int line_width = 0
+    cdef int lines = 1
+    cdef int w
+    cdef Py_UCS4 ch
+    for ch in text:
+        if ch == u'\n':
+            if line_width > width:
+                width = line_width
+            line_width = 0
+            lines += 1
+            continue
+        w = f.__font.CharacterWidth(ch)
+        if w > 0:
+            line_width += w
+    if line_width > width:
+        width = line_width
+    return width, lines * f.__font.height()
+
+def DrawTextRuns(core.Canvas c, Font f, runs):
+    # Draws every (x, y, color, text) run in one call, returns their widths
+    cdef cppinc.Canvas *canvas = c._drawCanvas()
+    cdef int x, y
+    cdef Color color
+    widths = []
+    for run in runs:
+        x, y, color, text = run
+        widths.append(cppinc.DrawText(canvas, f.__font, x, y, color.__color, text.encode('utf-8')))
+    return widths
 
 def DrawCircle(core.Canvas c, int x, int y, int r, Color color):
-    cppinc.DrawCircle(c._getCanvas(), x, y, r, color.__color)
+    cppinc.DrawCircle(c._drawCanvas(), x, y, r, color.__color)
 
 def DrawLine(core.Canvas c, int x1, int y1, int x2, int y2, Color color):
-    cppinc.DrawLine(c._getCanvas(), x1, y1, x2, y2, color.__color)
+    cppinc.DrawLine(c._drawCanvas(), x1, y1, x2, y2, color.__color)
 
 # Local Variables:
 # mode: python
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+# Headless drop-in for the rgbmatrix bindings, see matrix_backend.py for
+# how scripts pick it up.
+from __future__ import absolute_import
+
+from .core import RGBMatrix, FrameCanvas, RGBMatrixOptions
+from . import graphics
@@ -0,0 +1,197 @@
+# In-memory stand-in for rgbmatrix.core. Pixels live in a flat bytearray
+# (row-major RGB24, width * height * 3) per FrameCanvas so they can be
+# inspected after drawing. SwapOnVSync waits for a simulated refresh clock.
+import threading
+import time
+
+DEFAULT_REFRESH_RATE_HZ = 120
+
+
+class Canvas(object):
+    def SetImage(self, image, offset_x=0, offset_y=0, unsafe=True):
+        if (image.mode != "RGB"):
+            raise Exception("Currently, only RGB mode is supported for SetImage(). Please create images with mode 'RGB' or convert first with image = image.convert('RGB'). Pull requests to support more modes natively are also welcome :)")
+
+        img_width, img_height = image.size
+        self.SetPixelsPillow(offset_x, offset_y, img_width, img_height, image)
+
+    def SetPixelsPillow(self, xstart, ystart, width, height, image):
+        canvas = self._getCanvas()
+        x0 = max(0, -xstart)
+        x1 = min(width, canvas.width - xstart)
+        y0 = max(0, -ystart)
+        y1 = min(height, canvas.height - ystart)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        if (x0, y0, x1, y1) != (0, 0, image.width, image.height):
+            image = image.crop((x0, y0, x1, y1))
+        data = memoryview(image.tobytes())
+
+        pixels = canvas.pixels
+        stride = canvas.width * 3
+        row_bytes = (x1 - x0) * 3
+        start = ((y0 + ystart) * canvas.width + x0 + xstart) * 3
+        if row_bytes == stride:
+            pixels[start:start + len(data)] = data
+            return
+        for row in range(y1 - y0):
+            dst = start + row * stride
+            src = row * row_bytes
+            pixels[dst:dst + row_bytes] = data[src:src + row_bytes]
+
+    def GetPixel(self, x, y):
+        canvas = self._getCanvas()
+        i = (y * canvas.width + x) * 3
+        return tuple(canvas.pixels[i:i + 3])
+
+    def ToImage(self):
+        from PIL import Image
+        canvas = self._getCanvas()
+        return Image.frombytes('RGB', (canvas.width, canvas.height), bytes(canvas.pixels))
+
+
+class FrameCanvas(Canvas):
+    def __init__(self, width, height, pwm_bits=11, brightness=100):
+        self._width = width
+        self._height = height
+        self.pixels = bytearray(width * height * 3)
+        self.pwmBits = pwm_bits
+        self.brightness = brightness
+
+    def _getCanvas(self):
+        return self
+
+    def Fill(self, red, green, blue):
+        self.pixels[:] = bytes((red, green, blue)) * (self._width * self._height)
+
+    def Clear(self):
+        self.pixels[:] = bytes(len(self.pixels))
+
+    def SetPixel(self, x, y, red, green, blue):
+        if 0 <= x < self._width and 0 <= y < self._height:
+            i = (y * self._width + x) * 3
+            self.pixels[i] = red
+            self.pixels[i + 1] = green
+            self.pixels[i + 2] = blue
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+
+class RGBMatrixOptions(object):
+    def __init__(self):
+        # RGBMatrix::Options defaults
+        self.hardware_mapping = "regular"
+        self.rows = 32
+        self.cols = 32
+        self.chain_length = 1
+        self.parallel = 1
+        self.pwm_bits = 11
+        self.pwm_lsb_nanoseconds = 130
+        self.brightness = 100
+        self.scan_mode = 0
+        self.multiplexing = 0
+        self.row_address_type = 0
+        self.disable_hardware_pulsing = False
+        self.show_refresh_rate = False
+        self.inverse_colors = False
+        self.led_rgb_sequence = "RGB"
+        self.pixel_mapper_config = ""
+        self.panel_type = ""
+        self.pwm_dither_bits = 0
+        self.limit_refresh_rate_hz = 0
+
+        # RuntimeOptions defaults
+        self.gpio_slowdown = 1
+        self.daemon = 0
+        self.drop_privileges = 1
+        self.drop_priv_user = ""
+        self.drop_priv_group = ""
+
+
+class RGBMatrix(Canvas):
+    def __init__(self, rows=0, chains=0, parallel=0, options=None):
+        if options is None:
+            options = RGBMatrixOptions()
+
+        if rows > 0:
+            options.rows = rows
+        if chains > 0:
+            options.chain_length = chains
+        if parallel > 0:
+            options.parallel = parallel
+
+        self.options = options
+        self._width = options.cols * options.chain_length
+        self._height = options.rows * options.parallel
+        self.pwmBits = options.pwm_bits
+        self.brightness = options.brightness
+        self.luminanceCorrect = True
+
+        # Simulated panel refresh. limit_refresh_rate_hz wins if set, a rate
+        # of 0 makes SwapOnVSync return immediately.
+        if options.limit_refresh_rate_hz > 0:
+            self.refresh_rate_hz = options.limit_refresh_rate_hz
+        else:
+            self.refresh_rate_hz = DEFAULT_REFRESH_RATE_HZ
+
+        self._active = self.CreateFrameCanvas()
+        self._swap_lock = threading.Lock()
+        self._start_time = time.monotonic()
+        self._last_swap_tick = 0
+        self.swap_count = 0
+        self.last_swap_time = None
+
+    def _getCanvas(self):
+        return self._active
+
+    def Fill(self, red, green, blue):
+        self._active.Fill(red, green, blue)
+
+    def SetPixel(self, x, y, red, green, blue):
+        self._active.SetPixel(x, y, red, green, blue)
+
+    def Clear(self):
+        self._active.Clear()
+
+    def CreateFrameCanvas(self):
+        return FrameCanvas(self._width, self._height, self.pwmBits, self.brightness)
+
+    def _wait_for_vsync(self, framerate_fraction):
+        if self.refresh_rate_hz <= 0:
+            return
+        period = 1.0 / self.refresh_rate_hz
+        now = time.monotonic()
+        tick = int((now - self._start_time) / period)
+        target = max(tick + 1, self._last_swap_tick + max(1, framerate_fraction))
+        delay = self._start_time + target * period - now
+        if delay > 0:
+            time.sleep(delay)
+        self._last_swap_tick = target
+
+    def SwapOnVSync(self, newFrame, framerate_fraction=1):
+        with self._swap_lock:
+            self._wait_for_vsync(framerate_fraction)
+            previous = self._active
+            self._active = newFrame
+            self.swap_count += 1
+            self.last_swap_time = time.monotonic()
+        return previous
+
+    @property
+    def pixels(self):
+        return self._active.pixels
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def width(self):
+        return self._width
@@ -0,0 +1,170 @@
+# Pure Python counterpart of rgbmatrix.graphics. Fonts are parsed from the
+# same BDF files and glyphs are placed exactly like the C++ bdf-font code,
+# so text drawn headless lines up with what the panel shows.
+UNICODE_REPLACEMENT_CODEPOINT = 0xFFFD
+
+
+class Color(object):
+    def __init__(self, red=0, green=0, blue=0):
+        self.red = red
+        self.green = green
+        self.blue = blue
+
+
+class Glyph(object):
+    def __init__(self, device_width, height, y_offset, dots):
+        self.device_width = device_width
+        self.height = height
+        self.y_offset = y_offset
+        # (x, y) of every lit pixel relative to the glyph's top-left corner
+        self.dots = dots
+
+
+class Font(object):
+    def __init__(self):
+        self._glyphs = {}
+        self._height = -1
+        self._baseline = 0
+
+    def _find_glyph(self, char):
+        glyph = self._glyphs.get(char)
+        if glyph is None:
+            glyph = self._glyphs.get(UNICODE_REPLACEMENT_CODEPOINT)
+        return glyph
+
+    def CharacterWidth(self, char):
+        glyph = self._find_glyph(char)
+        return glyph.device_width if glyph else -1
+
+    def LoadFont(self, file):
+        try:
+            with open(file, 'r', encoding='latin-1') as f:
+                lines = f.readlines()
+        except OSError:
+            raise Exception("Couldn't load font " + file)
+
+        glyphs = {}
+        codepoint = None
+        device_width = 0
+        bbx = None
+        rows = None
+        for line in lines:
+            parts = line.split()
+            if not parts:
+                continue
+            keyword = parts[0]
+            if keyword == "FONTBOUNDINGBOX":
+                self._height = int(parts[2])
+                self._baseline = int(parts[4]) + self._height
+            elif keyword == "ENCODING":
+                codepoint = int(parts[1])
+            elif keyword == "DWIDTH":
+                device_width = int(parts[1])
+            elif keyword == "BBX":
+                bbx = tuple(int(p) for p in parts[1:5])
+                rows = None
+            elif keyword == "BITMAP":
+                rows = []
+            elif keyword == "ENDCHAR":
+                if bbx is not None and rows is not None and len(rows) == bbx[1] and codepoint is not None and codepoint >= 0:
+                    glyphs[codepoint] = self._make_glyph(device_width, bbx, rows)
+                bbx = None
+                rows = None
+            elif rows is not None and bbx is not None and len(rows) < bbx[1]:
+                rows.append(keyword)
+
+        if not glyphs:
+            raise Exception("Couldn't load font " + file)
+        self._glyphs = glyphs
+
+    @staticmethod
+    def _make_glyph(device_width, bbx, rows):
+        width, height, x_offset, y_offset = bbx
+        dots = []
+        for y, hex_row in enumerate(rows):
+            bits = int(hex_row, 16)
+            nbits = len(hex_row) * 4
+            for col in range(width):
+                x = col + x_offset
+                if 0 <= x < device_width and (bits >> (nbits - 1 - col)) & 1:
+                    dots.append((x, y))
+        return Glyph(device_width, height, y_offset, dots)
+
+    def DrawGlyph(self, c, x, y, color, char):
+        glyph = self._find_glyph(char)
+        if glyph is None:
+            return 0
+        top = y - glyph.height - glyph.y_offset
+        r, g, b = color.red, color.green, color.blue
+        for dx, dy in glyph.dots:
+            c.SetPixel(x + dx, top + dy, r, g, b)
+        return glyph.device_width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def baseline(self):
+        return self._baseline
+
+
+def DrawText(c, f, x, y, color, text):
+    start_x = x
+    for ch in text:
+        x += f.DrawGlyph(c, x, y, color, ord(ch))
+    return x - start_x
+
+
+def MeasureText(f, text):
+    width = 0
+    lines = text.split("\n")
+    for line in lines:
+        line_width = 0
+        for ch in line:
+            w = f.CharacterWidth(ord(ch))
+            if w > 0:
+                line_width += w
+        width = max(width, line_width)
+    return width, len(lines) * f.height
+
+
+def DrawTextRuns(c, f, runs):
+    return [DrawText(c, f, x, y, color, text) for x, y, color, text in runs]
+
+
+def DrawCircle(c, x, y, r, color):
+    # Midpoint circle, same octant walk as graphics.cc
+    dx = r
+    dy = 0
+    radius_error = 1 - dx
+    while dy <= dx:
+        for px, py in ((dx + x, dy + y), (dy + x, dx + y), (-dx + x, dy + y), (-dy + x, dx + y),
+                       (-dx + x, -dy + y), (-dy + x, -dx + y), (dx + x, -dy + y), (dy + x, -dx + y)):
+            c.SetPixel(px, py, color.red, color.green, color.blue)
+        dy += 1
+        if radius_error < 0:
+            radius_error += 2 * dy + 1
+        else:
+            dx -= 1
+            radius_error += 2 * (dy - dx + 1)
+
+
+def DrawLine(c, x1, y1, x2, y2, color):
+    # Bresenham
+    dx = abs(x2 - x1)
+    dy = -abs(y2 - y1)
+    sx = 1 if x1 < x2 else -1
+    sy = 1 if y1 < y2 else -1
+    err = dx + dy
+    while True:
+        c.SetPixel(x1, y1, color.red, color.green, color.blue)
+        if x1 == x2 and y1 == y2:
+            break
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x1 += sx
+        if e2 <= dx:
+            err += dx
+            y1 += sy
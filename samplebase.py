@@ -4,8 +4,10 @@ import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/..'))
-from rgbmatrix import RGBMatrix, RGBMatrixOptions
-#from RGBMatrixEmulator import RGBMatrix, RGBMatrixOptions
+import matrix_backend
+from cpu_placement import Placement, PLACEMENT_ENV
+from frame_recorder import record_matrix, RECORD_ENV
+from frame_sync import send_frames, SYNC_ENV
 
 class SampleBase(object):
     def __init__(self, *args, **kwargs):
@@ -21,6 +23,7 @@ class SampleBase(object):
         self.parser.add_argument("--led-scan-mode", action="store", help="Progressive or interlaced scan. 0 Progressive, 1 Interlaced (default)", default=1, choices=range(2), type=int)
         self.parser.add_argument("--led-pwm-lsb-nanoseconds", action="store", help="Base time-unit for the on-time in the lowest significant bit in nanoseconds. Default: 130", default=130, type=int)
         self.parser.add_argument("--led-show-refresh", action="store_true", help="Shows the current refresh rate of the LED panel")
+        self.parser.add_argument("--led-limit-refresh", action="store", help="Limit refresh rate to this frequency in Hz. Useful to keep a constant refresh rate on loaded system. 0=no limit. Default: 0", default=0, type=int)
         self.parser.add_argument("--led-slowdown-gpio", action="store", help="Slow down writing to GPIO. Range: 0..4. Default: 1", default=3, type=int)
         self.parser.add_argument("--led-no-hardware-pulse", action="store", help="Don't use hardware pin-pulse generation")
         self.parser.add_argument("--led-rgb-sequence", action="store", help="Switch if your matrix has led colors swapped. Default: RGB", default="RGB", type=str)
@@ -30,6 +33,13 @@ class SampleBase(object):
         self.parser.add_argument("--led-panel-type", action="store", help="Needed to initialize special panels. Supported: 'FM6126A'", default="", type=str)
         self.parser.add_argument("--led-no-drop-privs", dest="drop_privileges", help="Don't drop privileges from 'root' after initializing the hardware.", action='store_false')
         self.parser.set_defaults(drop_privileges=True)
+        self.parser.add_argument("--led-headless", action="store_true", help="Render into an in-memory matrix instead of the panel (same as setting %s=1)" % matrix_backend.HEADLESS_ENV)
+        self.parser.add_argument("--placement", help="Cores and scheduling for the Python threads, e.g. 'render=1:fifo=40;input=2:nice=-5' (default: $%s)" % PLACEMENT_ENV, default=os.environ.get(PLACEMENT_ENV, ""), type=Placement.parse)
+        self.parser.add_argument("--record", help="Record the frames shown to this file (default: $%s)" % RECORD_ENV, default=os.environ.get(RECORD_ENV, ""))
+        self.parser.add_argument("--sync-to", help="Send the frames shown to sync agents, e.g. 'udp://10.0.0.2:5005,tcp://10.0.0.3:5005', needs --led-headless (default: $%s)" % SYNC_ENV, default=os.environ.get(SYNC_ENV, ""))
+        self.placement = Placement()
+        self.recorder = None
+        self.sync = None
 
     def usleep(self, value):
         time.sleep(value / 1000000.0)
@@ -39,8 +49,10 @@ class SampleBase(object):
 
     def process(self):
         self.args = self.parser.parse_args()
+        self.placement = self.args.placement
 
-        options = RGBMatrixOptions()
+        backend = matrix_backend.load(True if self.args.led_headless else None)
+        options = backend.RGBMatrixOptions()
 
         if self.args.led_gpio_mapping != None:
           options.hardware_mapping = self.args.led_gpio_mapping
@@ -60,6 +72,8 @@ class SampleBase(object):
 
         if self.args.led_show_refresh:
           options.show_refresh_rate = 1
+        if self.args.led_limit_refresh:
+          options.limit_refresh_rate_hz = self.args.led_limit_refresh
 
         if self.args.led_slowdown_gpio != None:
             options.gpio_slowdown = self.args.led_slowdown_gpio
@@ -69,7 +83,9 @@ class SampleBase(object):
           options.drop_privileges=False
         options.disable_hardware_pulsing = True  # May reduce quality but avoids priority errors
         options.drop_privileges = False  # Keeps root privileges
-        self.matrix = RGBMatrix(options = options)
+        self.matrix = backend.RGBMatrix(options = options)
+        self.recorder = record_matrix(self.matrix, self.args.record)
+        self.sync = send_frames(self.matrix, self.args.sync_to)
 
         try:
             # Start loop
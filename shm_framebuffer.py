@@ -0,0 +1,137 @@
+# Shared-memory framebuffer that other local processes draw into. MatrixDisplay
+# in "shm" mode creates /dev/shm/<name> sized for its matrix; a producer (a
+# dashboard, a video decoder, a game) attaches to it, writes RGB24 frames and
+# publishes them, and the display puts each new frame up on the next vsync.
+#
+# Layout: a header of int64 words followed by three frame slots of
+# width * height * 3 bytes. Frame number n lives in slot n % 3, and
+# publishing it is a single store of n into SEQ, so the reader always knows
+# which slot is complete. The producer only gets back to frame n's slot once
+# it has published n + 2, so a reader that sees SEQ move on by more than one
+# while it was copying knows its slot may have been overwritten, and drops
+# that frame.
+#
+#   fb = SharedFramebuffer.attach()
+#   fb.back()[:] = rgb_array     # height x width x 3, uint8
+#   fb.publish()
+import numpy as np
+from PIL import Image
+from multiprocessing import resource_tracker, shared_memory
+
+DEFAULT_NAME = "rgbmatrix-framebuffer"
+MAGIC = 0x52474246  # "RGBF"
+
+# Header words
+HEADER_MAGIC = 0
+HEADER_WIDTH = 1
+HEADER_HEIGHT = 2
+HEADER_SEQ = 3
+HEADER_WORDS = 8
+HEADER_BYTES = 8 * HEADER_WORDS
+SLOTS = 3
+
+
+class SharedFramebuffer(object):
+    def __init__(self, shm, width, height, owner=False):
+        self.shm = shm
+        self.width = width
+        self.height = height
+        self.owner = owner
+        self.header = np.ndarray((HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        frame_bytes = width * height * 3
+        self._slots = [np.ndarray((height, width, 3), dtype=np.uint8, buffer=shm.buf,
+                                  offset=HEADER_BYTES + i * frame_bytes) for i in range(SLOTS)]
+        self._slot_views = [shm.buf[HEADER_BYTES + i * frame_bytes:HEADER_BYTES + (i + 1) * frame_bytes]
+                            for i in range(SLOTS)]
+        self.published = 0
+        self.dropped = 0
+
+    @classmethod
+    def create(cls, width, height, name=DEFAULT_NAME):
+        # Used by the display; an existing buffer of the right size is reused
+        # so producers that are already attached keep working
+        size = HEADER_BYTES + SLOTS * width * height * 3
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            framebuffer = cls.attach(name)
+            if (framebuffer.width, framebuffer.height) != (width, height):
+                framebuffer.close()
+                raise ValueError(f"Shared framebuffer {name} is {framebuffer.width}x{framebuffer.height}, "
+                                 f"the matrix is {width}x{height}")
+            return framebuffer
+        header = np.ndarray((HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[HEADER_WIDTH] = width
+        header[HEADER_HEIGHT] = height
+        header[HEADER_MAGIC] = MAGIC
+        del header
+        return cls(shm, width, height, owner=True)
+
+    @classmethod
+    def attach(cls, name=DEFAULT_NAME):
+        # Used by producers. The display owns the segment: without this, the
+        # attaching process's resource tracker would unlink it on exit.
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, "shared_memory")
+        header = np.ndarray((HEADER_WORDS,), dtype=np.int64, buffer=shm.buf)
+        if header[HEADER_MAGIC] != MAGIC:
+            del header
+            shm.close()
+            raise ValueError(f"{name} is not a matrix framebuffer")
+        width, height = int(header[HEADER_WIDTH]), int(header[HEADER_HEIGHT])
+        del header
+        if shm.size < HEADER_BYTES + SLOTS * width * height * 3:
+            shm.close()
+            raise ValueError(f"{name} is a framebuffer from an older version, remove it first")
+        return cls(shm, width, height)
+
+    @property
+    def seq(self):
+        return int(self.header[HEADER_SEQ])
+
+    # Producer side
+
+    def back(self):
+        # The slot the next frame goes into, as a height x width x 3 array
+        return self._slots[(self.seq + 1) % SLOTS]
+
+    def publish(self):
+        self.header[HEADER_SEQ] = self.seq + 1
+        self.published += 1
+
+    def write(self, frame):
+        # Copies a PIL image or an HxWx3 uint8 array in and publishes it
+        if isinstance(frame, Image.Image):
+            frame = np.asarray(frame.convert("RGB"))
+        self.back()[...] = frame
+        self.publish()
+
+    # Reader side
+
+    def image(self, seq):
+        # A copy of frame `seq` as a PIL image (frombuffer copies RGB). Check
+        # intact(seq) after making it: the copy may have raced the producer.
+        return Image.frombuffer("RGB", (self.width, self.height), self._slot_views[seq % SLOTS], "raw", "RGB", 0, 1)
+
+    def intact(self, seq):
+        # True if the producer hasn't started reusing frame seq's slot
+        if self.seq - seq > 1:
+            self.dropped += 1
+            return False
+        return True
+
+    def close(self):
+        self._slots = None
+        for view in self._slot_views or ():
+            view.release()
+        self._slot_views = None
+        self.header = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
@@ -0,0 +1,198 @@
+# Native text rendering for MatrixDisplay, the clock and the counters. Text is
+# drawn from the BDF fonts in fonts/ straight into a canvas with
+# rgbmatrix.graphics.DrawText, instead of rendering TrueType text with Pillow
+# into an image and copying that with SetImage.
+#
+#   renderer = BDFTextRenderer("7x13.bdf")
+#   renderer.draw_centered(canvas, "Hello", (255, 255, 0))
+#
+# Layouts are lists of (x, baseline y, text) runs that can be drawn at any
+# offset, which is all the scrolling modes need.
+import os
+import textwrap
+
+import matrix_backend
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+DEFAULT_BDF_FONT = "7x13.bdf"
+TEXT_RENDERERS = ["pil", "bdf"]
+
+_fonts = {}
+
+
+def font_file(name):
+    # Bare names like "6x10.bdf" refer to the bundled fonts/ directory
+    if os.path.exists(name):
+        return name
+    return os.path.join(FONT_DIR, name)
+
+
+def load_bdf_font(name):
+    # Each font file is parsed once per process and shared by all renderers
+    path = font_file(name)
+    font = _fonts.get(path)
+    if font is None:
+        font = BDFFont(path)
+        _fonts[path] = font
+    return font
+
+
+class BDFFont(object):
+    def __init__(self, path):
+        self.path = path
+        self.font = matrix_backend.graphics.Font()
+        self.font.LoadFont(path)
+        self.height = self.font.height
+        self.baseline = self.font.baseline
+        self._widths = {}
+
+    def char_width(self, char):
+        width = self._widths.get(char)
+        if width is None:
+            # -1 for characters the font has no glyph (or fallback) for
+            width = max(0, self.font.CharacterWidth(ord(char)))
+            self._widths[char] = width
+        return width
+
+    def text_width(self, text):
+        # Widths come from the per-character cache; only characters not seen
+        # before cost a CharacterWidth call (BDF fonts have no kerning)
+        widths = self._widths
+        try:
+            return sum([widths[char] for char in text])
+        except KeyError:
+            return sum(self.char_width(char) for char in text)
+
+
+class TextLayout(object):
+    def __init__(self, font, runs, size, color):
+        self.font = font
+        self.runs = runs
+        self.size = size
+        self.color = color
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    def draw(self, canvas, x=0, y=0):
+        color = self.color
+        width, height = canvas.width, canvas.height
+        line_height = self.font.height
+        ascent = self.font.baseline
+        runs = []
+        for run_x, run_y, text in self.runs:
+            # Skip lines that are entirely off the canvas
+            top = y + run_y - ascent
+            if top + line_height <= 0 or top >= height or x + run_x >= width:
+                continue
+            runs.append((x + run_x, y + run_y, color, text))
+        draw_runs(canvas, self.font.font, runs)
+
+    def key(self):
+        # Identifies the pixels this layout draws, for frame_gate
+        color = (self.color.red, self.color.green, self.color.blue)
+        return ("layout", self.font.path, tuple(self.runs), self.size, color)
+
+    def recolored(self, color):
+        # The same layout in another (r, g, b) color
+        return TextLayout(self.font, self.runs, self.size, make_color(color))
+
+    def tiled(self, size, offset):
+        # The layout plus a copy shifted by offset, for wrap-around scrolling
+        dx, dy = offset
+        runs = self.runs + [(x + dx, y + dy, text) for x, y, text in self.runs]
+        return TextLayout(self.font, runs, size, self.color)
+
+
+class BDFTextRenderer(object):
+    def __init__(self, fonts=DEFAULT_BDF_FONT):
+        # Several fonts, largest first, let layouts fall back to a smaller
+        # one when the text does not fit (like the counters' auto sizing)
+        if isinstance(fonts, str):
+            fonts = [fonts]
+        self.fonts = [load_bdf_font(name) for name in fonts]
+        self.font = self.fonts[0]
+
+    def wrap(self, font, text, max_width):
+        # Greedy word wrap on pixel widths; words wider than a line are split
+        lines = []
+        for paragraph in text.split("\n"):
+            line = ""
+            for word in paragraph.split(" "):
+                candidate = word if not line else line + " " + word
+                if font.text_width(candidate) <= max_width:
+                    line = candidate
+                    continue
+                if line:
+                    lines.append(line)
+                line = ""
+                for char in word:
+                    if line and font.text_width(line + char) > max_width:
+                        lines.append(line)
+                        line = ""
+                    line += char
+            lines.append(line)
+        return lines
+
+    def _fits(self, font, lines, width, height):
+        return (len(lines) * font.height <= height and
+                all(font.text_width(line) <= width for line in lines))
+
+    def layout(self, text, width, height, color, wrap=True, wrap_chars=0):
+        # Lines centered horizontally and the block centered vertically in a
+        # width x height frame
+        text = str(text)
+        if wrap_chars > 0:
+            text = textwrap.fill(text, wrap_chars)
+            wrap = False
+        lines = text.split("\n")
+        font = None
+        for candidate in self.fonts:
+            if self._fits(candidate, lines, width, height):
+                font = candidate
+                break
+        if font is None:
+            font = self.fonts[-1]
+            if wrap:
+                for candidate in self.fonts:
+                    font, lines = candidate, self.wrap(candidate, text, width)
+                    if self._fits(candidate, lines, width, height):
+                        break
+
+        top = (height - len(lines) * font.height) // 2
+        runs = []
+        for i, line in enumerate(lines):
+            x = (width - font.text_width(line)) // 2
+            runs.append((x, top + i * font.height + font.baseline, line))
+        return TextLayout(font, runs, (width, height), make_color(color))
+
+    def draw_centered(self, canvas, text, color, bg_color=(0, 0, 0)):
+        canvas.Fill(*bg_color)
+        self.layout(text, canvas.width, canvas.height, color).draw(canvas)
+
+
+def draw_runs(canvas, font, runs):
+    graphics = matrix_backend.graphics
+    if hasattr(graphics, "DrawTextRuns"):
+        return graphics.DrawTextRuns(canvas, font, runs)
+    return [graphics.DrawText(canvas, font, x, y, color, text) for x, y, color, text in runs]
+
+
+def make_color(color):
+    if isinstance(color, tuple):
+        return matrix_backend.graphics.Color(*color)
+    return color
+
+
+def make_text_renderer(kind, bdf_font=DEFAULT_BDF_FONT):
+    # None stands for the scripts' own Pillow path
+    if kind == "bdf":
+        return BDFTextRenderer(bdf_font.split(","))
+    if kind not in (None, "pil"):
+        raise ValueError(f"Unknown text renderer: {kind}")
+    return None
@@ -0,0 +1,175 @@
+# Transitions between two screens: crossfade, wipe (the new screen uncovered
+# left to right) and slide (the new screen pushes the old one out to the
+# left). The blend frames are NumPy arithmetic on the two frames and are
+# made one at a time: the first is ready right away, and each next one is
+# computed while the previous one waits for its vsync, so a transition never
+# holds up its first frame and never keeps more than one blend frame around.
+#
+# Frames go through the double buffer at a locked rate: each swap waits a
+# fixed number of refreshes (SwapOnVSync's framerate_fraction), like
+# flash_animation. Transition.start() plays on a thread of its own, so the
+# input threads carry on while a transition runs.
+#
+#   transition = Transition(FrameGate(matrix), kind="slide", duration=0.3)
+#   transition.start(old_frame, logo, hold=1.0, then=show_value)
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+CROSSFADE = "crossfade"
+WIPE = "wipe"
+SLIDE = "slide"
+TRANSITIONS = [CROSSFADE, WIPE, SLIDE]
+DEFAULT_DURATION = 0.3
+DEFAULT_FPS = 60
+DEFAULT_REFRESH_HZ = 120
+
+
+def as_array(frame):
+    # height x width x 3 uint8 from a PIL image or an array
+    if isinstance(frame, Image.Image):
+        return np.asarray(frame if frame.mode == "RGB" else frame.convert("RGB"))
+    return frame
+
+
+def blend(kind, outgoing, incoming, t, out):
+    # The frame t (0..1) of the way from outgoing to incoming, into out
+    width = outgoing.shape[1]
+    if kind == CROSSFADE:
+        # Integer weights out of 256, in uint16 so the sum can't overflow
+        weight = int(round(t * 256))
+        mixed = outgoing.astype(np.uint16) * (256 - weight)
+        mixed += incoming.astype(np.uint16) * weight
+        np.right_shift(mixed, 8, out=mixed)
+        out[...] = mixed
+    elif kind == WIPE:
+        x = int(round(t * width))
+        out[:, :x] = incoming[:, :x]
+        out[:, x:] = outgoing[:, x:]
+    elif kind == SLIDE:
+        x = int(round(t * width))
+        out[:, :width - x] = outgoing[:, x:]
+        out[:, width - x:] = incoming[:, :x]
+    else:
+        raise ValueError(f"Unknown transition: {kind}")
+    return out
+
+
+def blend_frames(kind, outgoing, incoming, steps):
+    # Yields steps frames, the last of them incoming. Each frame is computed
+    # when it is asked for and lives in one reused buffer, so it is only
+    # valid until the next one.
+    if kind not in TRANSITIONS:
+        raise ValueError(f"Unknown transition: {kind}")
+    incoming = as_array(incoming)
+    if outgoing is None or as_array(outgoing).shape != incoming.shape:
+        # Nothing known to blend from: a cut
+        yield incoming
+        return
+    outgoing = as_array(outgoing)
+    out = np.empty_like(incoming)
+    for step in range(1, steps):
+        yield blend(kind, outgoing, incoming, step / steps, out)
+    yield incoming
+
+
+class Transition(object):
+    def __init__(self, frames, kind=CROSSFADE, duration=DEFAULT_DURATION, fps=DEFAULT_FPS, refresh_hz=None):
+        # frames is the FrameGate the screens go through
+        if kind not in TRANSITIONS:
+            raise ValueError(f"Unknown transition: {kind}")
+        self.frames = frames
+        self.matrix = frames.matrix
+        self.kind = kind
+        self.duration = duration
+        self.fps = fps
+        if refresh_hz is None:
+            refresh_hz = getattr(self.matrix, "refresh_rate_hz", 0) or DEFAULT_REFRESH_HZ
+        self.refresh_hz = refresh_hz
+        self._canvas = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._next = None
+
+        self.played = 0
+        self.interrupted = 0
+        self.frames_shown = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def framerate_fraction(self):
+        return max(1, min(255, int(round(self.refresh_hz / self.fps))))
+
+    def steps(self):
+        return max(1, int(round(self.duration * self.fps)))
+
+    def play(self, outgoing, incoming, key=None, stop=None):
+        # Plays the transition on the calling thread and returns once incoming
+        # is up (with key, for the frame gate), or False if stop was set
+        # first. outgoing None is a cut.
+        stop = stop or self._stop
+        fraction = self.framerate_fraction()
+        period = fraction / float(self.refresh_hz)
+        if self._canvas is None:
+            self._canvas = self.matrix.CreateFrameCanvas()
+        frames = blend_frames(self.kind, outgoing, incoming, self.steps())
+        frame = next(frames)
+        due = time.monotonic()
+        while frame is not None:
+            self._canvas.SetImage(Image.fromarray(frame))
+            # The next frame is made while this one waits for its vsync
+            upcoming = next(frames, None)
+            self._canvas = self.frames.swap(self._canvas, key if upcoming is None else None, fraction)
+            self.frames_shown += 1
+            frame = upcoming
+            if stop.is_set():
+                self.interrupted += 1
+                return False
+            # Without a vsync to wait for (or a panel refreshing faster than
+            # it said), the rate is kept on the monotonic clock
+            due += period
+            delay = due - time.monotonic()
+            if frame is not None and delay > 0 and stop.wait(delay):
+                self.interrupted += 1
+                return False
+        self.played += 1
+        return True
+
+    def start(self, outgoing, incoming, key=None, hold=0.0, then=None):
+        # Plays on the transition thread, keeps incoming up for hold seconds
+        # and then calls then() there. A transition already running is
+        # stopped first; one started from then() follows on the same thread.
+        if threading.current_thread() is self._thread:
+            self._next = (outgoing, incoming, key, hold, then)
+            return
+        self.stop()
+        self._stop.clear()
+        self._next = (outgoing, incoming, key, hold, then)
+        self._thread = threading.Thread(target=self._run, name="transition")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        # Returns once nothing is drawing any more; from then() itself it
+        # returns right away
+        thread = self._thread
+        if thread is None or thread is threading.current_thread():
+            return
+        self._stop.set()
+        thread.join()
+        self._thread = None
+
+    def _run(self):
+        while self._next is not None and not self._stop.is_set():
+            outgoing, incoming, key, hold, then = self._next
+            self._next = None
+            if not self.play(outgoing, incoming, key):
+                return
+            if hold and self._stop.wait(hold):
+                return
+            if then is not None:
+                then()